@@ -1,178 +1,65 @@
-import pulumi
-import pulumi_proxmoxve as proxmoxve
-import pulumi_kubernetes as kubernetes
-import yaml
-from pulumi_kubernetes.helm.v3 import Release, ReleaseArgs, RepositoryOptsArgs
-from components import (
-    TalosImageFactory,
-    TalosImageFactoryArgs,
-    TalosCluster,
-    TalosClusterArgs,
-    TalosUpgrade,
-    TalosUpgradeArgs,
-)
+import startup_profile
 
-# Load configuration
-config = pulumi.Config()
-talos_version = config.get("talos_version") or "v1.11.5"
-kubernetes_version = config.get("kubernetes_version")
-cluster_name = config.get("cluster_name") or "talos-cluster"
-gateway = config.get("gateway") or "192.168.1.1"
-nodes = config.require_object("nodes")
-cluster_endpoint_ip = config.get("cluster_endpoint_ip") or nodes[0]["ip"]
-use_cilium = config.get_bool("use_cilium") or False
-cilium_version = config.get("cilium_version") or "1.16.0"
-force_upgrade = config.get_bool("force_upgrade") or False
+# LAB_PROFILE_STARTUP=1 reports import time and time-to-first-resource
+startup_profile.start()
 
-# Load ArgoCD version from the ArgoCD application manifest
-with open("../argocd/applications/argocd.yaml", "r") as f:
-    argocd_app = yaml.safe_load(f)
-    argocd_version = argocd_app["spec"]["sources"][0]["targetRevision"]
+# Layer modules (and the provider SDKs behind them) load on first use
+import layers
+from layers import LabSettings
 
-# Create Proxmox provider
-proxmox_provider = proxmoxve.Provider(
-    "proxmoxve",
-    endpoint=config.require("proxmox_endpoint"),
-    username=config.require("proxmox_username"),
-    password=config.require_secret("proxmox_password"),
-    insecure=True,
-)
+# Load configuration. `layer` picks what this stack deploys: "all" (default)
+# runs every layer here; otherwise upstream layers are read through
+# StackReferences so e.g. an ArgoCD change never refreshes the VMs.
+settings = LabSettings()
 
-# Create Talos image factories for different node types
-image_factory_default = TalosImageFactory(
-    "talos-image-default",
-    TalosImageFactoryArgs(
-        talos_version=talos_version,
-        platform="nocloud",
-        extensions=[
-            "siderolabs/iscsi-tools",
-        ],
-        node_name="pve01",
-        datastore_id="local",
-        proxmox_provider=proxmox_provider,
-    ),
-)
+image_factories = None
+prepared_factories = None
+cluster = None
 
-image_factory_gpu = TalosImageFactory(
-    "talos-image-gpu",
-    TalosImageFactoryArgs(
-        talos_version=talos_version,
-        platform="nocloud",
-        extensions=[
-            "siderolabs/iscsi-tools",
-            "siderolabs/nvidia-open-gpu-kernel-modules-lts",
-            "siderolabs/nvidia-container-toolkit",
-        ],
-        node_name="pve01",
-        datastore_id="local",
-        proxmox_provider=proxmox_provider,
-    ),
-)
+# Proxmox is only needed by the layers that create images and VMs
+proxmox_provider = None
+if settings.deploys("images") or settings.deploys("cluster"):
+    proxmox_provider = settings.create_proxmox_provider()
 
-image_factory_no_qemu = TalosImageFactory(
-    "talos-image-no-qemu",
-    TalosImageFactoryArgs(
-        talos_version=talos_version,
-        platform="nocloud",
-        extensions=[
-            "siderolabs/iscsi-tools",
-        ],
-        node_name="pve01",
-        datastore_id="local",
-        proxmox_provider=proxmox_provider,
-        upload_to_proxmox=False,
-    ),
-)
+# Talos image factories for the different node types
+if settings.deploys("images"):
+    image_factories = layers.deploy_images(settings, proxmox_provider)
+elif settings.deploys("cluster") or settings.deploys("upgrade"):
+    image_factories = layers.image_factories_from_stack(settings)
 
-image_factories = {
-    "default": image_factory_default,
-    "gpu": image_factory_gpu,
-    "no-qemu": image_factory_no_qemu,
-}
+# Schematics and ISOs of the candidate release, used by no node yet
+if settings.prepare_talos_version:
+    if settings.deploys("images"):
+        prepared_factories = layers.deploy_prepared_images(settings, proxmox_provider)
+    elif settings.deploys("upgrade"):
+        prepared_factories = layers.prepared_image_factories_from_stack(settings)
 
-# Create Talos cluster with all nodes
-cluster = TalosCluster(
-    cluster_name,
-    TalosClusterArgs(
-        cluster_name=cluster_name,
-        nodes=nodes,
-        gateway=gateway,
-        image_factories=image_factories,
-        talos_version=talos_version,
-        kubernetes_version=kubernetes_version,
-        cluster_endpoint_ip=cluster_endpoint_ip,
-        use_cilium=use_cilium,
-        cilium_version=cilium_version,
-        proxmox_provider=proxmox_provider,
-    ),
-)
+# Talos cluster with all nodes
+if settings.deploys("cluster"):
+    cluster = layers.deploy_cluster(settings, image_factories, proxmox_provider)
 
-# Install ArgoCD
-argocd_namespace = kubernetes.core.v1.Namespace(
-    "argocd-namespace",
-    metadata={"name": "argocd"},
-    opts=pulumi.ResourceOptions(provider=cluster.k8s_provider),
-)
+# ArgoCD and config-generated cluster resources
+if settings.deploys("platform"):
+    if cluster:
+        # The provider only waits for the API server, so the platform installs
+        # while workers are still joining
+        kubeconfig = cluster.kubeconfig_raw
+        k8s_provider = cluster.k8s_provider
+        nodes_ready = [cluster.all_nodes_ready]
+    else:
+        kubeconfig = layers.kubeconfig_from_stack(settings)
+        k8s_provider = layers.k8s_provider_from_stack(settings)
+        nodes_ready = None
+    platform = layers.deploy_platform(settings, k8s_provider, kubeconfig, nodes_ready)
 
-argocd = Release(
-    "argocd",
-    ReleaseArgs(
-        name="argocd",
-        chart="argo-cd",
-        repository_opts=RepositoryOptsArgs(
-            repo="https://argoproj.github.io/argo-helm",
-        ),
-        version=argocd_version,
-        value_yaml_files=[
-            pulumi.FileAsset("../argocd/applications/values/argocd.yaml")
-        ],
-        namespace="argocd",
-    ),
-    opts=pulumi.ResourceOptions(
-        provider=cluster.k8s_provider,
-        depends_on=[argocd_namespace],
-    ),
-)
+# Talos node upgrades
+if settings.deploys("upgrade"):
+    talosconfig_path = layers.write_talosconfig(
+        cluster.talosconfig_yaml if cluster else layers.talosconfig_from_stack(settings)
+    )
+    upgrade = layers.deploy_upgrade(settings, image_factories, talosconfig_path)
+    # Pre-pull the candidate installers so the upgrade run finds them cached
+    if prepared_factories:
+        prepare = layers.deploy_prepare(settings, prepared_factories, talosconfig_path)
 
-argocd_applications = kubernetes.yaml.ConfigFile(
-    "argocd-applications",
-    file="../argocd/all-the-apps.yaml",
-    opts=pulumi.ResourceOptions(
-        provider=cluster.k8s_provider,
-        depends_on=[argocd],
-    ),
-)
-
-# Upgrade Talos nodes when version changes (masters first, then workers)
-# This runs talosctl upgrade commands directly, no ConfigurationApply needed
-upgrade = TalosUpgrade(
-    "talos-upgrade",
-    TalosUpgradeArgs(
-        nodes=nodes,
-        image_factories=image_factories,
-        force=force_upgrade,
-    ),
-)
-
-# Exports
-pulumi.export(
-    "talos_images",
-    {
-        "default": {
-            "iso_url": image_factory_default.iso_url,
-            "installer_image": image_factory_default.installer_image,
-        },
-        "gpu": {
-            "iso_url": image_factory_gpu.iso_url,
-            "installer_image": image_factory_gpu.installer_image,
-        },
-        "no-qemu": {
-            "iso_url": image_factory_no_qemu.iso_url,
-            "installer_image": image_factory_no_qemu.installer_image,
-        },
-    },
-)
-pulumi.export("talos_version", talos_version)
-
-pulumi.export("kubeconfig", pulumi.Output.secret(cluster.kubeconfig_raw))
-pulumi.export("talosconfig", pulumi.Output.secret(cluster.talosconfig_yaml))
+startup_profile.report()
@@ -0,0 +1,791 @@
+"""
+Generate the Grafana Alloy collector manifest synced by ArgoCD from the
+pipeline definitions below.
+
+    python alloy_config.py            # write the manifest and print the diff
+    python alloy_config.py --check    # CI: exit 1 if the manifest is stale
+
+Every metrics source gets its own scrape interval, series limit and
+metric-name keep/drop lists, so a new exporter can't flood the metrics
+backend. Pod logs go through per-namespace/container drop and rate-limit
+rules and a disk-bounded write-ahead log. Edit the definitions here, not the
+generated manifest.
+"""
+
+import argparse
+import difflib
+import json
+import sys
+from pathlib import Path
+
+COLLECTOR_MANIFEST = (
+    Path(__file__).parent.parent
+    / "argocd"
+    / "applications"
+    / "manifests"
+    / "grafana-alloy"
+    / "collector.yaml"
+)
+
+METRICS_URL = "http://192.168.1.200:9090/api/v1/write"
+LOKI_URL = "http://192.168.1.200:3100/loki/api/v1/push"
+
+SERVICE_ACCOUNT_TOKEN = "/var/run/secrets/kubernetes.io/serviceaccount/token"
+
+# Scrape pipelines, one per source:
+#   targets:       "nodes" (kubelet endpoints), "pods" (discovered by namespace,
+#                  label selector and container port) or "static" (address)
+#                  Node and pod targets are scraped by the collector on their
+#                  own node; static targets by one collector of the cluster
+#   interval:      scrape interval, slower for sources that change slowly
+#   sample_limit:  series per scrape; a target over the limit fails the scrape
+#                  instead of silently growing the backend. It counts the raw
+#                  scrape, before keep/drop, so size it to the full exporter
+#   keep / drop:   metric-name regexes applied before remote write
+METRICS_SOURCES = {
+    "kubelet": {
+        "title": "Node Metrics (Kubelet)",
+        "targets": "nodes",
+        "kubelet_auth": True,
+        "interval": "30s",
+        "sample_limit": 20000,
+        "drop": [
+            "apiserver_.*",
+            "rest_client_.*",
+            "kubelet_runtime_operations_duration_seconds_bucket",
+            "storage_operation_duration_seconds_bucket",
+        ],
+    },
+    "cadvisor": {
+        "title": "Pod / Container Metrics (cAdvisor)",
+        "targets": "nodes",
+        "kubelet_auth": True,
+        "metrics_path": "/metrics/cadvisor",
+        "interval": "30s",
+        "sample_limit": 50000,
+        "drop": [
+            "container_blkio_device_usage_total",
+            "container_file_descriptors",
+            "container_memory_failures_total",
+            "container_network_(tcp|udp)_usage_total",
+            "container_sockets",
+            "container_spec_.*",
+            "container_tasks_state",
+            "container_threads_max",
+            "container_ulimits_soft",
+        ],
+    },
+    "kube_state_metrics": {
+        "title": "Kubernetes State Metrics (kube-state-metrics)",
+        "targets": "static",
+        "address": "kube-state-metrics.kube-state-metrics.svc:8080",
+        "interval": "60s",
+        "sample_limit": 30000,
+        "keep": [
+            "kube_(pod|deployment|statefulset|daemonset|node|namespace|job|cronjob)_.*",
+            "kube_(persistentvolume|persistentvolumeclaim|resourcequota|horizontalpodautoscaler)_.*",
+        ],
+        "drop": [
+            "kube_.*_(labels|annotations)",
+            "kube_pod_tolerations",
+            "kube_pod_init_container_.*",
+            "kube_pod_status_(ready_time|container_ready_time)",
+        ],
+    },
+    "dcgm": {
+        "title": "NVIDIA DCGM GPU Metrics",
+        "targets": "pods",
+        "namespace": "dcgm-exporter",
+        "selector": "app.kubernetes.io/name=dcgm-exporter",
+        "job": "dcgm-exporter",
+        "interval": "15s",
+        "sample_limit": 5000,
+        "keep": [
+            "DCGM_FI_DEV_(GPU_UTIL|MEM_COPY_UTIL|FB_USED|FB_FREE|GPU_TEMP|POWER_USAGE)",
+            "DCGM_FI_DEV_(SM_CLOCK|MEM_CLOCK|XID_ERRORS|PCIE_REPLAY_COUNTER)",
+            "DCGM_FI_PROF_(GR_ENGINE_ACTIVE|SM_ACTIVE|SM_OCCUPANCY|PIPE_TENSOR_ACTIVE|DRAM_ACTIVE)",
+        ],
+    },
+    "cilium_agent": {
+        "title": "Cilium Agent Metrics",
+        "targets": "pods",
+        "namespace": "kube-system",
+        "selector": "k8s-app=cilium",
+        "port": 9962,
+        "job": "cilium-agent",
+        "interval": "30s",
+        "sample_limit": 20000,
+        "drop": [
+            "cilium_k8s_client_api_latency_time_seconds_bucket",
+            "cilium_kvstore_.*",
+            "cilium_policy_regeneration_time_stats_seconds_bucket",
+            "cilium_bpf_map_ops_total",
+        ],
+    },
+    "cilium_operator": {
+        "title": "Cilium Operator Metrics",
+        "targets": "static",
+        "address": "cilium-operator.kube-system.svc:9963",
+        "interval": "60s",
+        "sample_limit": 5000,
+    },
+    "hubble": {
+        "title": "Hubble Flow Metrics",
+        "targets": "pods",
+        "namespace": "kube-system",
+        "selector": "k8s-app=cilium",
+        "port": 9965,
+        "job": "hubble",
+        "interval": "30s",
+        "sample_limit": 20000,
+        "keep": [
+            "hubble_(dns_queries_total|dns_responses_total|drop_total|tcp_flags_total)",
+            "hubble_(flows_processed_total|icmp_total)",
+            "hubble_http_(requests_total|request_duration_seconds_(bucket|sum|count))",
+        ],
+    },
+    "argocd_controller": {
+        # Enabled by argocd_values.py; reconcile time and queue depth per app
+        "title": "ArgoCD Application Controller Metrics",
+        "targets": "pods",
+        "namespace": "argocd",
+        "selector": "app.kubernetes.io/name=argocd-application-controller",
+        "port": 8082,
+        "job": "argocd-application-controller",
+        "interval": "30s",
+        "sample_limit": 10000,
+        "keep": [
+            "argocd_app_reconcile_(bucket|sum|count)",
+            "argocd_app_(info|sync_total|k8s_request_total)",
+            "argocd_kubectl_exec_(pending|total)",
+            "argocd_cluster_(api_resource_objects|cache_age_seconds|events_total)",
+            "workqueue_(depth|adds_total|queue_duration_seconds_(bucket|sum|count))",
+        ],
+    },
+    "argocd_repo_server": {
+        "title": "ArgoCD Repo Server Metrics",
+        "targets": "pods",
+        "namespace": "argocd",
+        "selector": "app.kubernetes.io/name=argocd-repo-server",
+        "port": 8084,
+        "job": "argocd-repo-server",
+        "interval": "30s",
+        "sample_limit": 5000,
+        "keep": [
+            "argocd_git_request_(total|duration_seconds_(bucket|sum|count))",
+            "argocd_repo_pending_request_total",
+            "argocd_redis_request_(total|duration_(bucket|sum|count))",
+        ],
+    },
+    "alloy": {
+        # Alloy's own metrics: received vs shipped log bytes, drops, queues
+        "title": "Alloy Self Metrics",
+        "targets": "self",
+        "interval": "60s",
+        "sample_limit": 10000,
+        "keep": [
+            "loki_process_custom_log_(received|shipped)_bytes_total",
+            "loki_process_dropped_lines_total",
+            "loki_write_.*",
+            "prometheus_remote_storage_.*",
+            "alloy_build_info",
+        ],
+    },
+    "kserve_vllm": {
+        "title": "vLLM / KServe InferenceService Metrics",
+        "targets": "pods",
+        "namespace": "kserve-test",
+        "selector": "component=predictor",
+        "port": 8080,
+        "job": "kserve-vllm",
+        "extra_labels": {
+            "__meta_kubernetes_pod_label_serving_kserve_io_inferenceservice": "inferenceservice",
+        },
+        "interval": "15s",
+        "sample_limit": 10000,
+        "keep": ["vllm:.*"],
+    },
+}
+
+# Log rules, matched by namespace and optionally container. `drop` lists line
+# regexes that are never shipped; `rate`/`burst` (lines/s) cap what is left.
+LOG_RULES = [
+    {
+        "namespace": "kube-system",
+        "container": "cilium-agent",
+        "drop": ['level=(debug|info) msg="(Delete|Update|Upsert)'],
+        "rate": 20,
+        "burst": 100,
+    },
+    {
+        # vLLM access log: health checks and metrics scrapes on every probe
+        "namespace": "kserve-test",
+        "container": "kserve-container",
+        "drop": ['"GET /(health|metrics|ping)[^"]*" 200'],
+        "rate": 50,
+        "burst": 200,
+    },
+    {
+        "namespace": "argocd",
+        "container": "argocd-application-controller",
+        "drop": ["level=debug"],
+        "rate": 20,
+        "burst": 100,
+    },
+]
+
+# Applied per namespace after the rules, so one noisy namespace can't starve
+# the rest. Lines over max_line_bytes are dropped outright.
+LOG_DEFAULT_LIMIT = {
+    "rate": 50,
+    "burst": 200,
+    "max_namespaces": 40,
+    "max_line_bytes": 16384,
+}
+
+# Loki push batching and retry. Push requests are snappy-compressed protobuf,
+# so bigger batches compress better and cut request overhead.
+LOKI_WRITE = {
+    "batch_size": "4MiB",
+    "batch_wait": "5s",
+    "remote_timeout": "30s",
+    "min_backoff_period": "500ms",
+    "max_backoff_period": "5m",
+    "max_backoff_retries": 20,
+    "retry_on_http_429": True,
+}
+
+# On-node buffering: the Loki WAL keeps logs through Loki outages for up to
+# max_segment_age, the metrics WAL keeps samples for up to REMOTE_WRITE's
+# max_keepalive_time. Both WALs live on an emptyDir capped at the sum of the
+# two budgets, and that cap is the only disk bound: past it the kubelet
+# evicts the pod and the emptyDir, with both WALs, is wiped. So the limits
+# have to keep each worst case inside its budget.
+LOG_BUFFER = {
+    "storage_path": "/var/lib/alloy/data",
+    "log_wal_mib": 2048,
+    "metrics_wal_mib": 768,
+    # Uncompressed WAL sample record (series ref, timestamp, value)
+    "metrics_wal_bytes_per_sample": 16,
+    "max_segment_age": "30m",
+    "drain_timeout": "30s",
+    "avg_line_bytes": 256,
+}
+
+# Remote-write batching and retry: larger batches and a bounded number of
+# shards, so a backend restart backs off instead of piling up requests
+REMOTE_WRITE = {
+    "queue_config": {
+        "capacity": 10000,
+        "min_shards": 1,
+        "max_shards": 10,
+        "max_samples_per_send": 2000,
+        "batch_send_deadline": "5s",
+        "min_backoff": "30ms",
+        "max_backoff": "5s",
+        "retry_on_http_429": True,
+        "sample_age_limit": "10m",
+    },
+    "metadata_config": {
+        "send": True,
+        "send_interval": "1m",
+        "max_samples_per_send": 500,
+    },
+    # Samples the backend hasn't taken are dropped after max_keepalive_time,
+    # checked every truncate_frequency; this bounds the metrics WAL
+    "wal": {
+        "truncate_frequency": "30m",
+        "min_keepalive_time": "5m",
+        "max_keepalive_time": "1h",
+    },
+}
+
+
+class Ref(str):
+    """An Alloy expression (component export), rendered without quotes"""
+
+
+def _value(value) -> str:
+    if isinstance(value, Ref):
+        return str(value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, list):
+        return "[" + ", ".join(_value(v) for v in value) + "]"
+    # JSON string escaping matches Alloy's
+    return json.dumps(value)
+
+
+def _block(header: str, attrs: dict = None, children: list = None) -> list[str]:
+    """Render an Alloy block with aligned attributes and nested child blocks."""
+    lines = [f"{header} {{"]
+    attrs = {k: v for k, v in (attrs or {}).items() if v is not None}
+    width = max((len(k) for k in attrs), default=0)
+    lines.extend(
+        f"  {key.ljust(width)} = {_value(value)}" for key, value in attrs.items()
+    )
+    if attrs and children:
+        lines.append("")
+    for child in children or []:
+        lines.extend(f"  {line}" if line else "" for line in child)
+    lines.append("}")
+    return lines
+
+
+def _this_node(field: str) -> Ref:
+    """Field selector matching this collector's node (HOSTNAME is the node name)."""
+    return Ref(f'"{field}=" + sys.env("HOSTNAME")')
+
+
+def _section(title: str) -> list[str]:
+    rule = "─" * 41
+    return [f"// {rule}", f"// {title}", f"// {rule}"]
+
+
+def _name_regex(patterns: list[str]) -> str:
+    return (
+        "|".join(patterns) if len(patterns) == 1 else "(" + ")|(".join(patterns) + ")"
+    )
+
+
+def _target_relabel_rules(source: dict) -> list[list[str]]:
+    rules = []
+    if "port" in source:
+        rules.append(
+            _block(
+                "rule",
+                {
+                    "source_labels": ["__meta_kubernetes_pod_container_port_number"],
+                    "regex": str(source["port"]),
+                    "action": "keep",
+                },
+            )
+        )
+    labels = {
+        "__meta_kubernetes_namespace": "namespace",
+        "__meta_kubernetes_pod_name": "pod",
+        **source.get("extra_labels", {}),
+        "__meta_kubernetes_pod_node_name": "node",
+    }
+    for source_label, target_label in labels.items():
+        rules.append(
+            _block(
+                "rule", {"source_labels": [source_label], "target_label": target_label}
+            )
+        )
+    rules.append(_block("rule", {"target_label": "job", "replacement": source["job"]}))
+    return rules
+
+
+def _metric_relabel_rules(source: dict) -> list[list[str]]:
+    rules = []
+    if source.get("keep"):
+        rules.append(
+            _block(
+                "rule",
+                {
+                    "source_labels": ["__name__"],
+                    "regex": _name_regex(source["keep"]),
+                    "action": "keep",
+                },
+            )
+        )
+    if source.get("drop"):
+        rules.append(
+            _block(
+                "rule",
+                {
+                    "source_labels": ["__name__"],
+                    "regex": _name_regex(source["drop"]),
+                    "action": "drop",
+                },
+            )
+        )
+    return rules
+
+
+def render_metrics_source(name: str, source: dict) -> list[str]:
+    """Render discovery, scrape and metric filtering for one source."""
+    lines = _section(source["title"])
+    targets = None
+
+    if source["targets"] == "nodes":
+        targets = Ref("discovery.kubernetes.nodes.targets")
+    elif source["targets"] == "self":
+        lines += _block(f'prometheus.exporter.self "{name}"')
+        lines.append("")
+        targets = Ref(f"prometheus.exporter.self.{name}.targets")
+    elif source["targets"] == "static":
+        targets = Ref(f'[{{\n    __address__ = "{source["address"]}",\n  }}]')
+    else:
+        lines += _block(
+            f'discovery.kubernetes "{name}"',
+            {"role": "pod"},
+            [
+                _block("namespaces", {"names": [source["namespace"]]}),
+                _block(
+                    "selectors",
+                    {
+                        "role": "pod",
+                        "label": source["selector"],
+                        "field": _this_node("spec.nodeName"),
+                    },
+                ),
+            ],
+        )
+        lines.append("")
+        lines += _block(
+            f'discovery.relabel "{name}"',
+            {"targets": Ref(f"discovery.kubernetes.{name}.targets")},
+            _target_relabel_rules(source),
+        )
+        lines.append("")
+        targets = Ref(f"discovery.relabel.{name}.output")
+
+    filtered = bool(source.get("keep") or source.get("drop"))
+    forward_to = (
+        Ref(f"[prometheus.relabel.{name}.receiver]")
+        if filtered
+        else Ref("[prometheus.remote_write.vm.receiver]")
+    )
+    children = []
+    if source.get("kubelet_auth"):
+        children.append(_block("tls_config", {"insecure_skip_verify": True}))
+    if source["targets"] == "static":
+        # Every collector sees the same static target; clustering hands it
+        # to exactly one of them
+        children.append(_block("clustering", {"enabled": True}))
+    lines += _block(
+        f'prometheus.scrape "{name}"',
+        {
+            "targets": targets,
+            "metrics_path": source.get("metrics_path", "/metrics"),
+            "scheme": "https" if source.get("kubelet_auth") else None,
+            "bearer_token_file": (
+                SERVICE_ACCOUNT_TOKEN if source.get("kubelet_auth") else None
+            ),
+            "scrape_interval": source["interval"],
+            "scrape_timeout": source.get("timeout"),
+            "sample_limit": source["sample_limit"],
+            "forward_to": forward_to,
+        },
+        children,
+    )
+
+    if filtered:
+        lines.append("")
+        lines += _block(
+            f'prometheus.relabel "{name}"',
+            {"forward_to": Ref("[prometheus.remote_write.vm.receiver]")},
+            _metric_relabel_rules(source),
+        )
+    return lines
+
+
+def render_remote_write() -> list[str]:
+    worst_case = metrics_wal_worst_case_mib()
+    if worst_case > LOG_BUFFER["metrics_wal_mib"]:
+        raise ValueError(
+            f"Metrics WAL worst case ({worst_case:.0f}MiB) exceeds its {LOG_BUFFER['metrics_wal_mib']}MiB budget; "
+            "lower the sample limits or REMOTE_WRITE max_keepalive_time"
+        )
+
+    return _section("Prometheus Remote Write → VM") + _block(
+        'prometheus.remote_write "vm"',
+        children=[
+            _block(
+                "endpoint",
+                {"url": METRICS_URL},
+                [
+                    _block("queue_config", REMOTE_WRITE["queue_config"]),
+                    _block("metadata_config", REMOTE_WRITE["metadata_config"]),
+                ],
+            ),
+            _block("wal", REMOTE_WRITE["wal"]),
+        ],
+    )
+
+
+def _duration_seconds(duration: str) -> int:
+    units = {"s": 1, "m": 60, "h": 3600}
+    return int(duration[:-1]) * units[duration[-1]]
+
+
+def log_wal_worst_case_mib() -> float:
+    """
+    Largest log WAL a node can build up during a Loki outage: every namespace
+    at its default rate limit for a full segment age.
+    """
+    lines_per_second = LOG_DEFAULT_LIMIT["rate"] * LOG_DEFAULT_LIMIT["max_namespaces"]
+    return (
+        lines_per_second
+        * LOG_BUFFER["avg_line_bytes"]
+        * _duration_seconds(LOG_BUFFER["max_segment_age"])
+        / 1024**2
+    )
+
+
+def metrics_wal_worst_case_mib() -> float:
+    """
+    Largest metrics WAL a node can build up while remote write is down: every
+    source at its sample limit, kept until the first truncation after
+    max_keepalive_time.
+    """
+    samples_per_second = sum(
+        source["sample_limit"] / _duration_seconds(source["interval"])
+        for source in METRICS_SOURCES.values()
+    )
+    retention = _duration_seconds(
+        REMOTE_WRITE["wal"]["max_keepalive_time"]
+    ) + _duration_seconds(REMOTE_WRITE["wal"]["truncate_frequency"])
+    return (
+        samples_per_second
+        * LOG_BUFFER["metrics_wal_bytes_per_sample"]
+        * retention
+        / 1024**2
+    )
+
+
+def _log_selector(rule: dict) -> str:
+    matchers = [f'namespace="{rule["namespace"]}"']
+    if rule.get("container"):
+        matchers.append(f'container="{rule["container"]}"')
+    return "{" + ", ".join(matchers) + "}"
+
+
+def _log_rule_name(rule: dict) -> str:
+    return "/".join(filter(None, [rule["namespace"], rule.get("container")]))
+
+
+def _bytes_counter(name: str, description: str) -> list[str]:
+    # Counters carry the stream labels, so they break down per namespace/container
+    return _block(
+        "stage.metrics",
+        children=[
+            _block(
+                "metric.counter",
+                {
+                    "name": name,
+                    "description": description,
+                    "match_all": True,
+                    "count_entry_bytes": True,
+                    "action": "add",
+                    "max_idle_duration": "1h",
+                },
+            )
+        ],
+    )
+
+
+def render_log_stages() -> list[list[str]]:
+    """Byte accounting, per-source rules and the default limit, in order."""
+    stages = [_bytes_counter("log_received_bytes_total", "Log bytes read from pods")]
+    stages.append(
+        _block(
+            "stage.drop",
+            {
+                "longer_than": f"{LOG_DEFAULT_LIMIT['max_line_bytes']}B",
+                "drop_counter_reason": "line_too_long",
+            },
+        )
+    )
+    for rule in LOG_RULES:
+        rule_stages = [
+            _block(
+                "stage.drop",
+                {
+                    "expression": expression,
+                    "drop_counter_reason": f"rule:{_log_rule_name(rule)}",
+                },
+            )
+            for expression in rule.get("drop", [])
+        ]
+        if "rate" in rule:
+            rule_stages.append(
+                _block(
+                    "stage.limit",
+                    {"rate": rule["rate"], "burst": rule["burst"], "drop": True},
+                )
+            )
+        stages.append(
+            _block("stage.match", {"selector": _log_selector(rule)}, rule_stages)
+        )
+    stages.append(
+        _block(
+            "stage.limit",
+            {
+                "rate": LOG_DEFAULT_LIMIT["rate"],
+                "burst": LOG_DEFAULT_LIMIT["burst"],
+                "by_label_name": "namespace",
+                "max_distinct_labels": LOG_DEFAULT_LIMIT["max_namespaces"],
+                "drop": True,
+            },
+        )
+    )
+    stages.append(_bytes_counter("log_shipped_bytes_total", "Log bytes sent to Loki"))
+    return stages
+
+
+def render_log_pipeline() -> list[str]:
+    worst_case = log_wal_worst_case_mib()
+    if worst_case > LOG_BUFFER["log_wal_mib"]:
+        raise ValueError(
+            f"Log WAL worst case ({worst_case:.0f}MiB) exceeds its {LOG_BUFFER['log_wal_mib']}MiB budget; "
+            "lower LOG_DEFAULT_LIMIT or LOG_BUFFER max_segment_age"
+        )
+
+    return _section("Pod Log Collection → Loki (rules, rate limits, WAL)") + [
+        # Each node's Alloy only tails the pods on its own node
+        *_block(
+            'discovery.kubernetes "pods"',
+            {"role": "pod"},
+            [
+                _block(
+                    "selectors",
+                    {"role": "pod", "field": _this_node("spec.nodeName")},
+                )
+            ],
+        ),
+        "",
+        *_block(
+            'discovery.relabel "pod_logs"',
+            {"targets": Ref("discovery.kubernetes.pods.targets")},
+            [
+                _block(
+                    "rule",
+                    {"source_labels": [source_label], "target_label": target_label},
+                )
+                for source_label, target_label in {
+                    "__meta_kubernetes_namespace": "namespace",
+                    "__meta_kubernetes_pod_name": "pod",
+                    "__meta_kubernetes_pod_container_name": "container",
+                    "__meta_kubernetes_pod_node_name": "node",
+                }.items()
+            ],
+        ),
+        "",
+        *_block(
+            'loki.source.kubernetes "pod_logs"',
+            {
+                "targets": Ref("discovery.relabel.pod_logs.output"),
+                "forward_to": Ref("[loki.process.pod_logs.receiver]"),
+            },
+        ),
+        "",
+        *_block(
+            'loki.process "pod_logs"',
+            {"forward_to": Ref("[loki.write.vm.receiver]")},
+            render_log_stages(),
+        ),
+        "",
+        *_block(
+            'loki.write "vm"',
+            children=[
+                _block("endpoint", {"url": LOKI_URL, **LOKI_WRITE}),
+                _block(
+                    "wal",
+                    {
+                        "enabled": True,
+                        "max_segment_age": LOG_BUFFER["max_segment_age"],
+                        "drain_timeout": LOG_BUFFER["drain_timeout"],
+                    },
+                ),
+            ],
+        ),
+    ]
+
+
+def render_alloy_config() -> str:
+    """Render the complete Alloy configuration."""
+    sections = [
+        render_log_pipeline(),
+        _section("Kubernetes Nodes (kubelet and cAdvisor targets)")
+        # Only this collector's own node
+        + _block(
+            'discovery.kubernetes "nodes"',
+            {"role": "node"},
+            [
+                _block(
+                    "selectors", {"role": "node", "field": _this_node("metadata.name")}
+                )
+            ],
+        ),
+    ]
+    sections += [render_metrics_source(n, s) for n, s in METRICS_SOURCES.items()]
+    sections.append(render_remote_write())
+    return "\n\n".join("\n".join(section) for section in sections) + "\n"
+
+
+def render_collector_manifest() -> str:
+    """Render the Alloy custom resource with the generated configuration."""
+    content = "\n".join(
+        f"        {line}" if line else "" for line in render_alloy_config().splitlines()
+    )
+    storage_mib = LOG_BUFFER["log_wal_mib"] + LOG_BUFFER["metrics_wal_mib"]
+    return (
+        "# Generated by pulumi/alloy_config.py - edit the definitions there\n"
+        "apiVersion: collectors.grafana.com/v1alpha1\n"
+        "kind: Alloy\n"
+        "metadata:\n"
+        "  name: alloy\n"
+        "  namespace: grafana-alloy-operator\n"
+        "spec:\n"
+        "  controller:\n"
+        "    type: daemonset\n"
+        "    volumes:\n"
+        "      extra:\n"
+        "        # Exceeding sizeLimit evicts the pod and wipes both WALs\n"
+        "        - name: alloy-data\n"
+        "          emptyDir:\n"
+        f"            sizeLimit: {storage_mib}Mi\n"
+        "\n"
+        "  alloy:\n"
+        "    # Shares the static scrape targets between the collectors\n"
+        "    clustering:\n"
+        "      enabled: true\n"
+        "    # The Loki WAL is experimental\n"
+        "    stabilityLevel: experimental\n"
+        f"    storagePath: {LOG_BUFFER['storage_path']}\n"
+        "    mounts:\n"
+        "      extra:\n"
+        "        - name: alloy-data\n"
+        f"          mountPath: {LOG_BUFFER['storage_path']}\n"
+        "    configMap:\n"
+        "      content: |-\n"
+        f"{content}\n"
+    )
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="don't write; exit 1 if the manifest differs from the definitions",
+    )
+    args = parser.parse_args(argv)
+
+    previous = COLLECTOR_MANIFEST.read_text() if COLLECTOR_MANIFEST.exists() else ""
+    current = render_collector_manifest()
+    diff = list(
+        difflib.unified_diff(
+            previous.splitlines(keepends=True),
+            current.splitlines(keepends=True),
+            fromfile=f"a/{COLLECTOR_MANIFEST.name}",
+            tofile=f"b/{COLLECTOR_MANIFEST.name}",
+        )
+    )
+    sys.stdout.writelines(diff)
+
+    if args.check:
+        return 1 if diff else 0
+
+    COLLECTOR_MANIFEST.write_text(current)
+    print(f"Wrote {COLLECTOR_MANIFEST} ({'changed' if diff else 'no changes'})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+Generate the ArgoCD performance values from the compiled cluster spec and
+the Applications ArgoCD manages.
+
+    python argocd_values.py --stack dev            # write the values and print the diff
+    python argocd_values.py --stack dev --check    # CI: exit 1 if the values are stale
+
+The values size the application controller (shards, status/operation
+processors), the repo-server (replicas, concurrent manifest renders, cache
+TTLs) and Redis (HA once enough workers can hold the replicas), and turn on
+the controller and repo-server metrics scraped by alloy_config.py. They are
+committed next to values/argocd.yaml and read both by the Pulumi install and
+by the self-managed ArgoCD Application, so self-heal doesn't revert them.
+Change the sizing below, not the generated file.
+"""
+
+import argparse
+import difflib
+import math
+import sys
+from pathlib import Path
+
+import yaml
+
+from cluster_spec import ClusterSpec, NodeSpec
+from vclusters import worker_capacity
+
+REPO_ROOT = Path(__file__).parent.parent
+APPLICATIONS_DIR = REPO_ROOT / "argocd" / "applications"
+APP_OF_APPS = REPO_ROOT / "argocd" / "all-the-apps.yaml"
+PERFORMANCE_VALUES = APPLICATIONS_DIR / "values" / "argocd-performance.yaml"
+
+# Capacities the values are sized with:
+#   helm_renders_per_repo_server: concurrent `helm template` runs one repo-server
+#                                 replica handles before renders queue up
+#   max_repo_servers:             cap on repo-server replicas
+#   renders_per_cpu:              concurrent renders per core of the smallest
+#                                 schedulable worker, so a burst can't OOM it
+#   min_status_processors /       ArgoCD's defaults; raised with the number of
+#   min_operation_processors:     Applications so every app gets a worker
+#   redis_ha_min_workers:         schedulable workers needed for HA Redis: its
+#                                 three replicas (and HAProxy) spread with
+#                                 required anti-affinity, so Sentinel keeps a
+#                                 quorum when a worker goes down
+SIZING = {
+    "helm_renders_per_repo_server": 6,
+    "max_repo_servers": 3,
+    "renders_per_cpu": 2,
+    "min_status_processors": 20,
+    "min_operation_processors": 10,
+    "redis_ha_min_workers": 3,
+}
+
+# Reconcile and cache timing. Rendered manifests are cached by commit SHA, so
+# a long TTL is safe; the jitter spreads the periodic refresh of every app
+# over a window instead of hitting the repo-server all at once.
+TIMING = {
+    "reconciliation": 180,
+    "jitter_per_app": 5,
+    "max_jitter": 120,
+    "repo_server_timeout": 180,
+    "manifest_cache": "24h",
+    "repo_cache": "1h",
+}
+
+
+def read_applications(
+    applications_dir: Path = APPLICATIONS_DIR, app_of_apps: Path = APP_OF_APPS
+) -> list[dict]:
+    """Name, destination cluster and whether it renders a Helm chart, per Application."""
+    applications = []
+    for path in [app_of_apps, *sorted(applications_dir.glob("*.yaml"))]:
+        with open(path, "r") as f:
+            app = yaml.safe_load(f)
+        if not app or app.get("kind") != "Application":
+            continue
+        spec = app["spec"]
+        sources = spec.get("sources") or [spec["source"]]
+        applications.append(
+            {
+                "name": app["metadata"]["name"],
+                "destination": spec["destination"].get("server")
+                or spec["destination"].get("name"),
+                "helm": any("chart" in source for source in sources),
+            }
+        )
+    return applications
+
+
+def argocd_workers(spec: ClusterSpec) -> list[NodeSpec]:
+    """
+    Untainted Proxmox workers ArgoCD is sized for. GPU and inference
+    (static CPU manager) nodes are left to the workloads they are sized for.
+    """
+    workers = [spec.node(name) for name in worker_capacity(spec.nodes)["nodes"]]
+    return [
+        node
+        for node in workers
+        if not node.enable_gpu and node.kubelet.get("cpu_manager_policy") != "static"
+    ]
+
+
+def render_argocd_performance_values(
+    spec: ClusterSpec, applications: list[dict]
+) -> dict:
+    """ArgoCD chart values sized for the cluster spec and the managed Applications."""
+    workers = argocd_workers(spec)
+    # With no untainted workers ArgoCD lands on whatever tolerates it; size for one node
+    schedulable = max(len(workers), 1)
+    smallest_cpu = min((node.cpu for node in workers), default=2)
+
+    app_count = len(applications)
+    helm_apps = sum(app["helm"] for app in applications)
+
+    # The controller shards by destination cluster, so replicas beyond the
+    # cluster count would own no applications
+    clusters = len({app["destination"] for app in applications}) or 1
+    shards = min(clusters, schedulable)
+
+    status_processors = max(SIZING["min_status_processors"], app_count)
+    operation_processors = max(
+        SIZING["min_operation_processors"], math.ceil(app_count / 2)
+    )
+
+    repo_servers = min(
+        max(math.ceil(helm_apps / SIZING["helm_renders_per_repo_server"]), 1),
+        SIZING["max_repo_servers"],
+        schedulable,
+    )
+    render_limit = min(
+        max(math.ceil(helm_apps / repo_servers), 1),
+        smallest_cpu * SIZING["renders_per_cpu"],
+    )
+    jitter = min(app_count * TIMING["jitter_per_app"], TIMING["max_jitter"])
+
+    redis_ha = schedulable >= SIZING["redis_ha_min_workers"]
+
+    values = {
+        "configs": {
+            "cm": {
+                "timeout.reconciliation": f"{TIMING['reconciliation']}s",
+                "timeout.reconciliation.jitter": f"{jitter}s",
+            },
+            "params": {
+                "controller.status.processors": status_processors,
+                "controller.operation.processors": operation_processors,
+                "controller.kubectl.parallelism.limit": operation_processors * 2,
+                "controller.repo.server.timeout.seconds": TIMING["repo_server_timeout"],
+                "controller.sharding.algorithm": "round-robin",
+                "reposerver.parallelism.limit": render_limit,
+                "reposerver.default.cache.expiration": TIMING["manifest_cache"],
+                "reposerver.repo.cache.expiration": TIMING["repo_cache"],
+            },
+        },
+        "controller": {
+            "replicas": shards,
+            "metrics": {"enabled": True},
+        },
+        "repoServer": {
+            "replicas": repo_servers,
+            "metrics": {"enabled": True},
+        },
+        "server": {
+            "metrics": {"enabled": True},
+        },
+        "redis-ha": {"enabled": redis_ha},
+    }
+    if redis_ha:
+        values["redis-ha"].update(
+            {
+                "hardAntiAffinity": True,
+                "haproxy": {"hardAntiAffinity": True},
+            }
+        )
+    return values
+
+
+def render_argocd_performance_file(spec: ClusterSpec, applications: list[dict]) -> str:
+    """The committed values file: a header naming its inputs, then the values."""
+    values = render_argocd_performance_values(spec, applications)
+    header = [
+        "# Generated by pulumi/argocd_values.py, do not edit.",
+        f"# Sized for {len(spec.nodes)} nodes and {len(applications)} Applications.",
+    ]
+    return "\n".join(header) + "\n" + yaml.safe_dump(values, sort_keys=False)
+
+
+def main(argv: list[str] = None) -> int:
+    # Imported here so the Pulumi program doesn't load the offline renderer
+    from layers.settings import LabSettings
+    from render_config import StackFileConfig
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stack", required=True, help="stack whose config to read")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="don't write; exit 1 if the values differ from the cluster spec",
+    )
+    args = parser.parse_args(argv)
+
+    settings = LabSettings(StackFileConfig(args.stack))
+    previous = PERFORMANCE_VALUES.read_text() if PERFORMANCE_VALUES.exists() else ""
+    current = render_argocd_performance_file(settings.spec, read_applications())
+    diff = list(
+        difflib.unified_diff(
+            previous.splitlines(keepends=True),
+            current.splitlines(keepends=True),
+            fromfile=f"a/{PERFORMANCE_VALUES.name}",
+            tofile=f"b/{PERFORMANCE_VALUES.name}",
+        )
+    )
+    sys.stdout.writelines(diff)
+
+    if args.check:
+        return 1 if diff else 0
+
+    PERFORMANCE_VALUES.write_text(current)
+    print(f"Wrote {PERFORMANCE_VALUES} ({'changed' if diff else 'no changes'})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,667 @@
+"""
+Plan node capacity against what the workload manifests request.
+
+    python capacity_plan.py --stack dev              # print headroom, misfits and the fix
+    python capacity_plan.py --stack dev --json       # the same plan as JSON
+    python capacity_plan.py --stack dev --check      # CI: exit 1 if anything can't be scheduled
+    python capacity_plan.py --stack dev --no-charts  # only the plain manifests, no helm
+
+Workloads are the manifests under argocd/applications/manifests plus every
+ArgoCD Application's chart, rendered offline through chart_cache with the
+Application's value files. Charts that can't be rendered (no helm, chart
+not cached and no network, chart from git) are listed, not guessed.
+
+Scheduling is simulated like kube-scheduler's filters: node selectors,
+required node affinity, taints against tolerations, required hostname
+anti-affinity between replicas, and requests against allocatable cpu,
+memory, GPUs and pod slots. DaemonSets go first, one pod per node they run
+on; other replicas follow largest first, each on the node with the most
+capacity left. Replicas count at their peak: InferenceServices at
+maxReplicas, Jobs at their parallelism; CronJobs and vcluster tenants are
+left out. When something doesn't fit, the smallest change to one worker
+pool that fits everything is proposed: more nodes like the pool's, or
+bigger ones.
+"""
+
+import argparse
+import json
+import math
+import sys
+from pathlib import Path
+
+import yaml
+
+from chart_cache import merge_values, render_chart
+from cluster_spec import ClusterSpec, NodeSpec
+from kubelet import node_allocatable, parse_cpu, parse_memory_mib
+from talos_config import GPU_NODE_LABELS
+
+REPO_ROOT = Path(__file__).parent.parent
+APPLICATIONS_DIR = REPO_ROOT / "argocd" / "applications"
+MANIFESTS_DIR = APPLICATIONS_DIR / "manifests"
+
+RESOURCES = ("cpu", "memory", "gpu", "pods")
+GPU_RESOURCE = "nvidia.com/gpu"
+HOSTNAME_LABEL = "kubernetes.io/hostname"
+CONTROL_PLANE_LABEL = "node-role.kubernetes.io/control-plane"
+# Talos taints control planes unless allowSchedulingOnControlPlanes is set
+CONTROL_PLANE_TAINT = {"key": CONTROL_PLANE_LABEL, "value": "", "effect": "NoSchedule"}
+DEFAULT_MAX_PODS = 110
+
+# How far proposals search, and how they are compared: a core weighs as
+# much as this much memory, roughly the cpu:memory ratio of the lab's VMs
+MAX_NEW_NODES = 8
+MAX_RESIZE_STEPS = 4
+CORE_MEMORY_MIB = 4096
+
+WORKLOAD_KINDS = ("Deployment", "StatefulSet", "ReplicaSet", "DaemonSet", "Job", "Pod")
+
+
+# Nodes
+
+
+def plan_node(
+    node: NodeSpec, cpu: int = None, memory: int = None, name: str = None
+) -> dict:
+    """
+    Labels, taints and allocatable resources of a node as the scheduler
+    sees them; `cpu`, `memory` and `name` override the spec for proposals.
+    """
+    cpu = node.cpu if cpu is None else cpu
+    memory = node.memory if memory is None else memory
+    name = name or node.name
+
+    labels = {HOSTNAME_LABEL: name, "kubernetes.io/os": "linux"}
+    taints = []
+    if node.is_controlplane:
+        labels[CONTROL_PLANE_LABEL] = ""
+        taints.append(dict(CONTROL_PLANE_TAINT))
+    if node.enable_gpu:
+        labels.update(GPU_NODE_LABELS)
+    labels.update(node.labels)
+    for key, value in node.taints.items():
+        taint_value, _, effect = value.rpartition(":")
+        taints.append({"key": key, "value": taint_value, "effect": effect})
+
+    allocatable_cpu, allocatable_memory = node_allocatable(node.kubelet, cpu, memory)
+    # One GPU passed through per node, advertised once per sharing replica
+    gpus = (node.gpu_sharing or {}).get("replicas", 1) if node.enable_gpu else 0
+    return {
+        "name": name,
+        "pool": node.pool or node.name,
+        "spec": node,
+        "cpu_capacity": cpu,
+        "memory_capacity": memory,
+        "labels": labels,
+        "taints": taints,
+        "allocatable": {
+            "cpu": allocatable_cpu,
+            "memory": allocatable_memory,
+            "gpu": gpus,
+            "pods": int(node.kubelet.get("max_pods", DEFAULT_MAX_PODS)),
+        },
+    }
+
+
+# Workloads
+
+
+def _container_requests(container: dict) -> dict:
+    # Without requests, the scheduler uses the limits
+    resources = (container or {}).get("resources") or {}
+    requests = resources.get("requests") or {}
+    limits = resources.get("limits") or {}
+
+    def quantity(key: str):
+        return requests.get(key, limits.get(key))
+
+    cpu, memory, gpu = quantity("cpu"), quantity("memory"), quantity(GPU_RESOURCE)
+    return {
+        "cpu": parse_cpu(cpu) if cpu is not None else 0.0,
+        "memory": parse_memory_mib(memory) if memory is not None else 0.0,
+        "gpu": int(gpu) if gpu is not None else 0,
+    }
+
+
+def pod_requests(pod_spec: dict) -> dict:
+    """Effective requests of one pod: its containers, or its largest init container."""
+    totals = {"cpu": 0.0, "memory": 0.0, "gpu": 0}
+    for container in pod_spec.get("containers") or []:
+        for key, value in _container_requests(container).items():
+            totals[key] += value
+    for container in pod_spec.get("initContainers") or []:
+        for key, value in _container_requests(container).items():
+            totals[key] = max(totals[key], value)
+    return {**totals, "pods": 1}
+
+
+def _anti_affine_to_itself(pod_spec: dict, pod_labels: dict) -> bool:
+    """Whether required pod anti-affinity keeps two replicas off one node."""
+    terms = ((pod_spec.get("affinity") or {}).get("podAntiAffinity") or {}).get(
+        "requiredDuringSchedulingIgnoredDuringExecution"
+    ) or []
+    for term in terms:
+        if term.get("topologyKey") != HOSTNAME_LABEL:
+            continue
+        match_labels = (term.get("labelSelector") or {}).get("matchLabels") or {}
+        if match_labels and all(
+            pod_labels.get(k) == v for k, v in match_labels.items()
+        ):
+            return True
+    return False
+
+
+def _workload(
+    source: str, doc: dict, pod_spec: dict, replicas, pod_labels: dict = None
+) -> dict:
+    metadata = doc.get("metadata") or {}
+    return {
+        "name": f"{doc['kind']} {metadata.get('namespace', '-')}/{metadata.get('name')}",
+        "source": source,
+        "daemon": replicas is None,
+        "replicas": replicas,
+        "requests": pod_requests(pod_spec),
+        "node_selector": pod_spec.get("nodeSelector") or {},
+        "node_affinity": (
+            ((pod_spec.get("affinity") or {}).get("nodeAffinity") or {}).get(
+                "requiredDuringSchedulingIgnoredDuringExecution"
+            )
+            or {}
+        ).get("nodeSelectorTerms")
+        or [],
+        "tolerations": pod_spec.get("tolerations") or [],
+        "spread": _anti_affine_to_itself(pod_spec, pod_labels or {}),
+    }
+
+
+def workloads_from_documents(source: str, documents: list[dict]) -> list[dict]:
+    """Workloads in a list of manifests, with their pod template and replicas."""
+    workloads = []
+    for doc in documents:
+        kind = doc.get("kind")
+        spec = doc.get("spec") or {}
+        if kind in WORKLOAD_KINDS:
+            template = spec.get("template") or {}
+            pod_spec = spec if kind == "Pod" else template.get("spec") or {}
+            pod_labels = (template.get("metadata") or {}).get("labels") or {}
+            if kind == "DaemonSet":
+                replicas = None
+            elif kind == "Job":
+                replicas = int(spec.get("parallelism", 1))
+            elif kind == "Pod":
+                replicas = 1
+            else:
+                replicas = int(spec.get("replicas", 1))
+            if replicas != 0:
+                workloads.append(_workload(source, doc, pod_spec, replicas, pod_labels))
+        elif kind == "InferenceService":
+            predictor = spec.get("predictor") or {}
+            containers = list(predictor.get("containers") or [])
+            if predictor.get("model"):
+                containers.insert(0, predictor["model"])
+            # Scale-to-zero predictors still need room for their peak
+            replicas = int(
+                predictor.get("maxReplicas") or predictor.get("minReplicas") or 1
+            )
+            workloads.append(
+                _workload(
+                    source, doc, {**predictor, "containers": containers}, replicas
+                )
+            )
+        elif kind == "Alloy":
+            # The Alloy operator runs the collector as the controller type says
+            controller = spec.get("controller") or {}
+            pod_spec = {
+                "containers": [
+                    {"resources": (spec.get("alloy") or {}).get("resources")}
+                ],
+                "nodeSelector": controller.get("nodeSelector"),
+                "tolerations": controller.get("tolerations"),
+                "affinity": controller.get("affinity"),
+            }
+            replicas = (
+                None
+                if controller.get("type", "daemonset") == "daemonset"
+                else int(controller.get("replicas", 1))
+            )
+            workloads.append(_workload(source, doc, pod_spec, replicas))
+    return workloads
+
+
+def _read_yaml_documents(path: Path) -> list[dict]:
+    with open(path, "r") as f:
+        return [doc for doc in yaml.safe_load_all(f) if isinstance(doc, dict)]
+
+
+def _chart_values(source: dict) -> dict:
+    """The values an Application passes to its chart, from `$values` files and inline."""
+    helm = source.get("helm") or {}
+    values = {}
+    for value_file in helm.get("valueFiles") or []:
+        if not value_file.startswith("$values/"):
+            continue
+        path = REPO_ROOT / value_file.removeprefix("$values/")
+        if not path.exists():
+            if helm.get("ignoreMissingValueFiles"):
+                continue
+            raise ValueError(f"Value file {value_file} does not exist")
+        with open(path, "r") as f:
+            values = merge_values(values, yaml.safe_load(f) or {})
+    if helm.get("values"):
+        values = merge_values(values, yaml.safe_load(helm["values"]) or {})
+    return merge_values(values, helm.get("valuesObject") or {})
+
+
+def read_workloads(render_charts: bool = True) -> tuple[list[dict], list[dict]]:
+    """
+    Workloads from the plain manifests and the Applications' charts, and the
+    charts that could not be rendered with the reason.
+    """
+    workloads = []
+    for path in sorted(MANIFESTS_DIR.rglob("*.yaml")):
+        source = str(path.relative_to(APPLICATIONS_DIR))
+        workloads.extend(workloads_from_documents(source, _read_yaml_documents(path)))
+
+    unrendered = []
+    if not render_charts:
+        return workloads, unrendered
+
+    for path in sorted(APPLICATIONS_DIR.glob("*.yaml")):
+        app = (_read_yaml_documents(path) or [{}])[0]
+        if app.get("kind") != "Application":
+            continue
+        spec = app["spec"]
+        namespace = spec["destination"].get("namespace", "default")
+        for source in spec.get("sources") or [spec["source"]]:
+            if "chart" not in source:
+                if "helm" in source:
+                    unrendered.append(
+                        {
+                            "application": app["metadata"]["name"],
+                            "reason": "chart from git",
+                        }
+                    )
+                continue
+            chart = {
+                "repo": source["repoURL"],
+                "chart": source["chart"],
+                "version": str(source["targetRevision"]),
+            }
+            release = (source.get("helm") or {}).get("releaseName") or app["metadata"][
+                "name"
+            ]
+            label = f"{app['metadata']['name']} ({chart['chart']} {chart['version']})"
+            try:
+                rendered = render_chart(
+                    chart, release, namespace, _chart_values(source)
+                )
+            except (ValueError, OSError) as error:
+                unrendered.append({"application": label, "reason": str(error)})
+                continue
+            documents = [
+                doc for doc in yaml.safe_load_all(rendered) if isinstance(doc, dict)
+            ]
+            for doc in documents:
+                doc.setdefault("metadata", {}).setdefault("namespace", namespace)
+            workloads.extend(workloads_from_documents(label, documents))
+    return workloads, unrendered
+
+
+# Scheduling
+
+
+def _tolerates(tolerations: list, taint: dict) -> bool:
+    for toleration in tolerations:
+        if toleration.get("effect") and toleration["effect"] != taint["effect"]:
+            continue
+        if toleration.get("operator") == "Exists":
+            if not toleration.get("key") or toleration["key"] == taint["key"]:
+                return True
+        elif toleration.get("key") == taint["key"] and str(
+            toleration.get("value", "")
+        ) == str(taint.get("value", "")):
+            return True
+    return False
+
+
+def _matches_expression(labels: dict, expression: dict) -> bool:
+    key, operator = expression["key"], expression["operator"]
+    values = [str(value) for value in expression.get("values") or []]
+    if operator == "In":
+        return key in labels and labels[key] in values
+    if operator == "NotIn":
+        return key not in labels or labels[key] not in values
+    if operator == "Exists":
+        return key in labels
+    if operator == "DoesNotExist":
+        return key not in labels
+    if operator in ("Gt", "Lt") and key in labels:
+        number = int(labels[key])
+        return number > int(values[0]) if operator == "Gt" else number < int(values[0])
+    return False
+
+
+def unfit_reason(workload: dict, node: dict) -> str:
+    """Why a node's labels or taints rule the workload out, or None."""
+    labels = node["labels"]
+    for key, value in workload["node_selector"].items():
+        if labels.get(key) != str(value):
+            return f"node selector {key}={value}"
+    terms = workload["node_affinity"]
+    if terms and not any(
+        all(_matches_expression(labels, e) for e in term.get("matchExpressions") or [])
+        for term in terms
+    ):
+        return "node affinity"
+    for taint in node["taints"]:
+        if taint["effect"] == "PreferNoSchedule":
+            continue
+        if not _tolerates(workload["tolerations"], taint):
+            value = f"={taint['value']}" if taint.get("value") else ""
+            return f"taint {taint['key']}{value}:{taint['effect']}"
+    return None
+
+
+def _short_of(requests: dict, free: dict) -> list[str]:
+    return [key for key in RESOURCES if requests[key] > free[key] + 1e-9]
+
+
+def simulate(nodes: list[dict], workloads: list[dict]) -> dict:
+    """Place every workload's pods on the nodes; return the usage and the misfits."""
+    used = {node["name"]: {key: 0 for key in RESOURCES} for node in nodes}
+    placed = {node["name"]: [] for node in nodes}
+    unschedulable = []
+
+    def free(node: dict) -> dict:
+        return {
+            key: node["allocatable"][key] - used[node["name"]][key] for key in RESOURCES
+        }
+
+    def place(workload: dict, node: dict):
+        for key in RESOURCES:
+            used[node["name"]][key] += workload["requests"][key]
+        placed[node["name"]].append(workload["name"])
+
+    def misfit(workload: dict, count: int, reasons: dict):
+        unschedulable.append(
+            {
+                "workload": workload["name"],
+                "source": workload["source"],
+                "unplaced": count,
+                "reasons": reasons,
+            }
+        )
+
+    for workload in (w for w in workloads if w["daemon"]):
+        reasons = {}
+        for node in nodes:
+            if unfit_reason(workload, node):
+                continue
+            short = _short_of(workload["requests"], free(node))
+            if short:
+                reasons[node["name"]] = "insufficient " + ", ".join(short)
+            else:
+                place(workload, node)
+        if reasons:
+            misfit(workload, len(reasons), reasons)
+
+    def size(workload: dict) -> tuple:
+        requests = workload["requests"]
+        return (requests["gpu"], requests["memory"], requests["cpu"])
+
+    for workload in sorted(
+        (w for w in workloads if not w["daemon"]), key=size, reverse=True
+    ):
+        reasons = {}
+        for node in nodes:
+            reason = unfit_reason(workload, node)
+            if reason:
+                reasons[node["name"]] = reason
+        eligible = [node for node in nodes if node["name"] not in reasons]
+
+        for replica in range(workload["replicas"]):
+            candidates = []
+            for node in eligible:
+                if workload["spread"] and workload["name"] in placed[node["name"]]:
+                    reasons[node["name"]] = "anti-affinity with another replica"
+                    continue
+                node_free = free(node)
+                short = _short_of(workload["requests"], node_free)
+                if short:
+                    reasons[node["name"]] = "insufficient " + ", ".join(short)
+                    continue
+                # Least allocated: the share of cpu or memory left after placing
+                score = min(
+                    (node_free[key] - workload["requests"][key])
+                    / node["allocatable"][key]
+                    for key in ("cpu", "memory")
+                    if node["allocatable"][key] > 0
+                )
+                candidates.append((score, node["name"], node))
+            if not candidates:
+                misfit(workload, workload["replicas"] - replica, reasons)
+                break
+            place(workload, max(candidates, key=lambda c: (c[0], c[1]))[2])
+
+    return {"used": used, "placed": placed, "unschedulable": unschedulable}
+
+
+def node_headroom(nodes: list[dict], used: dict) -> dict:
+    """Requested, allocatable and free resources per node."""
+    headroom = {}
+    for node in nodes:
+        allocatable = node["allocatable"]
+        headroom[node["name"]] = {
+            key: {
+                "requested": round(used[node["name"]][key], 2),
+                "allocatable": round(allocatable[key], 2),
+                "free": round(allocatable[key] - used[node["name"]][key], 2),
+            }
+            for key in RESOURCES
+        }
+    return headroom
+
+
+# Proposals
+
+
+def _pools(nodes: list[dict]) -> dict:
+    """Worker pools: pool members, or a standalone worker as a pool of one."""
+    pools = {}
+    for node in nodes:
+        if not node["spec"].is_controlplane:
+            pools.setdefault(node["pool"], []).append(node)
+    return pools
+
+
+def _propose_add(
+    nodes: list[dict], workloads: list[dict], pool: str, members: list
+) -> dict:
+    template = members[0]["spec"]
+    for count in range(1, MAX_NEW_NODES + 1):
+        added = [
+            plan_node(template, name=f"{pool}-new-{i:02d}") for i in range(1, count + 1)
+        ]
+        if not simulate(nodes + added, workloads)["unschedulable"]:
+            return {
+                "pool": pool,
+                "change": "add",
+                "nodes": count,
+                "like": template.name,
+                "cost": count * (template.cpu * CORE_MEMORY_MIB + template.memory),
+            }
+    return None
+
+
+def _propose_resize(
+    nodes: list[dict], workloads: list[dict], pool: str, members: list
+) -> dict:
+    names = {node["name"] for node in members}
+    others = [node for node in nodes if node["name"] not in names]
+
+    def resized(extra_cpu: int, extra_memory: int) -> list[dict]:
+        return others + [
+            plan_node(
+                node["spec"],
+                cpu=node["cpu_capacity"] + extra_cpu,
+                memory=node["memory_capacity"] + extra_memory,
+            )
+            for node in members
+        ]
+
+    # Unbounded members show how much the pool would use; GPUs and pod
+    # slots don't grow with the VM, so misfits on those can't be fixed here
+    unbounded = resized(1024, 1024**3)
+    trial = simulate(unbounded, workloads)
+    if trial["unschedulable"]:
+        return None
+    extra_cpu = extra_memory = 0
+    for node in members:
+        allocatable = node["allocatable"]
+        usage = trial["used"][node["name"]]
+        extra_cpu = max(extra_cpu, math.ceil(usage["cpu"] - allocatable["cpu"] - 1e-9))
+        extra_memory = max(
+            extra_memory,
+            math.ceil((usage["memory"] - allocatable["memory"]) / 1024 - 1e-9) * 1024,
+        )
+
+    # The finite sizes can place pods differently, so grow until it all fits
+    for _ in range(MAX_RESIZE_STEPS + 1):
+        if not simulate(resized(extra_cpu, extra_memory), workloads)["unschedulable"]:
+            template = members[0]
+            return {
+                "pool": pool,
+                "change": "resize",
+                "nodes": len(members),
+                "cpu": [template["cpu_capacity"], template["cpu_capacity"] + extra_cpu],
+                "memory": [
+                    template["memory_capacity"],
+                    template["memory_capacity"] + extra_memory,
+                ],
+                "cost": len(members) * (extra_cpu * CORE_MEMORY_MIB + extra_memory),
+            }
+        extra_cpu += 1
+        extra_memory += 1024
+    return None
+
+
+def propose_changes(nodes: list[dict], workloads: list[dict]) -> list[dict]:
+    """Changes to a single worker pool that fit every workload, smallest first."""
+    proposals = []
+    for pool, members in _pools(nodes).items():
+        for propose in (_propose_resize, _propose_add):
+            proposal = propose(nodes, workloads, pool, members)
+            if proposal:
+                proposals.append(proposal)
+    return sorted(proposals, key=lambda proposal: (proposal["cost"], proposal["pool"]))
+
+
+def build_capacity_plan(
+    spec: ClusterSpec, workloads: list[dict], unrendered: list = None
+) -> dict:
+    """Headroom per node, the workloads that don't fit and the changes that fix them."""
+    nodes = [plan_node(node) for node in spec.nodes if not node.is_external]
+    result = simulate(nodes, workloads)
+    return {
+        "headroom": node_headroom(nodes, result["used"]),
+        "unschedulable": result["unschedulable"],
+        "proposals": (
+            propose_changes(nodes, workloads) if result["unschedulable"] else []
+        ),
+        # External nodes' hardware isn't in the config
+        "skipped_nodes": [node.name for node in spec.nodes if node.is_external],
+        "unrendered": unrendered or [],
+        "workloads": len(workloads),
+    }
+
+
+def _describe_proposal(proposal: dict) -> str:
+    if proposal["change"] == "add":
+        pool = (
+            ""
+            if proposal["pool"] == proposal["like"]
+            else f" to pool {proposal['pool']}"
+        )
+        return f"add {proposal['nodes']} node(s) like {proposal['like']}{pool}"
+    cpu, memory = proposal["cpu"], proposal["memory"]
+    changes = []
+    if cpu[1] != cpu[0]:
+        changes.append(f"cpu {cpu[0]} -> {cpu[1]}")
+    if memory[1] != memory[0]:
+        changes.append(f"memory {memory[0]} -> {memory[1]}")
+    return (
+        f"resize {proposal['pool']} ({proposal['nodes']} node(s)): {', '.join(changes)}"
+    )
+
+
+def format_capacity_plan(plan: dict) -> str:
+    lines = [f"Headroom (requested / allocatable) for {plan['workloads']} workloads:"]
+    for name, headroom in plan["headroom"].items():
+        cells = []
+        for key, unit in (("cpu", ""), ("memory", "Mi"), ("gpu", ""), ("pods", "")):
+            usage = headroom[key]
+            if key == "gpu" and not usage["allocatable"]:
+                continue
+            share = (
+                usage["requested"] / usage["allocatable"] if usage["allocatable"] else 0
+            )
+            cells.append(
+                f"{key} {usage['requested']:g}/{usage['allocatable']:g}{unit} ({share:.0%})"
+            )
+        lines.append(f"  {name:<24} " + "  ".join(cells))
+
+    if plan["unschedulable"]:
+        lines.append("Unschedulable:")
+        for misfit in plan["unschedulable"]:
+            lines.append(
+                f"  {misfit['workload']} ({misfit['source']}): {misfit['unplaced']} pod(s)"
+            )
+            for node, reason in misfit["reasons"].items():
+                lines.append(f"    {node}: {reason}")
+        if plan["proposals"]:
+            lines.append(f"Smallest fix: {_describe_proposal(plan['proposals'][0])}")
+            for proposal in plan["proposals"][1:]:
+                lines.append(f"  or: {_describe_proposal(proposal)}")
+        else:
+            lines.append("No single worker pool change fits everything")
+    else:
+        lines.append("Every workload fits")
+
+    for name in plan["skipped_nodes"]:
+        lines.append(f"Skipped external node {name}: size unknown")
+    for chart in plan["unrendered"]:
+        lines.append(f"Not rendered: {chart['application']}: {chart['reason']}")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: list[str] = None) -> int:
+    # Imported here so the Pulumi program doesn't load the offline renderer
+    from layers.settings import LabSettings
+    from render_config import StackFileConfig
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stack", required=True, help="stack whose config to read")
+    parser.add_argument("--json", action="store_true", help="print the plan as JSON")
+    parser.add_argument(
+        "--check", action="store_true", help="exit 1 if any workload can't be scheduled"
+    )
+    parser.add_argument(
+        "--no-charts",
+        action="store_true",
+        help="skip rendering the Applications' charts",
+    )
+    args = parser.parse_args(argv)
+
+    settings = LabSettings(StackFileConfig(args.stack))
+    workloads, unrendered = read_workloads(render_charts=not args.no_charts)
+    plan = build_capacity_plan(settings.spec, workloads, unrendered)
+
+    if args.json:
+        print(json.dumps(plan, indent=2))
+    else:
+        sys.stdout.write(format_capacity_plan(plan))
+    return 1 if args.check and plan["unschedulable"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
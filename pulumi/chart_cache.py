@@ -0,0 +1,311 @@
+"""
+Local, content-addressed cache for the Helm charts installed by Pulumi.
+
+Charts are pinned by the ArgoCD Application manifests, or in PINNED_CHARTS for
+charts no Application installs. The sha256 of every chart version is locked
+in the committed `charts.lock.json`. Each version is downloaded once,
+verified against the lock and stored as `sha256/<digest>.tgz`, so previews
+and rebuilds never touch the chart repository, and a chart repository
+serving a different archive later is caught on every machine. Charts
+rendered offline with `helm template` are cached under `rendered/`, keyed
+by chart version and values hash. A version missing from the lock is locked
+on its first download; lock every pinned version up front (checked against
+the digest in the repository index) with:
+
+    python chart_cache.py refresh
+"""
+
+import copy
+import hashlib
+import json
+import subprocess
+import sys
+import tempfile
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+import yaml
+
+PROJECT_DIR = Path(__file__).parent
+CACHE_DIR = PROJECT_DIR / ".chart-cache"
+RENDER_DIR = CACHE_DIR / "rendered"
+LOCK_FILE = PROJECT_DIR / "charts.lock.json"
+REPO_ROOT = PROJECT_DIR.parent
+APPLICATIONS_DIR = REPO_ROOT / "argocd" / "applications"
+
+# ArgoCD Applications whose first source is a chart Pulumi installs itself
+PINNED_CHART_APPS = {
+    "argocd": REPO_ROOT / "argocd" / "applications" / "argocd.yaml",
+    # Rendered into the control planes' inline manifests at bootstrap
+    "cilium": REPO_ROOT / "argocd" / "applications" / "cilium.yaml",
+}
+
+# Charts Pulumi installs that have no ArgoCD Application to pin them
+PINNED_CHARTS = {
+    "vcluster": {
+        "repo": "https://charts.loft.sh",
+        "chart": "vcluster",
+        "version": "0.26.0",
+    },
+}
+
+
+def read_argocd_chart_source(app_path: Path) -> dict:
+    """Read repo, chart and version from an ArgoCD Application's first source."""
+    with open(app_path, "r") as f:
+        app = yaml.safe_load(f)
+    source = app["spec"]["sources"][0]
+    return {
+        "repo": source["repoURL"],
+        "chart": source["chart"],
+        "version": str(source["targetRevision"]),
+    }
+
+
+def merge_values(base: dict, overrides: dict) -> dict:
+    """
+    Merge Helm values the way helm merges value files: dicts recursively,
+    anything else replaced. Neither input is modified.
+    """
+    merged = copy.deepcopy(base)
+    for key, value in (overrides or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_values(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def _cache_key(repo: str, chart: str, version: str) -> str:
+    return f"{repo.rstrip('/')}|{chart}|{version}"
+
+
+def application_chart_sources() -> list[dict]:
+    """Repo, chart and version of every chart source of the ArgoCD Applications."""
+    sources = []
+    for path in sorted(APPLICATIONS_DIR.glob("*.yaml")):
+        with open(path, "r") as f:
+            app = yaml.safe_load(f) or {}
+        if app.get("kind") != "Application":
+            continue
+        for source in app["spec"].get("sources") or [app["spec"]["source"]]:
+            if "chart" in source:
+                sources.append(
+                    {
+                        "repo": source["repoURL"],
+                        "chart": source["chart"],
+                        "version": str(source["targetRevision"]),
+                    }
+                )
+    return sources
+
+
+def _load_lock() -> dict:
+    if LOCK_FILE.exists():
+        return json.loads(LOCK_FILE.read_text())
+    return {}
+
+
+def _save_lock(lock: dict):
+    LOCK_FILE.write_text(json.dumps(lock, indent=2, sort_keys=True) + "\n")
+
+
+def _archive_path(digest: str) -> Path:
+    return CACHE_DIR / "sha256" / f"{digest}.tgz"
+
+
+def _download_chart(repo: str, chart: str, version: str, locked: str = None) -> str:
+    """
+    Download a chart version into the cache and return its sha256 digest,
+    which must match the repository index and the `locked` digest if given.
+    """
+    repo = repo.rstrip("/")
+    try:
+        with urllib.request.urlopen(f"{repo}/index.yaml", timeout=60) as response:
+            repo_index = yaml.safe_load(response.read())
+
+        entries = repo_index.get("entries", {}).get(chart, [])
+        entry = next((e for e in entries if str(e["version"]) == version), None)
+        if entry is None:
+            raise ValueError(f"Chart {chart} {version} not found in {repo}")
+
+        url = urllib.parse.urljoin(f"{repo}/", entry["urls"][0])
+        with urllib.request.urlopen(url, timeout=300) as response:
+            archive = response.read()
+    except OSError as error:
+        # URLError, HTTPError and timeouts; previews shouldn't need the network
+        raise ValueError(
+            f"Chart {chart} {version} is not cached and could not be downloaded from {repo} ({error}); "
+            "run `python chart_cache.py refresh` with network access"
+        ) from error
+
+    digest = hashlib.sha256(archive).hexdigest()
+    expected = entry.get("digest")
+    if expected and expected != digest:
+        raise ValueError(
+            f"Digest mismatch for {chart} {version}: index says {expected}, got {digest}"
+        )
+    if locked and locked != digest:
+        raise ValueError(
+            f"Digest mismatch for {chart} {version}: {LOCK_FILE.name} says {locked}, got {digest}"
+        )
+
+    path = _archive_path(digest)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write atomically so an interrupted download never looks cached
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as tmp:
+        tmp.write(archive)
+    Path(tmp.name).replace(path)
+    return digest
+
+
+def _verify_archive(digest: str) -> bool:
+    path = _archive_path(digest)
+    return path.exists() and hashlib.sha256(path.read_bytes()).hexdigest() == digest
+
+
+def _resolve_digest(repo: str, chart: str, version: str) -> str:
+    """
+    Return the locked digest of a chart version, downloading the archive
+    only when it is not cached yet (or the cached archive is corrupt). A
+    version missing from the lock is locked on its first download.
+    """
+    # OCI registries aren't Helm repositories with an index.yaml
+    if not repo.startswith(("http://", "https://")):
+        raise ValueError(
+            f"Chart {chart} {version}: {repo} is not an HTTP chart repository, which the chart cache can't download from"
+        )
+    lock = _load_lock()
+    key = _cache_key(repo, chart, version)
+    digest = lock.get(key)
+    if digest is None:
+        # Lock on first use, checked against the repository index, so every
+        # later download on any machine must match it once committed
+        digest = _download_chart(repo, chart, version)
+        _save_lock({**lock, key: digest})
+        print(
+            f"locked {chart} {version} sha256:{digest} in {LOCK_FILE.name}; commit it",
+            file=sys.stderr,
+        )
+    elif not _verify_archive(digest):
+        _download_chart(repo, chart, version, locked=digest)
+    return digest
+
+
+def resolve_chart(repo: str, chart: str, version: str) -> str:
+    """
+    Return the archive path of a locked chart version, relative to the
+    Pulumi project directory so it is the same in every checkout.
+    """
+    digest = _resolve_digest(repo, chart, version)
+    return str(_archive_path(digest).relative_to(PROJECT_DIR))
+
+
+def pinned_chart_source(name: str) -> dict:
+    """Repo, chart and version of a chart in PINNED_CHART_APPS or PINNED_CHARTS."""
+    if name in PINNED_CHART_APPS:
+        return read_argocd_chart_source(PINNED_CHART_APPS[name])
+    return dict(PINNED_CHARTS[name])
+
+
+def resolve_pinned_chart(name: str) -> dict:
+    """Resolve a pinned chart to its source and local archive."""
+    source = pinned_chart_source(name)
+    return {**source, "path": resolve_chart(**source)}
+
+
+def render_chart(source: dict, release: str, namespace: str, values: dict) -> str:
+    """
+    Render a chart with `helm template` from the local archive, caching the
+    output by chart version and a hash of the values. The values must not
+    make the chart generate random data (certificates, passwords), or the
+    cached render stops matching a fresh one.
+    """
+    values_json = json.dumps(values, sort_keys=True, separators=(",", ":"))
+    values_hash = hashlib.sha256(
+        f"{release}|{namespace}|{values_json}".encode("utf-8")
+    ).hexdigest()[:16]
+    path = RENDER_DIR / f"{source['chart']}-{source['version']}-{values_hash}.yaml"
+    if path.exists():
+        return path.read_text()
+
+    # Absolute, as the generator CLIs don't run from the project directory
+    archive = str(_archive_path(_resolve_digest(**source)))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", suffix=".yaml") as values_file:
+        values_file.write(values_json)
+        values_file.flush()
+        try:
+            result = subprocess.run(
+                [
+                    "helm",
+                    "template",
+                    release,
+                    archive,
+                    "--namespace",
+                    namespace,
+                    "--values",
+                    values_file.name,
+                ],
+                capture_output=True,
+                text=True,
+            )
+        except FileNotFoundError as error:
+            raise ValueError(
+                f"helm is needed to render {source['chart']} {source['version']} but is not on PATH; "
+                "install helm (the chart itself comes from the cache, see `python chart_cache.py refresh`)"
+            ) from error
+    if result.returncode != 0:
+        raise ValueError(
+            f"helm template {source['chart']} {source['version']} failed: {result.stderr.strip()}"
+        )
+
+    with tempfile.NamedTemporaryFile("w", dir=path.parent, delete=False) as tmp:
+        tmp.write(result.stdout)
+    Path(tmp.name).replace(path)
+    return result.stdout
+
+
+def refresh() -> dict:
+    """
+    Download and verify every pinned and Application chart, lock the
+    digests of new versions, then drop lock entries and archives that are
+    no longer used. Versions already locked must still match the lock.
+    """
+    previous = _load_lock()
+    sources = [
+        pinned_chart_source(name) for name in [*PINNED_CHART_APPS, *PINNED_CHARTS]
+    ]
+    sources += application_chart_sources()
+
+    lock = {}
+    for source in sources:
+        key = _cache_key(**source)
+        if key in lock:
+            continue
+        if not source["repo"].startswith(("http://", "https://")):
+            # OCI registries aren't Helm repositories with an index.yaml
+            print(
+                f"skipped {source['chart']} {source['version']}: {source['repo']} is not an HTTP chart repository"
+            )
+            continue
+        digest = _download_chart(**source, locked=previous.get(key))
+        lock[key] = digest
+        print(f"{source['chart']} {source['version']} sha256:{digest}")
+
+    _save_lock(lock)
+
+    keep = {_archive_path(digest) for digest in lock.values()}
+    for archive in (CACHE_DIR / "sha256").glob("*.tgz"):
+        if archive not in keep:
+            archive.unlink()
+            print(f"pruned {archive.name}")
+
+    return lock
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["refresh"]:
+        sys.exit("usage: python chart_cache.py refresh")
+    refresh()
@@ -0,0 +1,389 @@
+"""
+Compiled cluster spec: the stack's node and cluster config validated,
+normalised and hashed in one pass, before any provider is created.
+
+Components read `NodeSpec`/`ClusterSpec` attributes instead of raw config
+dicts, so defaults live here only and a typo fails with the node and key
+named. Content hashes are stable across runs and change exactly when an
+input of a node's machine config or of an image profile changes, so they
+can key render caches and image builds.
+"""
+
+import difflib
+import hashlib
+import ipaddress
+import json
+from dataclasses import dataclass
+
+from chart_cache import pinned_chart_source
+from control_plane import render_control_plane_profile
+from etcd import resolve_etcd_config
+from gpu_sharing import validate_gpu_sharing
+from kubelet import resolve_kubelet_config
+from node_pools import POOL_NODE_KEYS
+from volumes import validate_volumes
+
+# Talos image profiles, selected per node with `talosImage`
+IMAGE_PROFILES = {
+    "default": {
+        "extensions": [
+            "siderolabs/iscsi-tools",
+        ],
+    },
+    "gpu": {
+        "extensions": [
+            "siderolabs/iscsi-tools",
+            "siderolabs/nvidia-open-gpu-kernel-modules-lts",
+            "siderolabs/nvidia-container-toolkit",
+        ],
+    },
+    "no-qemu": {
+        "extensions": [
+            "siderolabs/iscsi-tools",
+        ],
+        "upload_to_proxmox": False,
+    },
+}
+
+NODE_KEYS = ("name", "ip", "pool", *POOL_NODE_KEYS)
+NODE_ROLES = ("controlplane", "worker")
+NODE_TYPES = ("proxmox", "external")
+TAINT_EFFECTS = ("NoSchedule", "PreferNoSchedule", "NoExecute")
+
+
+def content_hash(value) -> str:
+    """Short sha256 of a JSON-serialisable value, independent of key order."""
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), default=list)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass(frozen=True, slots=True)
+class ImageProfileSpec:
+    name: str
+    talos_version: str
+    extensions: tuple
+    platform: str
+    arch: str
+    upload_to_proxmox: bool
+    content_hash: str
+
+
+@dataclass(frozen=True, slots=True)
+class NodeSpec:
+    name: str
+    ip: str
+    role: str
+    type: str
+    cpu: int
+    memory: int  # MiB
+    machine: str
+    image_profile: str
+    install_disk: str
+    disks: tuple  # system disks, defaults resolved
+    volumes: tuple  # resolved by volumes.validate_volumes
+    pcie_devices: tuple
+    gpu_sharing: dict  # resolved by gpu_sharing.validate_gpu_sharing, or None
+    kubelet: dict  # resolved by kubelet.resolve_kubelet_config
+    labels: dict
+    taints: dict  # key -> "value:Effect", as Talos nodeTaints
+    pool: str  # pool the node was expanded from, or None
+    content_hash: str
+
+    @property
+    def is_controlplane(self) -> bool:
+        return self.role == "controlplane"
+
+    @property
+    def is_external(self) -> bool:
+        return self.type == "external"
+
+    @property
+    def enable_gpu(self) -> bool:
+        return bool(self.pcie_devices)
+
+
+@dataclass(frozen=True, slots=True)
+class ClusterSpec:
+    cluster_name: str
+    talos_version: str
+    kubernetes_version: str
+    endpoint_ip: str
+    vip: str  # shared control-plane VIP, or None
+    gateway: str
+    network_prefix: int
+    use_cilium: bool
+    cilium_version: str
+    etcd: dict  # resolved by etcd.resolve_etcd_config, or None
+    control_plane: dict  # rendered by control_plane.render_control_plane_profile
+    nodes: tuple  # NodeSpec, in config order
+    image_profiles: dict  # name -> ImageProfileSpec
+    content_hash: str
+
+    @property
+    def controlplanes(self) -> tuple:
+        return tuple(node for node in self.nodes if node.is_controlplane)
+
+    @property
+    def workers(self) -> tuple:
+        return tuple(node for node in self.nodes if not node.is_controlplane)
+
+    @property
+    def bootstrap_node(self) -> NodeSpec:
+        """The control plane at the endpoint address, else the first one."""
+        for node in self.controlplanes:
+            if node.ip == self.endpoint_ip:
+                return node
+        return self.controlplanes[0]
+
+    def node(self, name: str) -> NodeSpec:
+        for node in self.nodes:
+            if node.name == name:
+                return node
+        raise KeyError(name)
+
+
+def _check_keys(where: str, config: dict, allowed: tuple):
+    """Reject unknown keys, suggesting the closest known one for typos."""
+    for key in config:
+        if key in allowed:
+            continue
+        close = difflib.get_close_matches(key, allowed, n=1)
+        hint = f", did you mean '{close[0]}'?" if close else ""
+        raise ValueError(f"{where}: unknown setting '{key}'{hint}")
+
+
+def _positive_int(where: str, key: str, value) -> int:
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{where}: {key} must be an integer, got {value!r}") from None
+    if number < 1:
+        raise ValueError(f"{where}: {key} must be positive, got {number}")
+    return number
+
+
+def _compile_taints(where: str, taints) -> dict:
+    # An empty list was the historical default for "no taints"
+    if not taints:
+        return {}
+    if not isinstance(taints, dict):
+        raise ValueError(f"{where}: taints must map a key to 'value:Effect'")
+    for key, value in taints.items():
+        effect = str(value).rsplit(":", 1)[-1]
+        if effect not in TAINT_EFFECTS:
+            raise ValueError(
+                f"{where}: taint '{key}' needs an effect from {TAINT_EFFECTS}, got '{value}'"
+            )
+    return {key: str(value) for key, value in taints.items()}
+
+
+def _compile_vip(vip, gateway: str, network_prefix: int) -> str:
+    # Talos announces the VIP with gratuitous ARP, so it must share the nodes' subnet
+    if not vip:
+        return None
+    try:
+        address = ipaddress.IPv4Address(vip)
+    except ipaddress.AddressValueError:
+        raise ValueError(
+            f"control_plane_vip must be an IPv4 address, got {vip!r}"
+        ) from None
+    subnet = ipaddress.ip_network(f"{gateway}/{network_prefix}", strict=False)
+    if address not in subnet or address == ipaddress.IPv4Address(gateway):
+        raise ValueError(
+            f"control_plane_vip {address} must be a free address in the node subnet {subnet}"
+        )
+    return str(address)
+
+
+def _compile_cilium_version(cilium_version) -> str:
+    # The bootstrap render must be the release ArgoCD takes over, and the
+    # only version `chart_cache.py refresh` locks
+    pinned = pinned_chart_source("cilium")["version"]
+    if cilium_version and str(cilium_version) != pinned:
+        raise ValueError(
+            f"cilium_version {cilium_version} differs from {pinned} in argocd/applications/cilium.yaml; "
+            "bump the Application instead, or remove cilium_version"
+        )
+    return pinned
+
+
+def compile_image_profiles(talos_version: str) -> dict:
+    """Image profile specs for the given Talos version, keyed by profile name."""
+    profiles = {}
+    for name, profile in IMAGE_PROFILES.items():
+        fields = {
+            "name": name,
+            "talos_version": talos_version,
+            # Order is kept: it is part of the schematic, and so of its ID
+            "extensions": tuple(profile["extensions"]),
+            "platform": profile.get("platform", "nocloud"),
+            "arch": profile.get("arch", "amd64"),
+            "upload_to_proxmox": profile.get("upload_to_proxmox", True),
+        }
+        profiles[name] = ImageProfileSpec(**fields, content_hash=content_hash(fields))
+    return profiles
+
+
+def compile_node(config: dict, shared_hash: str, image_profiles: dict) -> NodeSpec:
+    """Validate one node's config and resolve its defaults."""
+    name = config.get("name")
+    if not name:
+        raise ValueError(f"Every node needs a name, got {config}")
+    where = f"Node '{name}'"
+    _check_keys(where, config, NODE_KEYS)
+
+    try:
+        ip = str(ipaddress.IPv4Address(config.get("ip")))
+    except (ipaddress.AddressValueError, TypeError):
+        raise ValueError(
+            f"{where}: ip must be an IPv4 address, got {config.get('ip')!r}"
+        ) from None
+
+    role = config.get("role")
+    if role not in NODE_ROLES:
+        raise ValueError(f"{where}: role must be one of {NODE_ROLES}, got {role!r}")
+    node_type = config.get("type", "proxmox")
+    if node_type not in NODE_TYPES:
+        raise ValueError(
+            f"{where}: type must be one of {NODE_TYPES}, got {node_type!r}"
+        )
+    image_profile = config.get("talosImage", "default")
+    if image_profile not in image_profiles:
+        raise ValueError(
+            f"{where}: talosImage must be one of {list(image_profiles)}, got {image_profile!r}"
+        )
+
+    cpu = _positive_int(where, "cpu", config.get("cpu", 2))
+    memory = _positive_int(where, "memory", config.get("memory", 2048))
+    external = node_type == "external"
+    fields = {
+        "name": name,
+        "ip": ip,
+        "role": role,
+        "type": node_type,
+        "cpu": cpu,
+        "memory": memory,
+        "machine": config.get("machine", "q35"),
+        "image_profile": image_profile,
+        "install_disk": config.get("install_disk", "/dev/sda"),
+        "disks": tuple(
+            {
+                **disk,
+                "size": _positive_int(where, "disks.size", disk.get("size", 20)),
+                "datastore_id": disk.get("datastore_id", "local-lvm"),
+                "file_format": disk.get("file_format", "raw"),
+            }
+            for disk in config.get("disks") or []
+        ),
+        "volumes": tuple(validate_volumes(name, config.get("volumes"))),
+        "pcie_devices": tuple(config.get("pcie_devices") or []),
+        "gpu_sharing": validate_gpu_sharing(name, config.get("gpu_sharing")),
+        # External nodes' hardware isn't in the config, so skip sizing checks
+        "kubelet": resolve_kubelet_config(
+            name,
+            config.get("kubelet"),
+            cpu=None if external else cpu,
+            memory=None if external else memory,
+        ),
+        "labels": {str(k): str(v) for k, v in (config.get("labels") or {}).items()},
+        "taints": _compile_taints(where, config.get("taints")),
+        "pool": config.get("pool"),
+    }
+    # Covers everything rendered into the node's machine config and image
+    node_hash = content_hash(
+        {
+            "node": fields,
+            "cluster": shared_hash,
+            "image": image_profiles[image_profile].content_hash,
+        }
+    )
+    return NodeSpec(**fields, content_hash=node_hash)
+
+
+def compile_cluster_spec(
+    nodes: list[dict],
+    cluster_name: str,
+    talos_version: str,
+    kubernetes_version: str = None,
+    cluster_endpoint_ip: str = None,
+    control_plane_vip: str = None,
+    gateway: str = "192.168.1.1",
+    network_prefix: int = 24,
+    use_cilium: bool = False,
+    cilium_version: str = None,
+    etcd: dict = None,
+    control_plane_profile: str = "default",
+) -> ClusterSpec:
+    """
+    Compile the expanded node list and cluster settings into a ClusterSpec,
+    raising ValueError on the first invalid setting.
+    """
+    if not nodes:
+        raise ValueError("Configure at least one node in nodes or node_pools")
+    controlplane_ips = [n.get("ip") for n in nodes if n.get("role") == "controlplane"]
+    if not controlplane_ips:
+        raise ValueError("Configure at least one controlplane node")
+    vip = _compile_vip(control_plane_vip, gateway, network_prefix)
+
+    shared = {
+        "cluster_name": cluster_name,
+        "talos_version": talos_version,
+        "kubernetes_version": kubernetes_version,
+        "endpoint_ip": cluster_endpoint_ip or vip or controlplane_ips[0],
+        "vip": vip,
+        "gateway": gateway,
+        "network_prefix": network_prefix,
+        "use_cilium": use_cilium,
+        "cilium_version": _compile_cilium_version(cilium_version),
+        "etcd": resolve_etcd_config(etcd),
+        # Sized from the node count so growing the cluster raises the limits
+        "control_plane": render_control_plane_profile(
+            control_plane_profile, len(nodes)
+        ),
+    }
+    shared_hash = content_hash(shared)
+    image_profiles = compile_image_profiles(talos_version)
+
+    compiled = tuple(compile_node(node, shared_hash, image_profiles) for node in nodes)
+
+    for attribute in ("name", "ip"):
+        seen = set()
+        for node in compiled:
+            value = getattr(node, attribute)
+            if value in seen:
+                raise ValueError(f"Duplicate node {attribute} '{value}'")
+            seen.add(value)
+
+    if vip in {node.ip for node in compiled}:
+        raise ValueError(
+            f"control_plane_vip {vip} is a node ip, pick an unused address"
+        )
+
+    # The bootstrap node is the control plane at the endpoint address, or the
+    # first control plane when the endpoint is the VIP
+    if shared["endpoint_ip"] not in [*controlplane_ips, vip]:
+        raise ValueError(
+            f"cluster_endpoint_ip {shared['endpoint_ip']} must be the control_plane_vip "
+            f"or a controlplane node ip {controlplane_ips}"
+        )
+
+    cluster_hash = content_hash(
+        {"shared": shared_hash, "nodes": [node.content_hash for node in compiled]}
+    )
+    return ClusterSpec(
+        **shared,
+        nodes=compiled,
+        image_profiles=image_profiles,
+        content_hash=cluster_hash,
+    )
+
+
+def spec_hashes(spec: ClusterSpec) -> dict:
+    """Cluster, per-node and per-image-profile hashes, e.g. for stack exports."""
+    return {
+        "cluster": spec.content_hash,
+        "nodes": {node.name: node.content_hash for node in spec.nodes},
+        "image_profiles": {
+            name: profile.content_hash for name, profile in spec.image_profiles.items()
+        },
+    }
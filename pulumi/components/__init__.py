@@ -1,17 +1,49 @@
-"""Pulumi Components for Talos Kubernetes"""
-
-from .talos_image_factory import TalosImageFactory, TalosImageFactoryArgs
-from .talos_node import TalosNode, TalosNodeArgs
-from .talos_cluster import TalosCluster, TalosClusterArgs
-from .talos_upgrade import TalosUpgrade, TalosUpgradeArgs
-
-__all__ = [
-    "TalosImageFactory",
-    "TalosImageFactoryArgs",
-    "TalosNode",
-    "TalosNodeArgs",
-    "TalosCluster",
-    "TalosClusterArgs",
-    "TalosUpgrade",
-    "TalosUpgradeArgs",
-]
+"""
+Pulumi Components for Talos Kubernetes
+
+Components are imported on first access, so a run only loads the provider
+SDKs (proxmoxve, talos, kubernetes, command) of the components it creates.
+"""
+
+import importlib
+
+# Public name -> submodule defining it
+_EXPORTS = {
+    "TalosImageFactory": "talos_image_factory",
+    "TalosImageFactoryArgs": "talos_image_factory",
+    "TalosNode": "talos_node",
+    "TalosNodeArgs": "talos_node",
+    "TalosCluster": "talos_cluster",
+    "TalosClusterArgs": "talos_cluster",
+    "TalosUpgrade": "talos_upgrade",
+    "TalosUpgradeArgs": "talos_upgrade",
+    "TalosPrepare": "talos_prepare",
+    "TalosPrepareArgs": "talos_prepare",
+    "EtcdMaintenance": "etcd_maintenance",
+    "EtcdMaintenanceArgs": "etcd_maintenance",
+    "EtcdSnapshot": "etcd_snapshot",
+    "EtcdSnapshotArgs": "etcd_snapshot",
+    "VClusterFleet": "vcluster_fleet",
+    "VClusterFleetArgs": "vcluster_fleet",
+    "StorageBenchmark": "storage_benchmark",
+    "StorageBenchmarkArgs": "storage_benchmark",
+    "NetworkBenchmark": "network_benchmark",
+    "NetworkBenchmarkArgs": "network_benchmark",
+    "ImagePrepull": "image_prepull",
+    "ImagePrepullArgs": "image_prepull",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    # Cache on the package so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *_EXPORTS])
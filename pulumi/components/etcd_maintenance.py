@@ -0,0 +1,140 @@
+"""EtcdMaintenance Pulumi Component"""
+
+import pulumi
+import pulumi_kubernetes as kubernetes
+from etcd import stagger_cron_schedule
+
+TALOS_SECRETS_PATH = "/var/run/secrets/talos.dev"
+
+
+class EtcdMaintenanceArgs:
+    """Arguments for EtcdMaintenance component"""
+
+    def __init__(
+        self,
+        controlplane_nodes: tuple,  # cluster_spec.NodeSpec
+        talos_version: str,
+        k8s_provider: kubernetes.Provider,
+        schedule: str = "0 3 * * 0",
+        stagger_minutes: int = 15,
+        namespace: str = "kube-system",
+    ):
+        self.controlplane_nodes = controlplane_nodes
+        self.talos_version = talos_version
+        self.k8s_provider = k8s_provider
+        self.schedule = schedule
+        self.stagger_minutes = stagger_minutes
+        self.namespace = namespace
+
+
+class EtcdMaintenance(pulumi.ComponentResource):
+    """
+    A Pulumi ComponentResource that schedules etcd maintenance:
+    - Creates a Talos ServiceAccount for in-cluster Talos API access
+    - Creates one defrag CronJob per control-plane member
+    - Staggers the members so only one defragments at a time
+    """
+
+    def __init__(
+        self,
+        name: str,
+        args: EtcdMaintenanceArgs,
+        opts: pulumi.ResourceOptions = None,
+    ):
+        super().__init__("custom:talos:EtcdMaintenance", name, {}, opts)
+
+        k8s_opts = pulumi.ResourceOptions(parent=self, provider=args.k8s_provider)
+
+        # Talos turns this into a Secret holding a talosconfig with the given roles
+        self.service_account = kubernetes.apiextensions.CustomResource(
+            f"{name}-talos-sa",
+            api_version="talos.dev/v1alpha1",
+            kind="ServiceAccount",
+            metadata={"name": name, "namespace": args.namespace},
+            spec={"roles": ["os:operator"]},
+            opts=k8s_opts,
+        )
+
+        self.cron_jobs = []
+        self.schedules = {}
+        for idx, node in enumerate(args.controlplane_nodes):
+            schedule = stagger_cron_schedule(args.schedule, idx * args.stagger_minutes)
+            pulumi.log.info(f"Scheduling etcd defrag for {node.name} at '{schedule}'")
+            self.schedules[node.name] = schedule
+            self.cron_jobs.append(
+                self._create_defrag_cron_job(name, node, schedule, args)
+            )
+
+        self.register_outputs({"schedules": self.schedules})
+
+    def _create_defrag_cron_job(
+        self, name: str, node: dict, schedule: str, args: EtcdMaintenanceArgs
+    ) -> kubernetes.batch.v1.CronJob:
+        """Create the defrag CronJob for a single etcd member"""
+
+        # The talosctl image has no shell, so each step is its own container:
+        # defrag runs as an init container and the final status logs the result
+        def talosctl_container(container_name: str, *talosctl_args: str) -> dict:
+            return {
+                "name": container_name,
+                "image": f"ghcr.io/siderolabs/talosctl:{args.talos_version}",
+                "args": ["-n", node.ip, *talosctl_args],
+                "env": [
+                    {"name": "TALOSCONFIG", "value": f"{TALOS_SECRETS_PATH}/config"}
+                ],
+                "volumeMounts": [
+                    {"name": "talos-secrets", "mountPath": TALOS_SECRETS_PATH}
+                ],
+            }
+
+        return kubernetes.batch.v1.CronJob(
+            f"{name}-defrag-{node.name}",
+            metadata={
+                "name": f"etcd-defrag-{node.name}",
+                "namespace": args.namespace,
+            },
+            spec={
+                "schedule": schedule,
+                "concurrencyPolicy": "Forbid",
+                "successfulJobsHistoryLimit": 1,
+                "failedJobsHistoryLimit": 3,
+                "jobTemplate": {
+                    "spec": {
+                        "backoffLimit": 2,
+                        "template": {
+                            "spec": {
+                                "restartPolicy": "Never",
+                                # Talos API access is only enabled on control planes
+                                "nodeSelector": {
+                                    "node-role.kubernetes.io/control-plane": ""
+                                },
+                                "tolerations": [
+                                    {
+                                        "key": "node-role.kubernetes.io/control-plane",
+                                        "operator": "Exists",
+                                        "effect": "NoSchedule",
+                                    }
+                                ],
+                                "initContainers": [
+                                    talosctl_container("defrag", "etcd", "defrag"),
+                                ],
+                                "containers": [
+                                    talosctl_container("status", "etcd", "status"),
+                                ],
+                                "volumes": [
+                                    {
+                                        "name": "talos-secrets",
+                                        "secret": {"secretName": name},
+                                    }
+                                ],
+                            }
+                        },
+                    }
+                },
+            },
+            opts=pulumi.ResourceOptions(
+                parent=self,
+                provider=args.k8s_provider,
+                depends_on=[self.service_account],
+            ),
+        )
@@ -0,0 +1,183 @@
+"""EtcdSnapshot Pulumi Component"""
+
+import pulumi
+import pulumi_kubernetes as kubernetes
+from etcd import render_snapshot_rotate_script
+from components.etcd_maintenance import TALOS_SECRETS_PATH
+
+SNAPSHOT_MOUNT_PATH = "/snapshots"
+
+
+class EtcdSnapshotArgs:
+    """Arguments for EtcdSnapshot component"""
+
+    def __init__(
+        self,
+        snapshot: dict,  # resolved by etcd.resolve_etcd_snapshot
+        talos_version: str,
+        k8s_provider: kubernetes.Provider,
+        namespace: str = "kube-system",
+    ):
+        self.snapshot = snapshot
+        self.talos_version = talos_version
+        self.k8s_provider = k8s_provider
+        self.namespace = namespace
+
+
+class EtcdSnapshot(pulumi.ComponentResource):
+    """
+    A Pulumi ComponentResource that schedules etcd snapshots:
+    - Creates a Talos ServiceAccount for in-cluster Talos API access
+    - Creates a CronJob saving `talosctl etcd snapshot` to an NFS share
+    - Keeps the newest `retention` snapshots and a `latest.snapshot` link
+    The snapshot is taken from the member on the control plane the Job lands
+    on, so a single lost control plane doesn't stop the backups.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        args: EtcdSnapshotArgs,
+        opts: pulumi.ResourceOptions = None,
+    ):
+        super().__init__("custom:talos:EtcdSnapshot", name, {}, opts)
+
+        snapshot = args.snapshot
+        k8s_opts = pulumi.ResourceOptions(parent=self, provider=args.k8s_provider)
+        directory = f"{SNAPSHOT_MOUNT_PATH}/{snapshot['sub_dir']}"
+
+        # Talos turns this into a Secret holding a talosconfig with the given roles
+        self.service_account = kubernetes.apiextensions.CustomResource(
+            f"{name}-talos-sa",
+            api_version="talos.dev/v1alpha1",
+            kind="ServiceAccount",
+            metadata={"name": name, "namespace": args.namespace},
+            spec={"roles": ["os:operator"]},
+            opts=k8s_opts,
+        )
+
+        # The talosctl image has no shell, so the shell steps run in a
+        # separate image around the talosctl init container
+        self.cron_job = kubernetes.batch.v1.CronJob(
+            f"{name}-cron",
+            metadata={"name": "etcd-snapshot", "namespace": args.namespace},
+            spec={
+                "schedule": snapshot["schedule"],
+                "concurrencyPolicy": "Forbid",
+                "successfulJobsHistoryLimit": 1,
+                "failedJobsHistoryLimit": 3,
+                "jobTemplate": {
+                    "spec": {
+                        "backoffLimit": 2,
+                        "template": {
+                            "spec": {
+                                "restartPolicy": "Never",
+                                # Talos API access is only enabled on control planes
+                                "nodeSelector": {
+                                    "node-role.kubernetes.io/control-plane": ""
+                                },
+                                "tolerations": [
+                                    {
+                                        "key": "node-role.kubernetes.io/control-plane",
+                                        "operator": "Exists",
+                                        "effect": "NoSchedule",
+                                    }
+                                ],
+                                "initContainers": [
+                                    {
+                                        "name": "prepare",
+                                        "image": snapshot["image"],
+                                        "command": ["mkdir", "-p", directory],
+                                        "volumeMounts": [
+                                            {
+                                                "name": "snapshots",
+                                                "mountPath": SNAPSHOT_MOUNT_PATH,
+                                            }
+                                        ],
+                                    },
+                                    {
+                                        "name": "snapshot",
+                                        "image": f"ghcr.io/siderolabs/talosctl:{args.talos_version}",
+                                        "args": [
+                                            "-n",
+                                            "$(NODE_IP)",
+                                            "etcd",
+                                            "snapshot",
+                                            f"{directory}/.in-progress.snapshot",
+                                        ],
+                                        "env": [
+                                            {
+                                                "name": "TALOSCONFIG",
+                                                "value": f"{TALOS_SECRETS_PATH}/config",
+                                            },
+                                            {
+                                                "name": "NODE_IP",
+                                                "valueFrom": {
+                                                    "fieldRef": {
+                                                        "fieldPath": "status.hostIP"
+                                                    }
+                                                },
+                                            },
+                                        ],
+                                        "volumeMounts": [
+                                            {
+                                                "name": "talos-secrets",
+                                                "mountPath": TALOS_SECRETS_PATH,
+                                            },
+                                            {
+                                                "name": "snapshots",
+                                                "mountPath": SNAPSHOT_MOUNT_PATH,
+                                            },
+                                        ],
+                                    },
+                                ],
+                                "containers": [
+                                    {
+                                        "name": "rotate",
+                                        "image": snapshot["image"],
+                                        "command": [
+                                            "sh",
+                                            "-c",
+                                            render_snapshot_rotate_script(
+                                                directory, snapshot["retention"]
+                                            ),
+                                        ],
+                                        "volumeMounts": [
+                                            {
+                                                "name": "snapshots",
+                                                "mountPath": SNAPSHOT_MOUNT_PATH,
+                                            }
+                                        ],
+                                    }
+                                ],
+                                "volumes": [
+                                    {
+                                        "name": "talos-secrets",
+                                        "secret": {"secretName": name},
+                                    },
+                                    {
+                                        "name": "snapshots",
+                                        "nfs": {
+                                            "server": snapshot["server"],
+                                            "path": snapshot["share"],
+                                        },
+                                    },
+                                ],
+                            }
+                        },
+                    }
+                },
+            },
+            opts=pulumi.ResourceOptions(
+                parent=self,
+                provider=args.k8s_provider,
+                depends_on=[self.service_account],
+            ),
+        )
+
+        self.location = (
+            f"{snapshot['server']}:{snapshot['share']}/{snapshot['sub_dir']}"
+        )
+        self.register_outputs(
+            {"schedule": snapshot["schedule"], "location": self.location}
+        )
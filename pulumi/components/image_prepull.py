@@ -0,0 +1,168 @@
+"""ImagePrepull Pulumi Component"""
+
+import pulumi
+import pulumi_kubernetes as kubernetes
+from pulumi_command import local as command
+from kubectl import kubeconfig_environment, kubectl_script
+from image_prepull import build_prepull_report, is_mutable_tag
+
+PREPULL_BIN_PATH = "/prepull"
+
+
+class ImagePrepullArgs:
+    """Arguments for ImagePrepull component"""
+
+    def __init__(
+        self,
+        prepull: dict,  # resolved by image_prepull.resolve_image_prepull
+        workloads: list,  # from image_prepull.read_prepull_workloads
+        k8s_provider: kubernetes.Provider,
+        kubeconfig: pulumi.Input[str],
+        depends_on: list = None,  # e.g. the cluster's all-nodes-ready gate
+    ):
+        self.prepull = prepull
+        self.workloads = workloads
+        self.k8s_provider = k8s_provider
+        self.kubeconfig = kubeconfig
+        self.depends_on = depends_on or []
+
+
+class ImagePrepull(pulumi.ComponentResource):
+    """
+    A Pulumi ComponentResource that keeps workload images cached on nodes:
+    - Runs a DaemonSet per InferenceService on the nodes its predictor
+      tolerates and selects, with one init container per image
+    - Each init container runs a static no-op binary, so images without a
+      shell pull and exit; a pause container then holds the pod
+    - Reports the image size and pull time per node from the kubelet
+    A changed image reference rolls the DaemonSet and so pulls the new image
+    everywhere; bump `refresh` to re-pull mutable tags.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        args: ImagePrepullArgs,
+        opts: pulumi.ResourceOptions = None,
+    ):
+        super().__init__("custom:kubernetes:ImagePrepull", name, {}, opts)
+
+        self.prepull = args.prepull
+        self.kubectl_environment = kubeconfig_environment(args.kubeconfig)
+
+        self.namespace = kubernetes.core.v1.Namespace(
+            f"{name}-namespace",
+            metadata={"name": args.prepull["namespace"]},
+            opts=pulumi.ResourceOptions(
+                parent=self, provider=args.k8s_provider, depends_on=args.depends_on
+            ),
+        )
+
+        self.reports = {}
+        for workload in args.workloads:
+            collect = self._create_prepull(name, workload, args)
+            self.reports[workload["name"]] = collect.stdout.apply(
+                lambda out, images=workload["images"]: build_prepull_report(
+                    images, *out.split("\n@@\n", 1)
+                )
+            )
+
+        self.register_outputs({"reports": self.reports})
+
+    def _create_prepull(
+        self, name: str, workload: dict, args: ImagePrepullArgs
+    ) -> command.Command:
+        """Create one workload's DaemonSet and the command reporting its pulls"""
+        prepull = args.prepull
+        namespace = prepull["namespace"]
+        ds_name = f"prepull-{workload['name']}"[:63].rstrip("-")
+        labels = {"image-prepull/workload": workload["name"]}
+        tiny = {
+            "requests": {"cpu": "1m", "memory": "8Mi"},
+            "limits": {"memory": "16Mi"},
+        }
+
+        init_containers = [
+            {
+                # busybox is static, and named `true` it runs the true applet
+                "name": "install",
+                "image": prepull["busybox_image"],
+                "command": ["cp", "/bin/busybox", f"{PREPULL_BIN_PATH}/true"],
+                "resources": tiny,
+                "volumeMounts": [
+                    {"name": "prepull-bin", "mountPath": PREPULL_BIN_PATH}
+                ],
+            }
+        ]
+        for index, image in enumerate(workload["images"]):
+            init_containers.append(
+                {
+                    "name": f"image-{index}",
+                    "image": image,
+                    "imagePullPolicy": (
+                        "Always" if is_mutable_tag(image) else "IfNotPresent"
+                    ),
+                    "command": [f"{PREPULL_BIN_PATH}/true"],
+                    "resources": tiny,
+                    "volumeMounts": [
+                        {"name": "prepull-bin", "mountPath": PREPULL_BIN_PATH}
+                    ],
+                }
+            )
+
+        daemon_set = kubernetes.apps.v1.DaemonSet(
+            f"{name}-{workload['name']}",
+            metadata={
+                "name": ds_name,
+                "namespace": namespace,
+                # Rollout is awaited by the collect command below
+                "annotations": {"pulumi.com/skipAwait": "true"},
+            },
+            spec={
+                "selector": {"matchLabels": labels},
+                # Pull on several nodes at once; these pods serve nothing
+                "updateStrategy": {
+                    "type": "RollingUpdate",
+                    "rollingUpdate": {"maxUnavailable": "100%"},
+                },
+                "template": {
+                    "metadata": {
+                        "labels": labels,
+                        "annotations": {"image-prepull/refresh": prepull["refresh"]},
+                    },
+                    "spec": {
+                        "nodeSelector": workload["node_selector"],
+                        "tolerations": workload["tolerations"],
+                        "initContainers": init_containers,
+                        "containers": [
+                            {
+                                "name": "pause",
+                                "image": prepull["pause_image"],
+                                "resources": tiny,
+                            }
+                        ],
+                        "volumes": [{"name": "prepull-bin", "emptyDir": {}}],
+                    },
+                },
+            },
+            opts=pulumi.ResourceOptions(
+                parent=self,
+                provider=args.k8s_provider,
+                depends_on=[self.namespace],
+            ),
+        )
+
+        # Prints the node list and the pull events, split by an `@@` line
+        return command.Command(
+            f"{name}-{workload['name']}-collect",
+            create=kubectl_script(
+                f"kubectl -n {namespace} rollout status daemonset/{ds_name} "
+                f"--timeout={prepull['timeout_seconds']}s >&2; "
+                "kubectl get nodes -o json; echo '@@'; "
+                f"kubectl -n {namespace} get events --field-selector reason=Pulled -o json"
+            ),
+            environment=self.kubectl_environment,
+            delete="true",
+            triggers=[*workload["images"], prepull["refresh"]],
+            opts=pulumi.ResourceOptions(parent=self, depends_on=[daemon_set]),
+        )
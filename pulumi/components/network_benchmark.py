@@ -0,0 +1,300 @@
+"""NetworkBenchmark Pulumi Component"""
+
+import json
+
+import pulumi
+import pulumi_kubernetes as kubernetes
+from pulumi_command import local as command
+from kubectl import kubeconfig_environment, kubectl_script
+from network_bench import (
+    IPERF3_PORT,
+    NETPERF_CONTROL_PORT,
+    NETPERF_DATA_PORT,
+    build_report,
+    compare_reports,
+    parse_client_output,
+    render_client_script,
+    server_name,
+)
+
+# Benchmark pods run on every node, including tainted control planes and GPU workers
+TOLERATE_ALL = [{"operator": "Exists"}]
+
+BENCH_PORTS = [
+    {"name": "iperf3", "port": IPERF3_PORT},
+    {"name": "netperf", "port": NETPERF_CONTROL_PORT},
+    {"name": "netperf-data", "port": NETPERF_DATA_PORT},
+]
+
+
+class NetworkBenchmarkArgs:
+    """Arguments for NetworkBenchmark component"""
+
+    def __init__(
+        self,
+        benchmark: dict,  # resolved by network_bench.resolve_network_benchmark
+        k8s_provider: kubernetes.Provider,
+        kubeconfig: pulumi.Input[str],
+        baseline: dict = None,  # report of an earlier run to compare against
+        namespace: str = "network-benchmark",
+        depends_on: list = None,  # e.g. the cluster's all-nodes-ready gate
+    ):
+        self.benchmark = benchmark
+        self.k8s_provider = k8s_provider
+        self.kubeconfig = kubeconfig
+        self.baseline = baseline
+        self.namespace = namespace
+        self.depends_on = depends_on or []
+
+
+class NetworkBenchmark(pulumi.ComponentResource):
+    """
+    A Pulumi ComponentResource that measures the pod network:
+    - Runs an iperf3 + netserver pod on every benchmarked node, plus a
+      host-network one as the baseline without the CNI
+    - Exposes each pod through a headless Service (pod path) and a ClusterIP
+      Service (service path), and one through a LoadBalancer Service
+    - Runs a client Job per node against every target, and a host-network
+      client Job against the host-network servers, one Job at a time
+    - Collects a throughput/latency matrix and compares it with a baseline
+    Jobs are named by `run_id`; bump it to run the benchmark again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        args: NetworkBenchmarkArgs,
+        opts: pulumi.ResourceOptions = None,
+    ):
+        super().__init__("custom:network:NetworkBenchmark", name, {}, opts)
+
+        self.benchmark = args.benchmark
+        self.kubectl_environment = kubeconfig_environment(args.kubeconfig)
+
+        # The host path's servers and clients run in the host network namespace
+        self.namespace = kubernetes.core.v1.Namespace(
+            f"{name}-namespace",
+            metadata={
+                "name": args.namespace,
+                "labels": {"pod-security.kubernetes.io/enforce": "privileged"},
+            },
+            opts=pulumi.ResourceOptions(
+                parent=self, provider=args.k8s_provider, depends_on=args.depends_on
+            ),
+        )
+        ns_opts = pulumi.ResourceOptions(
+            parent=self, provider=args.k8s_provider, depends_on=[self.namespace]
+        )
+
+        servers = []
+        for node_name in args.benchmark["nodes"]:
+            servers.extend(self._create_server(node_name, args, ns_opts))
+            servers.extend(
+                self._create_server(node_name, args, ns_opts, host_network=True)
+            )
+
+        lb_service = kubernetes.core.v1.Service(
+            f"{name}-lb",
+            metadata={"name": "netbench-lb", "namespace": args.namespace},
+            spec={
+                "type": "LoadBalancer",
+                "selector": {"netbench/server": args.benchmark["lb_node"]},
+                "ports": BENCH_PORTS,
+            },
+            opts=ns_opts,
+        )
+        servers.append(lb_service)
+        self.lb_ip = lb_service.status.load_balancer.ingress[0].ip
+
+        self.results = []
+        previous = servers
+        for node_name in args.benchmark["nodes"]:
+            for host_network in (False, True):
+                collect = self._create_client_run(
+                    name, node_name, args, previous, host_network=host_network
+                )
+                self.results.append(
+                    collect.stdout.apply(
+                        lambda out, node_name=node_name: parse_client_output(
+                            node_name, out
+                        )
+                    )
+                )
+                previous = [*servers, collect]
+
+        self.report = pulumi.Output.all(*self.results).apply(
+            lambda per_client: build_report(
+                args.benchmark["run_id"],
+                [result for results in per_client for result in results],
+            )
+        )
+        self.comparison = (
+            self.report.apply(lambda report: compare_reports(args.baseline, report))
+            if args.baseline
+            else None
+        )
+
+        self.results_configmap = kubernetes.core.v1.ConfigMap(
+            f"{name}-results",
+            metadata={"name": f"{name}-results", "namespace": args.namespace},
+            data=self.report.apply(
+                lambda report: {
+                    "run-id": report["run_id"],
+                    "results.json": json.dumps(report, indent=2, sort_keys=True),
+                }
+            ),
+            opts=ns_opts,
+        )
+
+        self.register_outputs({"report": self.report, "comparison": self.comparison})
+
+    def _create_server(
+        self,
+        node_name: str,
+        args: NetworkBenchmarkArgs,
+        opts: pulumi.ResourceOptions,
+        host_network: bool = False,
+    ) -> list:
+        """
+        Create the server pod of one node and its headless and ClusterIP
+        Services, or its host-network server, reached by the node IP
+        """
+        name = server_name(node_name, host_network)
+        # Host-network servers must stay out of the Services' selectors
+        labels = {
+            "netbench/host-server" if host_network else "netbench/server": node_name
+        }
+        deployment = kubernetes.apps.v1.Deployment(
+            f"{name}-server",
+            metadata={"name": name, "namespace": args.namespace},
+            spec={
+                "replicas": 1,
+                # The host ports are taken until the old pod is gone
+                **({"strategy": {"type": "Recreate"}} if host_network else {}),
+                "selector": {"matchLabels": labels},
+                "template": {
+                    "metadata": {"labels": labels},
+                    "spec": {
+                        "hostNetwork": host_network,
+                        "nodeSelector": {"kubernetes.io/hostname": node_name},
+                        "tolerations": TOLERATE_ALL,
+                        "containers": [
+                            {
+                                "name": "iperf3",
+                                "image": args.benchmark["image"],
+                                "command": ["iperf3", "-s", "-p", str(IPERF3_PORT)],
+                                "ports": [{"containerPort": IPERF3_PORT}],
+                            },
+                            {
+                                "name": "netserver",
+                                "image": args.benchmark["image"],
+                                "command": [
+                                    "netserver",
+                                    "-D",
+                                    "-p",
+                                    str(NETPERF_CONTROL_PORT),
+                                ],
+                                "ports": [
+                                    {"containerPort": NETPERF_CONTROL_PORT},
+                                    {"containerPort": NETPERF_DATA_PORT},
+                                ],
+                            },
+                        ],
+                    },
+                },
+            },
+            opts=opts,
+        )
+        if host_network:
+            return [deployment]
+        services = [
+            kubernetes.core.v1.Service(
+                f"{server_name(node_name)}{suffix}",
+                metadata={
+                    "name": f"{server_name(node_name)}{suffix}",
+                    "namespace": args.namespace,
+                },
+                spec={
+                    **({"clusterIP": "None"} if suffix else {}),
+                    "selector": labels,
+                    "ports": BENCH_PORTS,
+                },
+                opts=opts,
+            )
+            for suffix in ("-pod", "")
+        ]
+        return [deployment, *services]
+
+    def _create_client_run(
+        self,
+        name: str,
+        node_name: str,
+        args: NetworkBenchmarkArgs,
+        depends_on: list,
+        host_network: bool = False,
+    ) -> command.Command:
+        """Create the client Job on one node and the command collecting its log"""
+        namespace = args.namespace
+        client = "host-client" if host_network else "client"
+        job_name = f"netbench-{client}-{node_name}-{args.benchmark['run_id']}"[
+            :63
+        ].rstrip("-")
+
+        job = kubernetes.batch.v1.Job(
+            f"{name}-{client}-{node_name}-{args.benchmark['run_id']}",
+            metadata={
+                "name": job_name,
+                "namespace": namespace,
+                # Completion is awaited by the collect command below
+                "annotations": {"pulumi.com/skipAwait": "true"},
+            },
+            spec={
+                "backoffLimit": 0,
+                "template": {
+                    "spec": {
+                        "restartPolicy": "Never",
+                        "hostNetwork": host_network,
+                        "nodeSelector": {"kubernetes.io/hostname": node_name},
+                        "tolerations": TOLERATE_ALL,
+                        "containers": [
+                            {
+                                "name": "client",
+                                "image": args.benchmark["image"],
+                                "command": [
+                                    "sh",
+                                    "-c",
+                                    (
+                                        render_client_script(
+                                            args.benchmark, namespace, host_network=True
+                                        )
+                                        if host_network
+                                        else self.lb_ip.apply(
+                                            lambda lb_ip: render_client_script(
+                                                args.benchmark, namespace, lb_ip
+                                            )
+                                        )
+                                    ),
+                                ],
+                            }
+                        ],
+                    }
+                },
+            },
+            opts=pulumi.ResourceOptions(
+                parent=self, provider=args.k8s_provider, depends_on=depends_on
+            ),
+        )
+
+        # Prints the client log once the Job has finished
+        return command.Command(
+            f"{name}-{client}-{node_name}-collect",
+            create=kubectl_script(
+                f"kubectl -n {namespace} wait --for=condition=complete job/{job_name} "
+                f"--timeout={args.benchmark['timeout_seconds']}s >&2; "
+                f"kubectl -n {namespace} logs job/{job_name}"
+            ),
+            environment=self.kubectl_environment,
+            delete="true",
+            triggers=[args.benchmark["run_id"]],
+            opts=pulumi.ResourceOptions(parent=self, depends_on=[job]),
+        )
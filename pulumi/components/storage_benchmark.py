@@ -0,0 +1,197 @@
+"""StorageBenchmark Pulumi Component"""
+
+import json
+
+import pulumi
+import pulumi_kubernetes as kubernetes
+from pulumi_command import local as command
+from kubectl import kubeconfig_environment, kubectl_script
+from storage import FIO_FILENAME, render_fio_jobfile, summarize_fio_results
+
+BENCH_MOUNT_PATH = "/bench"
+
+
+class StorageBenchmarkArgs:
+    """Arguments for StorageBenchmark component"""
+
+    def __init__(
+        self,
+        benchmark: dict,  # resolved by storage.resolve_storage_benchmark
+        k8s_provider: kubernetes.Provider,
+        kubeconfig: pulumi.Input[str],
+        namespace: str = "storage-benchmark",
+        depends_on: list = None,  # e.g. the StorageClasses under test
+    ):
+        self.benchmark = benchmark
+        self.k8s_provider = k8s_provider
+        self.kubeconfig = kubeconfig
+        self.namespace = namespace
+        self.depends_on = depends_on or []
+
+
+class StorageBenchmark(pulumi.ComponentResource):
+    """
+    A Pulumi ComponentResource that benchmarks storage with fio:
+    - Runs one fio Job per target (NFS StorageClass PVC or local node volume)
+    - Runs targets one at a time so they don't compete for the NFS server
+    - Collects IOPS, bandwidth and latency percentiles into a results ConfigMap
+    Jobs are named by `run_id`; bump it to run the benchmark again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        args: StorageBenchmarkArgs,
+        opts: pulumi.ResourceOptions = None,
+    ):
+        super().__init__("custom:storage:StorageBenchmark", name, {}, opts)
+
+        self.benchmark = args.benchmark
+        k8s_opts = pulumi.ResourceOptions(parent=self, provider=args.k8s_provider)
+        self.kubectl_environment = kubeconfig_environment(args.kubeconfig)
+
+        # Local volume targets mount host paths
+        self.namespace = kubernetes.core.v1.Namespace(
+            f"{name}-namespace",
+            metadata={
+                "name": args.namespace,
+                "labels": {"pod-security.kubernetes.io/enforce": "privileged"},
+            },
+            opts=k8s_opts,
+        )
+
+        self.jobfile = kubernetes.core.v1.ConfigMap(
+            f"{name}-jobfile",
+            metadata={"name": f"{name}-jobfile", "namespace": args.namespace},
+            data={
+                "bench.fio": render_fio_jobfile(
+                    BENCH_MOUNT_PATH,
+                    args.benchmark["size"],
+                    args.benchmark["runtime"],
+                )
+            },
+            opts=pulumi.ResourceOptions(
+                parent=self, provider=args.k8s_provider, depends_on=[self.namespace]
+            ),
+        )
+
+        self.results = {}
+        previous = args.depends_on
+        for target in args.benchmark["targets"]:
+            collect = self._create_target_run(name, target, args, previous)
+            self.results[target["name"]] = collect.stdout.apply(summarize_fio_results)
+            previous = [collect]
+
+        self.results_configmap = kubernetes.core.v1.ConfigMap(
+            f"{name}-results",
+            metadata={"name": f"{name}-results", "namespace": args.namespace},
+            data=pulumi.Output.all(**self.results).apply(
+                lambda results: {
+                    "run-id": args.benchmark["run_id"],
+                    "results.json": json.dumps(results, indent=2, sort_keys=True),
+                }
+            ),
+            opts=k8s_opts,
+        )
+
+        self.register_outputs({"results": self.results})
+
+    def _create_target_run(
+        self, name: str, target: dict, args: StorageBenchmarkArgs, depends_on: list
+    ) -> command.Command:
+        """Create the fio Job for one target and the command collecting its output"""
+        namespace = args.namespace
+        job_name = f"fio-{target['name']}-{args.benchmark['run_id']}"[:63].rstrip("-")
+
+        if "storage_class" in target:
+            claim = kubernetes.core.v1.PersistentVolumeClaim(
+                f"{name}-{target['name']}-pvc",
+                metadata={"name": f"fio-{target['name']}", "namespace": namespace},
+                spec={
+                    "storageClassName": target["storage_class"],
+                    "accessModes": ["ReadWriteOnce"],
+                    "resources": {"requests": {"storage": args.benchmark["pvc_size"]}},
+                },
+                opts=pulumi.ResourceOptions(
+                    parent=self,
+                    provider=args.k8s_provider,
+                    depends_on=[self.namespace, *args.depends_on],
+                ),
+            )
+            bench_volume = {
+                "name": "bench",
+                "persistentVolumeClaim": {"claimName": claim.metadata["name"]},
+            }
+            placement = {}
+        else:
+            bench_volume = {
+                "name": "bench",
+                "hostPath": {"path": target["path"], "type": "DirectoryOrCreate"},
+            }
+            # Local volumes live on one node, which may be tainted (e.g. GPU workers)
+            placement = {
+                "nodeSelector": {"kubernetes.io/hostname": target["node"]},
+                "tolerations": [{"operator": "Exists"}],
+            }
+
+        job = kubernetes.batch.v1.Job(
+            f"{name}-{target['name']}-{args.benchmark['run_id']}",
+            metadata={
+                "name": job_name,
+                "namespace": namespace,
+                # Completion is awaited by the collect command below
+                "annotations": {"pulumi.com/skipAwait": "true"},
+            },
+            spec={
+                "backoffLimit": 0,
+                "template": {
+                    "spec": {
+                        "restartPolicy": "Never",
+                        **placement,
+                        "containers": [
+                            {
+                                "name": "fio",
+                                "image": args.benchmark["image"],
+                                "command": [
+                                    "sh",
+                                    "-c",
+                                    "apk add --no-cache fio >/dev/null 2>&1 && "
+                                    "fio --output-format=json /etc/fio/bench.fio; "
+                                    f"status=$?; rm -f {BENCH_MOUNT_PATH}/{FIO_FILENAME}; exit $status",
+                                ],
+                                "volumeMounts": [
+                                    {"name": "bench", "mountPath": BENCH_MOUNT_PATH},
+                                    {"name": "jobfile", "mountPath": "/etc/fio"},
+                                ],
+                            }
+                        ],
+                        "volumes": [
+                            bench_volume,
+                            {
+                                "name": "jobfile",
+                                "configMap": {"name": self.jobfile.metadata["name"]},
+                            },
+                        ],
+                    }
+                },
+            },
+            opts=pulumi.ResourceOptions(
+                parent=self,
+                provider=args.k8s_provider,
+                depends_on=[self.jobfile, *depends_on],
+            ),
+        )
+
+        # Prints the fio JSON output of the finished Job
+        return command.Command(
+            f"{name}-{target['name']}-collect",
+            create=kubectl_script(
+                f"kubectl -n {namespace} wait --for=condition=complete job/{job_name} "
+                f"--timeout={args.benchmark['timeout_seconds']}s >&2; "
+                f"kubectl -n {namespace} logs job/{job_name}"
+            ),
+            environment=self.kubectl_environment,
+            delete="true",
+            triggers=[args.benchmark["run_id"]],
+            opts=pulumi.ResourceOptions(parent=self, depends_on=[job]),
+        )
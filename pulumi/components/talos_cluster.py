@@ -5,9 +5,13 @@ import pulumi_kubernetes as kubernetes
 import pulumi_proxmoxve as proxmoxve
 import pulumiverse_talos as talos
 import base64
-import yaml
+from pathlib import Path
 from pulumi_command import local as command
-from talos_config import create_talos_secrets
+from kubectl import kubeconfig_environment, kubectl_script
+from talos_config import create_talos_secrets, render_talosconfig
+from etcd import etcd_disk_check_script, wal_fsync_gate_script
+from cluster_spec import ClusterSpec
+from proxmox_scheduler import DatastoreScheduler
 from components.talos_node import TalosNode, TalosNodeArgs
 
 
@@ -16,27 +20,24 @@ class TalosClusterArgs:
 
     def __init__(
         self,
-        cluster_name: str,
-        nodes: list[dict],
-        gateway: str,
+        spec: ClusterSpec,
         image_factories: dict,  # {"default": factory, "gpu": factory, ...}
-        talos_version: str,
-        kubernetes_version: str = None,
-        cluster_endpoint_ip: str = None,
-        use_cilium: bool = False,
-        cilium_version: str = "1.16.0",
         proxmox_provider: proxmoxve.Provider = None,
+        bootstrap_from_snapshot: str = None,
+        recover_skip_hash_check: bool = False,
+        proxmox_scheduler: DatastoreScheduler = None,
     ):
-        self.cluster_name = cluster_name
-        self.nodes = nodes
-        self.gateway = gateway
+        self.spec = spec
         self.image_factories = image_factories
-        self.talos_version = talos_version
-        self.kubernetes_version = kubernetes_version
-        self.cluster_endpoint_ip = cluster_endpoint_ip or nodes[0]["ip"]
-        self.use_cilium = use_cilium
-        self.cilium_version = cilium_version
         self.proxmox_provider = proxmox_provider
+        self.proxmox_scheduler = proxmox_scheduler
+        # Local etcd snapshot to restore instead of bootstrapping an empty etcd
+        if bootstrap_from_snapshot and not Path(bootstrap_from_snapshot).is_file():
+            raise ValueError(
+                f"bootstrap_from_snapshot '{bootstrap_from_snapshot}' is not a file"
+            )
+        self.bootstrap_from_snapshot = bootstrap_from_snapshot
+        self.recover_skip_hash_check = recover_skip_hash_check
 
 
 class TalosCluster(pulumi.ComponentResource):
@@ -45,9 +46,13 @@ class TalosCluster(pulumi.ComponentResource):
     - Generates Talos secrets
     - Creates multiple TalosNode components
     - Bootstraps the cluster
-    - Waits for cluster health
     - Generates kubeconfig and talosconfig
-    - Creates Kubernetes provider
+    - Gates on the API server answering with a Ready bootstrap node (`api_ready`)
+    - Gates on every node being healthy (`all_nodes_ready`)
+    - Creates a Kubernetes provider behind `api_ready`
+    Resources that only need the API and CNI use `k8s_provider` and start while
+    workers are still joining; anything that needs the full fleet should also
+    depend on `all_nodes_ready`.
     """
 
     def __init__(
@@ -58,70 +63,47 @@ class TalosCluster(pulumi.ComponentResource):
     ):
         super().__init__("custom:talos:Cluster", name, {}, opts)
 
+        spec = args.spec
+
         # Create Talos secrets
         self.talos_secrets = create_talos_secrets(
-            args.cluster_name,
-            talos_version=args.talos_version,
+            spec.cluster_name,
+            talos_version=spec.talos_version,
         )
 
         # Create nodes
         self.nodes = []
         self.kubeconfig_raw = None
-        self.controlplane_ips = []
+        self.controlplane_ips = [node.ip for node in spec.controlplanes]
+        self.worker_ips = [node.ip for node in spec.workers]
+        bootstrap_node = spec.bootstrap_node
         bootstrap_resources = []
         previous_config_apply = None  # Track dependencies for sequential updates
 
-        cluster_endpoint = f"https://{args.cluster_endpoint_ip}:6443"
-
-        # Separate nodes: controlplane first, then workers
-        controlplane_configs = [n for n in args.nodes if n["role"] == "controlplane"]
-        worker_configs = [n for n in args.nodes if n["role"] == "worker"]
-        ordered_node_configs = controlplane_configs + worker_configs
-
-        for node_config in ordered_node_configs:
-            is_bootstrap = (
-                node_config["role"] == "controlplane"
-                and node_config["ip"] == args.cluster_endpoint_ip
-            )
-
-            # Select image factory for this node
-            image_profile = node_config.get("talosImage", "default")
-            if image_profile not in args.image_factories:
-                raise ValueError(
-                    f"Image profile '{image_profile}' not found in image_factories"
-                )
+        cluster_endpoint = f"https://{spec.endpoint_ip}:6443"
 
-            image_factory = args.image_factories[image_profile]
+        # Controlplane first, then workers
+        for node_spec in spec.controlplanes + spec.workers:
+            is_bootstrap = node_spec.name == bootstrap_node.name
+            image_factory = args.image_factories[node_spec.image_profile]
 
             # Build dependencies: each node waits for previous node's config to be applied
             node_dependencies = [previous_config_apply] if previous_config_apply else []
 
             node = TalosNode(
-                node_config["name"],
+                node_spec.name,
                 TalosNodeArgs(
-                    name=node_config["name"],
-                    ip=node_config["ip"],
-                    role=node_config["role"],
-                    gateway=args.gateway,
+                    node=node_spec,
+                    cluster=spec,
                     talos_secrets=self.talos_secrets,
-                    cluster_name=args.cluster_name,
                     cluster_endpoint=cluster_endpoint,
                     talos_installer_image=image_factory.installer_image,
                     talos_iso_file_id=image_factory.iso_file_id,
-                    node_type=node_config.get("type", "proxmox"),
-                    cpu=node_config.get("cpu", 2),
-                    memory=node_config.get("memory", 2048),
-                    install_disk=node_config.get("install_disk", "/dev/sda"),
-                    disks=node_config.get("disks", []),
-                    machine=node_config.get("machine", "q35"),
-                    pcie_devices=node_config.get("pcie_devices", []),
-                    node_labels=node_config.get("labels", {}),
-                    node_taints=node_config.get("taints", []),
                     proxmox_provider=args.proxmox_provider,
-                    use_cilium=args.use_cilium,
-                    cilium_version=args.cilium_version,
-                    kubernetes_version=args.kubernetes_version,
+                    proxmox_scheduler=args.proxmox_scheduler,
                     is_bootstrap=is_bootstrap,
+                    bootstrap_from_snapshot=args.bootstrap_from_snapshot,
+                    recover_skip_hash_check=args.recover_skip_hash_check,
                     config_dependencies=node_dependencies,
                 ),
                 opts=pulumi.ResourceOptions(parent=self),
@@ -132,19 +114,24 @@ class TalosCluster(pulumi.ComponentResource):
 
             if is_bootstrap:
                 self.kubeconfig_raw = node.kubeconfig.kubeconfig_raw
-                self.controlplane_ips.append(node_config["ip"])
                 bootstrap_resources.append(node.bootstrap)
-            elif node_config["role"] == "controlplane":
-                self.controlplane_ips.append(node_config["ip"])
 
-        # Generate talosconfig
+        # Generate talosconfig, with every control plane as an endpoint
         self.talosconfig_yaml = self._create_talosconfig(
-            args.cluster_name, args.cluster_endpoint_ip
+            spec.cluster_name, bootstrap_node.ip
         )
 
-        # Wait for cluster health
-        self.health_check = self._create_health_check(
-            args.cluster_endpoint_ip, bootstrap_resources
+        # The API server answers and the bootstrap node is Ready (so the CNI runs)
+        self.api_ready = self._create_api_ready_check(
+            bootstrap_node.name, bootstrap_resources
+        )
+
+        # Every configured node has joined and the cluster reports healthy
+        self.all_nodes_ready = self._create_health_check(
+            bootstrap_node.ip,
+            [*bootstrap_resources, previous_config_apply],
+            wal_fsync_p99_ms=spec.etcd["wal_fsync_p99_ms"] if spec.etcd else None,
+            etcd_disk=bool(spec.etcd and spec.etcd["disk"]),
         )
 
         # Create Kubernetes provider
@@ -154,7 +141,7 @@ class TalosCluster(pulumi.ComponentResource):
             enable_server_side_apply=True,
             opts=pulumi.ResourceOptions(
                 parent=self,
-                depends_on=[self.health_check],
+                depends_on=[self.api_ready],
             ),
         )
 
@@ -168,35 +155,65 @@ class TalosCluster(pulumi.ComponentResource):
         )
 
     def _create_talosconfig(
-        self, cluster_name: str, cluster_endpoint_ip: str
+        self, cluster_name: str, default_node_ip: str
     ) -> pulumi.Output[str]:
         """Generate talosconfig YAML"""
-
-        def create_talosconfig_dict(client_config):
-            return {
-                "context": cluster_name,
-                "contexts": {
-                    cluster_name: {
-                        "endpoints": [cluster_endpoint_ip],
-                        "nodes": [cluster_endpoint_ip],
-                        "ca": client_config["ca_certificate"],
-                        "crt": client_config["client_certificate"],
-                        "key": client_config["client_key"],
-                    }
-                },
-            }
-
-        talosconfig_dict = self.talos_secrets.client_configuration.apply(
-            create_talosconfig_dict
+        # Not the VIP: it moves with etcd leadership and is down while etcd is
+        return self.talos_secrets.client_configuration.apply(
+            lambda cfg: render_talosconfig(
+                cluster_name, self.controlplane_ips, cfg, node_ip=default_node_ip
+            )
         )
-        return talosconfig_dict.apply(
-            lambda cfg: yaml.dump(cfg, default_flow_style=False)
+
+    def _create_api_ready_check(
+        self, bootstrap_node_name: str, bootstrap_resources: list
+    ) -> command.Command:
+        """Wait for the API server to be ready and the bootstrap node to report Ready"""
+        # A node only turns Ready once its CNI is up, so this covers the CNI too
+        return command.Command(
+            "cluster-api-ready",
+            create=kubectl_script(
+                "for i in $(seq 1 90); do "
+                "kubectl get --raw=/readyz >/dev/null 2>&1 && "
+                f"kubectl wait --for=condition=Ready node/{bootstrap_node_name} --timeout=10s >/dev/null 2>&1 && exit 0; "
+                "sleep 10; "
+                "done; "
+                "exit 1"
+            ),
+            environment=kubeconfig_environment(self.kubeconfig_raw),
+            delete="true",
+            opts=pulumi.ResourceOptions(
+                parent=self,
+                depends_on=bootstrap_resources,
+            ),
         )
 
     def _create_health_check(
-        self, cluster_endpoint_ip: str, bootstrap_resources: list
+        self,
+        node_ip: str,
+        depends_on: list,
+        wal_fsync_p99_ms: float = None,
+        etcd_disk: bool = False,
     ) -> command.Command:
-        """Wait for Talos cluster to report healthy"""
+        """Wait for every configured node to join and the Talos cluster to report healthy"""
+        talosctl = "talosctl --talosconfig /tmp/talosconfig.yaml"
+        # Optionally gate on etcd WAL fsync p99 once the cluster is healthy,
+        # retried with the health check as the histogram settles
+        wal_fsync_gate = (
+            wal_fsync_gate_script(self.controlplane_ips, wal_fsync_p99_ms) + " && "
+            if wal_fsync_p99_ms
+            else ""
+        )
+        # A control plane without the etcd mount can't be fixed by retrying,
+        # so that check fails straight away
+        etcd_disk_check = (
+            etcd_disk_check_script(talosctl, self.controlplane_ips) if etcd_disk else ""
+        )
+        # Explicit node lists, so health doesn't pass before a slow worker has joined
+        node_flags = f"--control-plane-nodes {','.join(self.controlplane_ips)}"
+        if self.worker_ips:
+            node_flags += f" --worker-nodes {','.join(self.worker_ips)}"
+
         talosconfig_b64 = self.talosconfig_yaml.apply(
             lambda cfg: base64.b64encode(cfg.encode("utf-8")).decode("utf-8")
         )
@@ -208,7 +225,7 @@ class TalosCluster(pulumi.ComponentResource):
                     "set -euo pipefail; "
                     "printf %s '" + b64 + "' | base64 -d > /tmp/talosconfig.yaml; "
                     "for i in $(seq 1 60); do "
-                    f"talosctl --talosconfig /tmp/talosconfig.yaml -n {cluster_endpoint_ip} health && exit 0; "
+                    f"{talosctl} -n {node_ip} health {node_flags} && {{ {etcd_disk_check}{wal_fsync_gate}exit 0; }}; "
                     "sleep 10; "
                     "done; "
                     "exit 1"
@@ -217,6 +234,6 @@ class TalosCluster(pulumi.ComponentResource):
             delete="true",
             opts=pulumi.ResourceOptions(
                 parent=self,
-                depends_on=bootstrap_resources if bootstrap_resources else [],
+                depends_on=depends_on,
             ),
         )
@@ -4,6 +4,7 @@ import pulumi
 import pulumi_proxmoxve as proxmoxve
 import pulumiverse_talos as talos
 import json
+from proxmox_scheduler import DatastoreScheduler
 
 
 class TalosImageFactoryArgs:
@@ -19,6 +20,7 @@ class TalosImageFactoryArgs:
         datastore_id: str = "local",
         proxmox_provider: proxmoxve.Provider = None,
         upload_to_proxmox: bool = True,
+        proxmox_scheduler: DatastoreScheduler = None,
     ):
         self.talos_version = talos_version
         self.platform = platform
@@ -28,6 +30,7 @@ class TalosImageFactoryArgs:
         self.datastore_id = datastore_id
         self.proxmox_provider = proxmox_provider
         self.upload_to_proxmox = upload_to_proxmox
+        self.proxmox_scheduler = proxmox_scheduler
 
 
 class TalosImageFactory(pulumi.ComponentResource):
@@ -73,6 +76,12 @@ class TalosImageFactory(pulumi.ComponentResource):
         # Optionally download ISO to Proxmox (skip for external-only artifacts)
         self.iso_file = None
         if args.proxmox_provider and args.upload_to_proxmox:
+            iso_opts = {"parent": self, "provider": args.proxmox_provider}
+            operation = None
+            if args.proxmox_scheduler:
+                operation = args.proxmox_scheduler.acquire(
+                    f"{name}-iso", args.node_name, [args.datastore_id]
+                )
             self.iso_file = proxmoxve.download.File(
                 f"{name}-iso",
                 content_type="iso",
@@ -83,11 +92,14 @@ class TalosImageFactory(pulumi.ComponentResource):
                     lambda s_id: f"talos-{args.talos_version}-{s_id[:12]}-{args.platform}-{args.arch}.iso"
                 ),
                 overwrite=True,
-                opts=pulumi.ResourceOptions(
-                    parent=self,
-                    provider=args.proxmox_provider,
+                opts=(
+                    args.proxmox_scheduler.resource_options(operation, **iso_opts)
+                    if operation
+                    else pulumi.ResourceOptions(**iso_opts)
                 ),
             )
+            if operation:
+                args.proxmox_scheduler.release(operation, self.iso_file)
 
         # Expose iso_file_id attribute safely (None when upload skipped)
         self.iso_file_id = self.iso_file.id if self.iso_file else None
@@ -4,6 +4,13 @@ import pulumi
 import pulumi_proxmoxve as proxmoxve
 import pulumiverse_talos as talos
 from talos_config import apply_talos_config
+from volumes import volume_disk_serial
+from cluster_spec import ClusterSpec, NodeSpec
+from proxmox_scheduler import DatastoreScheduler
+
+PROXMOX_HOST = "pve01"
+# EFI disk and cloud-init drive of every VM
+VM_DATASTORE = "local-lvm"
 
 
 class TalosNodeArgs:
@@ -11,55 +18,31 @@ class TalosNodeArgs:
 
     def __init__(
         self,
-        name: str,
-        ip: str,
-        role: str,
-        gateway: str,
+        node: NodeSpec,
+        cluster: ClusterSpec,
         talos_secrets: talos.machine.Secrets,
-        cluster_name: str,
         cluster_endpoint: str,
         talos_installer_image: pulumi.Output[str],
         talos_iso_file_id: pulumi.Output[str],
-        node_type: str = "proxmox",
-        cpu: int = 2,
-        memory: int = 2048,
-        install_disk: str = "/dev/sda",
-        disks: list = None,
-        machine: str = "q35",
-        pcie_devices: list = None,
-        node_labels: dict = None,
-        node_taints: list = None,
         proxmox_provider: proxmoxve.Provider = None,
-        use_cilium: bool = False,
-        cilium_version: str = "1.16.0",
-        kubernetes_version: str = None,
         is_bootstrap: bool = False,
+        bootstrap_from_snapshot: str = None,
+        recover_skip_hash_check: bool = False,
         config_dependencies: list = None,
+        proxmox_scheduler: DatastoreScheduler = None,
     ):
-        self.name = name
-        self.ip = ip
-        self.role = role
-        self.gateway = gateway
+        self.node = node
+        self.cluster = cluster
         self.talos_secrets = talos_secrets
-        self.cluster_name = cluster_name
         self.cluster_endpoint = cluster_endpoint
         self.talos_installer_image = talos_installer_image
         self.talos_iso_file_id = talos_iso_file_id
-        self.node_type = node_type
-        self.cpu = cpu
-        self.memory = memory
-        self.machine = machine
-        self.disks = disks or []
-        self.pcie_devices = pcie_devices or []
-        self.node_labels = node_labels or {}
-        self.node_taints = node_taints or []
-        self.install_disk = install_disk
         self.proxmox_provider = proxmox_provider
-        self.use_cilium = use_cilium
-        self.cilium_version = cilium_version
-        self.kubernetes_version = kubernetes_version
         self.is_bootstrap = is_bootstrap
+        self.bootstrap_from_snapshot = bootstrap_from_snapshot
+        self.recover_skip_hash_check = recover_skip_hash_check
         self.config_dependencies = config_dependencies or []
+        self.proxmox_scheduler = proxmox_scheduler
 
 
 class TalosNode(pulumi.ComponentResource):
@@ -79,38 +62,50 @@ class TalosNode(pulumi.ComponentResource):
     ):
         super().__init__("custom:talos:Node", name, {}, opts)
 
-        self.ip = args.ip
-        self.role = args.role
+        node = args.node
+        cluster = args.cluster
+        self.ip = node.ip
+        self.role = node.role
+        self.content_hash = node.content_hash
         self.vm = None
 
         # Create VM if not external node
-        if args.node_type == "external":
+        if node.is_external:
             pulumi.log.info(
-                f"Skipping VM creation for {args.name} (external node at {args.ip})"
+                f"Skipping VM creation for {node.name} (external node at {node.ip})"
             )
         else:
             self.vm = self._create_vm(args)
 
         # Apply Talos configuration
         config_result = apply_talos_config(
-            name=args.name,
+            name=node.name,
             secrets=args.talos_secrets,
-            cluster_name=args.cluster_name,
+            cluster_name=cluster.cluster_name,
             cluster_endpoint=args.cluster_endpoint,
-            node_ip=args.ip,
-            role=args.role,
+            node_ip=node.ip,
+            role=node.role,
             vm=self.vm,
-            gateway=args.gateway,
-            node_type=args.node_type,
-            use_cilium=args.use_cilium,
-            cilium_version=args.cilium_version,
-            kubernetes_version=args.kubernetes_version,
-            install_disk=args.install_disk,
+            gateway=cluster.gateway,
+            network_prefix=cluster.network_prefix,
+            node_type=node.type,
+            use_cilium=cluster.use_cilium,
+            cilium_version=cluster.cilium_version,
+            kubernetes_version=cluster.kubernetes_version,
+            install_disk=node.install_disk,
             install_image=args.talos_installer_image,
-            enable_gpu=len(args.pcie_devices) > 0,
-            node_labels=args.node_labels,
-            node_taints=args.node_taints,
+            enable_gpu=node.enable_gpu,
+            gpu_sharing=node.gpu_sharing,
+            volumes=list(node.volumes),
+            etcd=cluster.etcd,
+            control_plane=cluster.control_plane,
+            kubelet=node.kubelet,
+            node_labels=node.labels,
+            node_taints=node.taints,
+            vip=cluster.vip,
             bootstrap=args.is_bootstrap,
+            bootstrap_from_snapshot=args.bootstrap_from_snapshot,
+            recover_skip_hash_check=args.recover_skip_hash_check,
             config_dependencies=args.config_dependencies,
         )
 
@@ -138,9 +133,10 @@ class TalosNode(pulumi.ComponentResource):
 
     def _create_vm(self, args: TalosNodeArgs) -> proxmoxve.vm.VirtualMachine:
         """Create a Proxmox VM for the Talos node"""
+        node = args.node
         # Prepare PCIe devices if provided
         hostpcis = None
-        if args.pcie_devices:
+        if node.pcie_devices:
             hostpcis = [
                 proxmoxve.vm.VirtualMachineHostpciArgs(
                     device=f"hostpci{idx}",
@@ -149,25 +145,61 @@ class TalosNode(pulumi.ComponentResource):
                     rombar=True,  # Enable ROM BAR for GPU initialization
                     xvga=False,  # Don't use as primary VGA to avoid conflicts
                 )
-                for idx, device_mapping in enumerate(args.pcie_devices)
+                for idx, device_mapping in enumerate(node.pcie_devices)
             ]
 
-        return proxmoxve.vm.VirtualMachine(
-            f"{args.name}-vm",
-            node_name="pve01",
+        # Data volumes go after the system disks and carry their name as the
+        # drive serial so the matching UserVolumeConfig can find them. Without
+        # explicit disks, spell out the system disk so scsi0 still exists.
+        data_volumes = list(node.volumes)
+        etcd = args.cluster.etcd
+        if node.is_controlplane and etcd and etcd["disk"]:
+            data_volumes.append(etcd["disk"])
+        system_disks = list(node.disks) or (
+            [{"size": 20, "datastore_id": "local-lvm", "file_format": "raw"}]
+            if data_volumes
+            else []
+        )
+        volume_disks = [
+            self._volume_disk_args(f"scsi{len(system_disks) + volume_idx}", volume)
+            for volume_idx, volume in enumerate(data_volumes)
+        ]
+
+        # IO threads are only honoured with one SCSI controller per disk
+        scsi_hardware = (
+            "virtio-scsi-single"
+            if any(volume["iothread"] for volume in data_volumes)
+            else None
+        )
+
+        # Every datastore the VM allocates on is locked while it is created
+        vm_opts = {"parent": self, "provider": args.proxmox_provider}
+        operation = None
+        if args.proxmox_scheduler:
+            operation = args.proxmox_scheduler.acquire(
+                f"{node.name}-vm",
+                PROXMOX_HOST,
+                [VM_DATASTORE]
+                + [disk["datastore_id"] for disk in system_disks]
+                + [volume["datastore_id"] for volume in data_volumes],
+            )
+
+        vm = proxmoxve.vm.VirtualMachine(
+            f"{node.name}-vm",
+            node_name=PROXMOX_HOST,
             agent=proxmoxve.vm.VirtualMachineAgentArgs(
                 enabled=True,
                 type="virtio",
             ),
             bios="ovmf",
             efi_disk=proxmoxve.vm.VirtualMachineEfiDiskArgs(
-                datastore_id="local-lvm",
+                datastore_id=VM_DATASTORE,
                 file_format="raw",
                 type="4m",
             ),
-            machine=args.machine,
+            machine=node.machine,
             cpu=proxmoxve.vm.VirtualMachineCpuArgs(
-                cores=args.cpu,
+                cores=node.cpu,
                 sockets=1,
                 type="host",
             ),
@@ -180,31 +212,34 @@ class TalosNode(pulumi.ComponentResource):
                 # ),
                 proxmoxve.vm.VirtualMachineDiskArgs(
                     interface=f"scsi{disk_idx}",
-                    size=int(disk.get("size", 20)),
-                    datastore_id=disk.get("datastore_id", "local-lvm"),
-                    file_format=disk.get("file_format", "raw"),
-                ) for disk_idx, disk in enumerate(args.disks)
-            ],
-            memory=proxmoxve.vm.VirtualMachineMemoryArgs(dedicated=args.memory),
+                    size=disk["size"],
+                    datastore_id=disk["datastore_id"],
+                    file_format=disk["file_format"],
+                )
+                for disk_idx, disk in enumerate(system_disks)
+            ]
+            + volume_disks,
+            scsi_hardware=scsi_hardware,
+            memory=proxmoxve.vm.VirtualMachineMemoryArgs(dedicated=node.memory),
             network_devices=[
                 proxmoxve.vm.VirtualMachineNetworkDeviceArgs(
                     model="virtio", bridge="vmbr0"
                 )
             ],
             initialization=proxmoxve.vm.VirtualMachineInitializationArgs(
-                datastore_id="local-lvm",
+                datastore_id=VM_DATASTORE,
                 type="nocloud",
                 interface="ide0",
                 ip_configs=[
                     proxmoxve.vm.VirtualMachineInitializationIpConfigArgs(
                         ipv4=proxmoxve.vm.VirtualMachineInitializationIpConfigIpv4Args(
-                            address=f"{args.ip}/24",
-                            gateway=args.gateway,
+                            address=f"{node.ip}/{args.cluster.network_prefix}",
+                            gateway=args.cluster.gateway,
                         )
                     )
                 ],
                 dns=proxmoxve.vm.VirtualMachineInitializationDnsArgs(
-                    servers=[args.gateway],
+                    servers=[args.cluster.gateway],
                 ),
             ),
             cdrom=proxmoxve.vm.VirtualMachineCdromArgs(
@@ -213,8 +248,29 @@ class TalosNode(pulumi.ComponentResource):
             ),
             boot_orders=["scsi0"],
             hostpcis=hostpcis,
-            opts=pulumi.ResourceOptions(
-                parent=self,
-                provider=args.proxmox_provider,
+            opts=(
+                args.proxmox_scheduler.resource_options(operation, **vm_opts)
+                if operation
+                else pulumi.ResourceOptions(**vm_opts)
             ),
         )
+        if operation:
+            args.proxmox_scheduler.release(operation, vm)
+        return vm
+
+    @staticmethod
+    def _volume_disk_args(
+        interface: str, volume: dict
+    ) -> proxmoxve.vm.VirtualMachineDiskArgs:
+        """Proxmox disk for a data volume, tagged with its serial"""
+        return proxmoxve.vm.VirtualMachineDiskArgs(
+            interface=interface,
+            size=volume["size"],
+            datastore_id=volume["datastore_id"],
+            file_format=volume["file_format"],
+            iothread=volume["iothread"],
+            ssd=volume["ssd"],
+            discard="on" if volume["discard"] else "ignore",
+            cache=volume["cache"],
+            serial=volume_disk_serial(volume),
+        )
@@ -0,0 +1,118 @@
+"""TalosPrepare Pulumi Component"""
+
+import pulumi
+from pulumi_command import local as command
+from cluster_spec import ClusterSpec
+
+
+def build_prepare_report(talos_version: str, installers: dict, isos: dict) -> dict:
+    """
+    What a prepare run staged and the time the upgrade run saves by it.
+    Upgrades run one node at a time, so every node's installer pull would be
+    on the critical path; ISO downloads happen before the first upgrade.
+    """
+    pull_seconds = sum(installer["pull_seconds"] for installer in installers.values())
+    iso_seconds = sum(iso["download_seconds"] for iso in isos.values())
+    return {
+        "talos_version": talos_version,
+        "installers": installers,
+        "isos": isos,
+        "expected_seconds_saved": round(pull_seconds + iso_seconds),
+    }
+
+
+class TalosPrepareArgs:
+    """Arguments for TalosPrepare component"""
+
+    def __init__(
+        self,
+        spec: ClusterSpec,
+        talos_version: str,  # the candidate release
+        image_profiles: dict,  # name -> ImageProfileSpec of the candidate
+        image_factories: dict,  # {"default": factory, "gpu": factory, ...}
+        talosconfig_path: pulumi.Input[str],
+    ):
+        self.spec = spec
+        self.talos_version = talos_version
+        self.image_profiles = image_profiles
+        self.image_factories = image_factories
+        self.talosconfig_path = talosconfig_path
+
+
+class TalosPrepare(pulumi.ComponentResource):
+    """
+    A Pulumi ComponentResource that stages a Talos release ahead of upgrading:
+    - Pulls each node's candidate installer image into the node's system
+      containerd, where `talosctl upgrade` looks for it
+    - Times a download of each candidate ISO uploaded to Proxmox
+    - Reports what was staged and the expected time saved
+    No node config, version or VM changes; all nodes are staged concurrently.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        args: TalosPrepareArgs,
+        opts: pulumi.ResourceOptions = None,
+    ):
+        super().__init__("custom:talos:Prepare", name, {}, opts)
+
+        version = args.talos_version
+        installers = {}
+        for node in args.spec.nodes:
+            installer_image = args.image_factories[node.image_profile].installer_image
+            stage = command.Command(
+                f"{node.name}-stage-{version}",
+                create=pulumi.Output.all(installer_image, args.talosconfig_path).apply(
+                    lambda values, node=node: (
+                        "set -euo pipefail; start=$(date +%s); "
+                        f"talosctl --talosconfig {values[1]} --nodes {node.ip} "
+                        f"image pull --namespace system {values[0]} >&2; "
+                        "echo $(( $(date +%s) - start ))"
+                    )
+                ),
+                delete="true",
+                triggers=[installer_image],
+                opts=pulumi.ResourceOptions(parent=self),
+            )
+            installers[node.name] = pulumi.Output.all(
+                installer_image, stage.stdout
+            ).apply(
+                lambda values: {
+                    "image": values[0],
+                    "pull_seconds": int(values[1].strip().splitlines()[-1]),
+                }
+            )
+
+        isos = {}
+        for profile_name, profile in args.image_profiles.items():
+            if not profile.upload_to_proxmox:
+                continue
+            iso_url = args.image_factories[profile_name].iso_url
+            # Prints "<bytes> <seconds>" for one download of the ISO
+            timing = command.Command(
+                f"talos-iso-{profile_name}-{version}-timing",
+                create=iso_url.apply(
+                    lambda url: f"curl -sfL -o /dev/null -w '%{{size_download}} %{{time_total}}' '{url}'"
+                ),
+                delete="true",
+                triggers=[iso_url],
+                opts=pulumi.ResourceOptions(parent=self),
+            )
+            isos[profile_name] = timing.stdout.apply(
+                lambda out: {
+                    "size_bytes": int(float(out.split()[0])),
+                    "download_seconds": round(float(out.split()[1]), 1),
+                }
+            )
+
+        self.report = pulumi.Output.all(
+            installers=pulumi.Output.all(**installers) if installers else {},
+            isos=pulumi.Output.all(**isos) if isos else {},
+        ).apply(
+            lambda staged: build_prepare_report(
+                version, staged["installers"], staged["isos"]
+            )
+        )
+
+        self.register_outputs({"report": self.report})
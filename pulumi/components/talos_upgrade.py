@@ -2,6 +2,17 @@
 
 import pulumi
 from pulumi_command import local as command
+from cluster_spec import ClusterSpec, NodeSpec
+
+
+def surviving_endpoints(spec: ClusterSpec, node: NodeSpec) -> list:
+    """
+    Talos API endpoints that stay up while `node` reboots: every other
+    control plane, which proxies the node's requests to it. A single control
+    plane can only be reached directly.
+    """
+    others = [cp.ip for cp in spec.controlplanes if cp.ip != node.ip]
+    return others or [node.ip]
 
 
 class TalosUpgradeArgs:
@@ -9,14 +20,14 @@ class TalosUpgradeArgs:
 
     def __init__(
         self,
-        nodes: list[dict],
+        spec: ClusterSpec,
         image_factories: dict,  # {"default": factory, "gpu": factory, ...}
-        talosconfig_path: str = "./talosconfig.yaml",
+        talosconfig_path: pulumi.Input[str],
         preserve_data: bool = True,
         stage_upgrade: bool = False,
         force: bool = False,
     ):
-        self.nodes = nodes
+        self.spec = spec
         self.image_factories = image_factories
         self.talosconfig_path = talosconfig_path
         self.preserve_data = preserve_data
@@ -31,6 +42,8 @@ class TalosUpgrade(pulumi.ComponentResource):
     - Upgrades control plane nodes first, one at a time
     - Then upgrades worker nodes, one at a time
     - Waits for node health between upgrades
+    - Talks to each node through the other control planes, so the client
+      never depends on the node that is rebooting
     """
 
     def __init__(
@@ -44,9 +57,8 @@ class TalosUpgrade(pulumi.ComponentResource):
         self.upgrade_commands = []
         previous_upgrade = None
 
-        # Separate nodes by role
-        controlplane_nodes = [n for n in args.nodes if n["role"] == "controlplane"]
-        worker_nodes = [n for n in args.nodes if n["role"] == "worker"]
+        controlplane_nodes = args.spec.controlplanes
+        worker_nodes = args.spec.workers
 
         pulumi.log.info(
             f"Planning to upgrade {len(controlplane_nodes)} control plane nodes and {len(worker_nodes)} worker nodes"
@@ -55,7 +67,7 @@ class TalosUpgrade(pulumi.ComponentResource):
         # Upgrade control plane nodes first
         for node in controlplane_nodes:
             pulumi.log.info(
-                f"Scheduling upgrade for control plane node {node['name']} at {node['ip']}"
+                f"Scheduling upgrade for control plane node {node.name} at {node.ip}"
             )
             upgrade_cmd = self._create_upgrade_command(
                 node, args, depends_on=[previous_upgrade] if previous_upgrade else []
@@ -66,7 +78,7 @@ class TalosUpgrade(pulumi.ComponentResource):
         # Upgrade worker nodes
         for node in worker_nodes:
             pulumi.log.info(
-                f"Scheduling upgrade for worker node {node['name']} at {node['ip']}"
+                f"Scheduling upgrade for worker node {node.name} at {node.ip}"
             )
             upgrade_cmd = self._create_upgrade_command(
                 node, args, depends_on=[previous_upgrade] if previous_upgrade else []
@@ -83,25 +95,27 @@ class TalosUpgrade(pulumi.ComponentResource):
         )
 
     def _create_upgrade_command(
-        self, node: dict, args: TalosUpgradeArgs, depends_on: list
+        self, node: NodeSpec, args: TalosUpgradeArgs, depends_on: list
     ) -> command.Command:
         """Create upgrade command for a single node"""
 
         # Get the target installer image for this node
-        image_profile = node.get("talosImage", "default")
-        if image_profile not in args.image_factories:
-            raise ValueError(
-                f"Image profile '{image_profile}' not found in image_factories"
+        target_installer_image = args.image_factories[
+            node.image_profile
+        ].installer_image
+        talosctl = pulumi.Output.from_input(args.talosconfig_path).apply(
+            lambda path: (
+                f"talosctl --talosconfig {path} "
+                f"--endpoints {','.join(surviving_endpoints(args.spec, node))} "
+                f"--nodes {node.ip}"
             )
-
-        target_installer_image = args.image_factories[image_profile].installer_image
+        )
 
         # Check current version first
         version_check = command.Command(
-            f"{node['name']}-version-check",
-            create=target_installer_image.apply(
-                lambda img: f"talosctl --talosconfig {args.talosconfig_path} "
-                f"--nodes {node['ip']} version --short || echo 'unknown'"
+            f"{node.name}-version-check",
+            create=talosctl.apply(
+                lambda talosctl: f"{talosctl} version --short || echo 'unknown'"
             ),
             opts=pulumi.ResourceOptions(
                 parent=self,
@@ -110,10 +124,9 @@ class TalosUpgrade(pulumi.ComponentResource):
         )
 
         # Build upgrade command
-        def build_upgrade_cmd(img: str) -> str:
+        def build_upgrade_cmd(img: str, talosctl: str) -> str:
             cmd_parts = [
-                f"talosctl --talosconfig {args.talosconfig_path}",
-                f"--nodes {node['ip']}",
+                talosctl,
                 "upgrade",
                 f"--image {img}",
             ]
@@ -130,44 +143,42 @@ class TalosUpgrade(pulumi.ComponentResource):
             # Add wait for health check after upgrade
             # For workers, skip etcd check (workers don't run etcd)
             cmd_parts.append("&&")
-            if node["role"] == "worker":
+            if not node.is_controlplane:
                 # Workers: just wait for node to come back up and be ready
-                cmd_parts.append(
-                    f"talosctl --talosconfig {args.talosconfig_path} "
-                    f"--nodes {node['ip']} version --short"
-                )
+                cmd_parts.append(f"{talosctl} version --short")
             else:
                 # Control plane: full health check including etcd
-                cmd_parts.append(
-                    f"talosctl --talosconfig {args.talosconfig_path} "
-                    f"--nodes {node['ip']} health --wait-timeout=10m"
-                )
+                cmd_parts.append(f"{talosctl} health --wait-timeout=10m")
 
             return " ".join(cmd_parts)
 
-        upgrade_script = target_installer_image.apply(
-            lambda img: f"""
+        def build_upgrade_script(values: list) -> str:
+            img, talosctl = values
+            return f"""
 set -e
-echo "Checking if {node['name']} needs upgrade to {img}..."
+echo "Checking if {node.name} needs upgrade to {img}..."
 
 # Get current version
-CURRENT=$(talosctl --talosconfig {args.talosconfig_path} --nodes {node['ip']} version --short 2>/dev/null | grep 'Server:' || echo "unknown")
+CURRENT=$({talosctl} version --short 2>/dev/null | grep 'Server:' || echo "unknown")
 
 # Check if upgrade is needed
 if echo "$CURRENT" | grep -q "{img.split(':')[-1]}"; then
-    echo "{node['name']} is already on target version, skipping upgrade"
+    echo "{node.name} is already on target version, skipping upgrade"
     exit 0
 fi
 
-echo "Upgrading {node['name']} from $CURRENT to {img}..."
-{build_upgrade_cmd(img)}
-echo "{node['name']} upgrade completed successfully"
+echo "Upgrading {node.name} from $CURRENT to {img}..."
+{build_upgrade_cmd(img, talosctl)}
+echo "{node.name} upgrade completed successfully"
 """
+
+        upgrade_script = pulumi.Output.all(target_installer_image, talosctl).apply(
+            build_upgrade_script
         )
 
         # Execute upgrade
         upgrade_cmd = command.Command(
-            f"{node['name']}-upgrade",
+            f"{node.name}-upgrade",
             create=upgrade_script,
             opts=pulumi.ResourceOptions(
                 parent=self,
@@ -0,0 +1,127 @@
+"""VClusterFleet Pulumi Component"""
+
+import pulumi
+import pulumi_kubernetes as kubernetes
+from pulumi_command import local as command
+from pulumi_kubernetes.helm.v3 import Release, ReleaseArgs
+from chart_cache import resolve_pinned_chart
+from kubectl import kubeconfig_environment, kubectl_script
+from vclusters import render_vcluster_values, vcluster_names
+
+
+class VClusterFleetArgs:
+    """Arguments for VClusterFleet component"""
+
+    def __init__(
+        self,
+        fleet: dict,  # resolved by vclusters.resolve_vcluster_fleet
+        k8s_provider: kubernetes.Provider,
+        kubeconfig: pulumi.Input[str],
+        data_source: pulumi.Input[
+            str
+        ] = None,  # DSN template for the "shared" store, "{name}" is the vcluster
+        depends_on: list = None,  # e.g. the cluster's all-nodes-ready gate
+    ):
+        self.fleet = fleet
+        self.k8s_provider = k8s_provider
+        self.kubeconfig = kubeconfig
+        self.data_source = data_source
+        self.depends_on = depends_on or []
+
+
+class VClusterFleet(pulumi.ComponentResource):
+    """
+    A Pulumi ComponentResource that stamps out virtual clusters:
+    - Creates a namespace and a vcluster Helm release per tenant from one template
+    - Applies the tenant quota, limit range and syncer limits to every stamp
+    - Times each vcluster from release to ready
+    Stamps don't depend on each other, so Pulumi creates them concurrently.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        args: VClusterFleetArgs,
+        opts: pulumi.ResourceOptions = None,
+    ):
+        super().__init__("custom:vcluster:VClusterFleet", name, {}, opts)
+
+        self.fleet = args.fleet
+        self.chart = resolve_pinned_chart("vcluster")
+        self.kubectl_environment = kubeconfig_environment(args.kubeconfig)
+
+        self.releases = {}
+        self.ready_seconds = {}
+        for vcluster_name in vcluster_names(args.fleet):
+            release, ready_check = self._create_vcluster(vcluster_name, args)
+            self.releases[vcluster_name] = release
+            self.ready_seconds[vcluster_name] = ready_check.stdout.apply(
+                lambda out: int(out.strip().splitlines()[-1])
+            )
+
+        self.register_outputs({"ready_seconds": self.ready_seconds})
+
+    def _create_vcluster(
+        self, vcluster_name: str, args: VClusterFleetArgs
+    ) -> tuple[Release, command.Command]:
+        """Create one vcluster and the command that waits for it"""
+        namespace = f"vcluster-{vcluster_name}"
+
+        data_source = None
+        if args.fleet["backing_store"] == "shared":
+            if args.data_source is None:
+                raise ValueError(
+                    "vclusters.backing_store 'shared' needs vcluster_data_source"
+                )
+            data_source = pulumi.Output.secret(
+                pulumi.Output.from_input(args.data_source).apply(
+                    lambda dsn: dsn.format(name=vcluster_name.replace("-", "_"))
+                )
+            )
+
+        vcluster_namespace = kubernetes.core.v1.Namespace(
+            f"vcluster-{vcluster_name}-namespace",
+            metadata={
+                "name": namespace,
+                "labels": {"vcluster.loft.sh/fleet": self.fleet["name_prefix"]},
+            },
+            opts=pulumi.ResourceOptions(
+                parent=self, provider=args.k8s_provider, depends_on=args.depends_on
+            ),
+        )
+
+        release = Release(
+            f"vcluster-{vcluster_name}",
+            ReleaseArgs(
+                name=vcluster_name,
+                chart=self.chart["path"],
+                namespace=namespace,
+                values=render_vcluster_values(args.fleet, data_source),
+                # Readiness is awaited (and timed) by the ready check below
+                skip_await=True,
+            ),
+            opts=pulumi.ResourceOptions(
+                parent=self,
+                provider=args.k8s_provider,
+                depends_on=[vcluster_namespace],
+            ),
+        )
+
+        # Prints the seconds from release to a ready control plane on its last line
+        ready_check = command.Command(
+            f"vcluster-{vcluster_name}-ready",
+            create=kubectl_script(
+                "start=$(date +%s); "
+                f"kubectl -n {namespace} rollout status statefulset/{vcluster_name} "
+                f"--timeout={args.fleet['ready_timeout_seconds']}s >&2; "
+                "echo $(( $(date +%s) - start ))"
+            ),
+            environment=self.kubectl_environment,
+            delete="true",
+            opts=pulumi.ResourceOptions(
+                parent=self,
+                depends_on=[release],
+            ),
+        )
+
+        return release, ready_check
@@ -0,0 +1,170 @@
+import yaml
+
+# Base values per profile; the per-node terms scale them with the node count
+# from the stack config. "default" leaves the Kubernetes defaults untouched.
+CONTROL_PLANE_PROFILES = {
+    "default": None,
+    "balanced": {
+        "max_requests_inflight": 400,
+        "max_mutating_requests_inflight": 200,
+        "inflight_per_node": 20,
+        "client_qps": 30,
+        "client_qps_per_node": 2,
+        "concurrent_syncs": 5,
+        "gitops_shares": 40,
+        "autoscaling_shares": 20,
+    },
+    "throughput": {
+        "max_requests_inflight": 800,
+        "max_mutating_requests_inflight": 400,
+        "inflight_per_node": 40,
+        "client_qps": 50,
+        "client_qps_per_node": 5,
+        "concurrent_syncs": 10,
+        "gitops_shares": 80,
+        "autoscaling_shares": 40,
+    },
+}
+
+# Service accounts given their own API Priority and Fairness levels, so ArgoCD
+# syncs and KEDA polling don't queue behind each other in workload-low
+APF_FLOWS = {
+    "gitops": {
+        "namespace": "argocd",
+        "service_accounts": [
+            "argocd-application-controller",
+            "argocd-applicationset-controller",
+            "argocd-repo-server",
+            "argocd-server",
+        ],
+        "matching_precedence": 800,
+    },
+    "autoscaling": {
+        "namespace": "keda",
+        "service_accounts": [
+            "keda-operator",
+            "keda-metrics-server",
+            "keda-add-ons-http-interceptor",
+            "keda-add-ons-http-external-scaler",
+        ],
+        "matching_precedence": 810,
+    },
+}
+
+
+def _render_apf_manifest(flow_name: str, flow: dict, shares: int) -> dict:
+    """Render a PriorityLevelConfiguration + FlowSchema pair as an inline manifest"""
+    priority_level = {
+        "apiVersion": "flowcontrol.apiserver.k8s.io/v1",
+        "kind": "PriorityLevelConfiguration",
+        "metadata": {"name": flow_name},
+        "spec": {
+            "type": "Limited",
+            "limited": {
+                "nominalConcurrencyShares": shares,
+                "lendablePercent": 50,
+                "limitResponse": {
+                    "type": "Queue",
+                    "queuing": {"queues": 64, "handSize": 6, "queueLengthLimit": 50},
+                },
+            },
+        },
+    }
+    flow_schema = {
+        "apiVersion": "flowcontrol.apiserver.k8s.io/v1",
+        "kind": "FlowSchema",
+        "metadata": {"name": flow_name},
+        "spec": {
+            "priorityLevelConfiguration": {"name": flow_name},
+            "matchingPrecedence": flow["matching_precedence"],
+            "distinguisherMethod": {"type": "ByUser"},
+            "rules": [
+                {
+                    "subjects": [
+                        {
+                            "kind": "ServiceAccount",
+                            "serviceAccount": {
+                                "name": sa,
+                                "namespace": flow["namespace"],
+                            },
+                        }
+                        for sa in flow["service_accounts"]
+                    ],
+                    "resourceRules": [
+                        {
+                            "verbs": ["*"],
+                            "apiGroups": ["*"],
+                            "resources": ["*"],
+                            "clusterScope": True,
+                            "namespaces": ["*"],
+                        }
+                    ],
+                    "nonResourceRules": [{"verbs": ["*"], "nonResourceURLs": ["*"]}],
+                }
+            ],
+        },
+    }
+    return {
+        "name": f"apf-{flow_name}",
+        "contents": yaml.dump_all(
+            [priority_level, flow_schema], default_flow_style=False, sort_keys=False
+        ),
+    }
+
+
+def render_control_plane_profile(profile: str, node_count: int) -> dict:
+    """
+    Render the `cluster` machine-config sections for a control-plane profile,
+    sized by the number of nodes in the cluster. Returns None for "default".
+    """
+    if profile not in CONTROL_PLANE_PROFILES:
+        raise ValueError(
+            f"control_plane_profile must be one of {list(CONTROL_PLANE_PROFILES)}, got '{profile}'"
+        )
+
+    settings = CONTROL_PLANE_PROFILES[profile]
+    if settings is None:
+        return None
+
+    extra_inflight = settings["inflight_per_node"] * node_count
+    client_qps = settings["client_qps"] + settings["client_qps_per_node"] * node_count
+    client_burst = client_qps * 2
+
+    return {
+        "apiServer": {
+            "extraArgs": {
+                "max-requests-inflight": str(
+                    settings["max_requests_inflight"] + extra_inflight
+                ),
+                "max-mutating-requests-inflight": str(
+                    settings["max_mutating_requests_inflight"] + extra_inflight // 2
+                ),
+            },
+        },
+        "controllerManager": {
+            "extraArgs": {
+                "kube-api-qps": str(client_qps),
+                "kube-api-burst": str(client_burst),
+                "concurrent-deployment-syncs": str(settings["concurrent_syncs"]),
+                "concurrent-replicaset-syncs": str(settings["concurrent_syncs"]),
+                "concurrent-endpoint-syncs": str(settings["concurrent_syncs"]),
+            },
+        },
+        # The scheduler runs from a config file, which ignores the deprecated
+        # --kube-api-qps/--kube-api-burst flags
+        "scheduler": {
+            "config": {
+                "apiVersion": "kubescheduler.config.k8s.io/v1",
+                "kind": "KubeSchedulerConfiguration",
+                "clientConnection": {"qps": client_qps, "burst": client_burst},
+            },
+        },
+        "inlineManifests": [
+            _render_apf_manifest(
+                "gitops", APF_FLOWS["gitops"], settings["gitops_shares"]
+            ),
+            _render_apf_manifest(
+                "autoscaling", APF_FLOWS["autoscaling"], settings["autoscaling_shares"]
+            ),
+        ],
+    }
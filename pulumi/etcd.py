@@ -0,0 +1,194 @@
+from volumes import validate_volumes
+
+# Name (and drive serial) of the dedicated etcd disk on control-plane VMs
+ETCD_DISK_NAME = "etcd"
+# QEMU exposes the drive serial in the SCSI disk's by-id link, which stays
+# put however the VM's disks are ordered
+ETCD_DISK_DEVICE = f"/dev/disk/by-id/scsi-0QEMU_QEMU_HARDDISK_{ETCD_DISK_NAME}"
+# Talos keeps etcd data here; the etcd disk is mounted over it
+ETCD_DATA_DIR = "/var/lib/etcd"
+ETCD_METRICS_PORT = 2381
+
+
+def resolve_etcd_config(etcd: dict) -> dict:
+    """
+    Resolve the stack-level `etcd` config block with defaults. The tuning
+    applies to every control-plane member so the cluster stays consistent.
+    Returns None when the block is not set.
+    """
+    if not etcd:
+        return None
+
+    heartbeat_interval = int(etcd.get("heartbeat_interval", 100))
+    election_timeout = int(etcd.get("election_timeout", 1000))
+    # etcd refuses to start unless the election timeout is at least 5 heartbeats
+    if election_timeout < 5 * heartbeat_interval:
+        raise ValueError(
+            f"etcd.election_timeout ({election_timeout}ms) must be at least 5x heartbeat_interval ({heartbeat_interval}ms)"
+        )
+
+    quota_backend_bytes = int(etcd.get("quota_backend_bytes", 4 * 1024**3))
+    disk = etcd.get("disk")
+    if disk:
+        disk = validate_volumes("controlplane", [{**disk, "name": ETCD_DISK_NAME}])[0]
+        # Talos formats machine.disks partitions as XFS
+        if disk["filesystem"] != "xfs":
+            raise ValueError(
+                f"etcd.disk.filesystem must be xfs, got '{disk['filesystem']}'"
+            )
+        # Defrag writes a full copy of the backend next to it
+        if disk["size"] * 1024**3 < 2 * quota_backend_bytes:
+            raise ValueError(
+                f"etcd.disk.size ({disk['size']}GB) must hold twice quota_backend_bytes ({quota_backend_bytes})"
+            )
+
+    return {
+        "disk": disk,
+        "quota_backend_bytes": quota_backend_bytes,
+        "heartbeat_interval": heartbeat_interval,
+        "election_timeout": election_timeout,
+        "snapshot_count": int(etcd.get("snapshot_count", 10000)),
+        "auto_compaction_retention": str(etcd.get("auto_compaction_retention", "1h")),
+        "defrag_schedule": etcd.get("defrag_schedule", "0 3 * * 0"),
+        "defrag_stagger_minutes": int(etcd.get("defrag_stagger_minutes", 15)),
+        "wal_fsync_p99_ms": etcd.get("wal_fsync_p99_ms"),
+    }
+
+
+def resolve_etcd_snapshot(etcd: dict, nfs: dict) -> dict:
+    """
+    Resolve `etcd.snapshot`, the scheduled etcd snapshots written to an NFS
+    share. The server and share default to the stack-level `nfs` block.
+    Returns None when snapshots are not configured.
+    """
+    snapshot = (etcd or {}).get("snapshot")
+    if not snapshot:
+        return None
+
+    nfs = nfs or {}
+    server = snapshot.get("server", nfs.get("server"))
+    share = snapshot.get("share", nfs.get("share"))
+    if not server or not share:
+        raise ValueError(
+            "etcd.snapshot needs server and share, or an nfs block to default them from"
+        )
+
+    retention = int(snapshot.get("retention", 14))
+    if retention < 1:
+        raise ValueError(f"etcd.snapshot.retention must be at least 1, got {retention}")
+
+    return {
+        "schedule": snapshot.get("schedule", "0 */6 * * *"),
+        "retention": retention,
+        "server": server,
+        "share": share,
+        "sub_dir": snapshot.get("sub_dir", "etcd-snapshots").strip("/"),
+        # Shell image for preparing the directory and rotating snapshots
+        "image": snapshot.get("image", "busybox:1.37"),
+    }
+
+
+def render_snapshot_rotate_script(directory: str, retention: int) -> str:
+    """
+    Shell script publishing the snapshot written by talosctl under a
+    timestamped name, pointing `latest.snapshot` at it and removing all but
+    the newest `retention` snapshots.
+    """
+    return (
+        "set -eu; "
+        f"cd {directory}; "
+        'name="etcd-$(date -u +%Y%m%dT%H%M%SZ).snapshot"; '
+        # Rename within the share so a half-written snapshot is never published
+        'mv .in-progress.snapshot "$name"; '
+        'ln -sfn "$name" latest.snapshot; '
+        f"ls -1t etcd-*.snapshot | tail -n +{retention + 1} | xargs -r rm -f; "
+        'echo "saved $name"; ls -l etcd-*.snapshot'
+    )
+
+
+def render_etcd_extra_args(etcd: dict, node_ip: str) -> dict:
+    """Render `cluster.etcd.extraArgs` for a control plane's machine patch."""
+    return {
+        "quota-backend-bytes": str(etcd["quota_backend_bytes"]),
+        "heartbeat-interval": str(etcd["heartbeat_interval"]),
+        "election-timeout": str(etcd["election_timeout"]),
+        "snapshot-count": str(etcd["snapshot_count"]),
+        "auto-compaction-mode": "periodic",
+        "auto-compaction-retention": etcd["auto_compaction_retention"],
+        # Plain-HTTP metrics listener so the health gate can read WAL fsync
+        # latency; bound to the node IP only, as it has no authentication
+        "listen-metrics-urls": f"http://{node_ip}:{ETCD_METRICS_PORT}",
+    }
+
+
+def stagger_cron_schedule(schedule: str, offset_minutes: int) -> str:
+    """
+    Shift the minute/hour fields of a cron schedule by `offset_minutes`.
+    Only plain numeric minute and hour fields can be shifted.
+    """
+    fields = schedule.split()
+    if len(fields) != 5 or not (fields[0].isdigit() and fields[1].isdigit()):
+        raise ValueError(
+            f"etcd.defrag_schedule must use a fixed minute and hour to stagger members, got '{schedule}'"
+        )
+    total = int(fields[1]) * 60 + int(fields[0]) + offset_minutes
+    # Wrapping past midnight keeps the day fields as-is, which is fine for a
+    # weekly/daily maintenance window
+    fields[0] = str(total % 60)
+    fields[1] = str((total // 60) % 24)
+    return " ".join(fields)
+
+
+def wal_fsync_gate_script(controlplane_ips: list, threshold_ms: float) -> str:
+    """
+    Shell condition that succeeds when every member's etcd WAL fsync p99
+    (from the etcd_disk_wal_fsync_duration_seconds histogram) is within
+    `threshold_ms`. It only sets its exit status, so the caller can retry it.
+    """
+    threshold_s = float(threshold_ms) / 1000
+    checks = []
+    for ip in controlplane_ips:
+        checks.append(
+            f"p99=$(curl -fsS --max-time 5 http://{ip}:{ETCD_METRICS_PORT}/metrics | awk '"
+            "/^etcd_disk_wal_fsync_duration_seconds_bucket/ { "
+            'match($0, /le="[^"]+"/); le = substr($0, RSTART + 4, RLENGTH - 5); '
+            "n++; les[n] = le; counts[n] = $NF } "
+            "/^etcd_disk_wal_fsync_duration_seconds_count/ { total = $NF } "
+            "END { for (i = 1; i <= n; i++) if (counts[i] >= 0.99 * total) { print les[i]; exit } }') || p99=; "
+            f'if [ -n "$p99" ] && awk -v p="$p99" \'BEGIN {{ exit !(p != "+Inf" && p <= {threshold_s}) }}\'; '
+            f'then echo "etcd {ip} WAL fsync p99 <= ${{p99}}s"; '
+            f'else echo "etcd {ip} WAL fsync p99 ${{p99:-unavailable}} above {threshold_ms}ms"; ok=0; fi; '
+        )
+    return "( ok=1; " + "".join(checks) + '[ "$ok" = 1 ] )'
+
+
+def render_etcd_disk() -> dict:
+    """
+    Render the `machine.disks` entry mounting the whole etcd disk at the etcd
+    data directory. UserVolumeConfig only mounts under /var/mnt, so this
+    uses the machine.disks partition mount; EPHEMERAL stays on the OS disk.
+    """
+    return {
+        "device": ETCD_DISK_DEVICE,
+        "partitions": [{"mountpoint": ETCD_DATA_DIR}],
+    }
+
+
+def etcd_disk_check_script(talosctl: str, controlplane_ips: list) -> str:
+    """
+    Shell snippet that fails when a control plane's etcd data directory is
+    not mounted from the dedicated etcd disk.
+    """
+    checks = []
+    for ip in controlplane_ips:
+        checks.append(
+            f"disk=$({talosctl} -n {ip} get disks -o yaml | awk -v serial={ETCD_DISK_NAME} '"
+            # One YAML document per disk; print the device with the etcd serial
+            '/^---/ { if (s == serial) print dev; s = dev = "" } '
+            "/^ +dev_path:/ { dev = $2 } /^ +serial:/ { s = $2 } "
+            "END { if (s == serial) print dev }') || disk=; "
+            f"source=$({talosctl} -n {ip} mounts | awk -v dir={ETCD_DATA_DIR} '$NF == dir {{ print $2 }}') || source=; "
+            f'case "$source" in "$disk"?*) [ -n "$disk" ] ;; *) false ;; esac '
+            f'|| {{ echo "etcd {ip}: {ETCD_DATA_DIR} is on ${{source:-EPHEMERAL}}, not the etcd disk ${{disk:-?}}"; exit 1; }}; '
+        )
+    return "".join(checks)
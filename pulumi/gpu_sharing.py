@@ -0,0 +1,122 @@
+from typing import TYPE_CHECKING
+
+import pulumi
+import yaml
+
+if TYPE_CHECKING:
+    import pulumi_kubernetes as kubernetes
+
+# Node label watched by the nvidia-device-plugin config-manager sidecar to pick
+# the per-node entry out of the shared config ConfigMap.
+DEVICE_PLUGIN_CONFIG_LABEL = "nvidia.com/device-plugin.config"
+DEVICE_PLUGIN_CONFIGMAP = "nvidia-device-plugin-config"
+DEFAULT_DEVICE_PLUGIN_CONFIG = "exclusive"
+
+GPU_SHARING_MODES = ("mps", "timeslicing")
+
+
+def validate_gpu_sharing(node_name: str, gpu_sharing: dict) -> dict:
+    """
+    Validate a node's `gpu_sharing` block and return it normalised.
+    Returns None when sharing is not configured.
+    """
+    if not gpu_sharing:
+        return None
+
+    mode = str(gpu_sharing.get("mode", "")).lower()
+    if mode not in GPU_SHARING_MODES:
+        raise ValueError(
+            f"Node '{node_name}': gpu_sharing.mode must be one of {GPU_SHARING_MODES}, got '{mode}'"
+        )
+
+    replicas = int(gpu_sharing.get("replicas", 2))
+    # A single replica is just exclusive access; MPS also rejects it outright
+    if replicas < 2:
+        raise ValueError(
+            f"Node '{node_name}': gpu_sharing.replicas must be at least 2, got {replicas}"
+        )
+
+    return {"mode": mode, "replicas": replicas}
+
+
+def gpu_sharing_config_name(gpu_sharing: dict) -> str:
+    """Name of the device-plugin config entry used by a sharing profile."""
+    if not gpu_sharing:
+        return DEFAULT_DEVICE_PLUGIN_CONFIG
+    return f"{gpu_sharing['mode']}-{gpu_sharing['replicas']}"
+
+
+def gpu_sharing_node_labels(gpu_sharing: dict) -> dict:
+    """Node labels selecting the device-plugin config and describing the share."""
+    labels = {DEVICE_PLUGIN_CONFIG_LABEL: gpu_sharing_config_name(gpu_sharing)}
+    if gpu_sharing:
+        labels["nvidia.com/gpu.sharing-strategy"] = gpu_sharing["mode"]
+        labels["nvidia.com/gpu.replicas"] = str(gpu_sharing["replicas"])
+    return labels
+
+
+def render_device_plugin_config(gpu_sharing: dict) -> str:
+    """Render a single nvidia-device-plugin config file for a sharing profile."""
+    config = {
+        "version": "v1",
+        "flags": {
+            "migStrategy": "none",
+            "failOnInitError": True,
+            "deviceDiscoveryStrategy": "auto",
+        },
+    }
+
+    if gpu_sharing:
+        sharing_key = "mps" if gpu_sharing["mode"] == "mps" else "timeSlicing"
+        config["sharing"] = {
+            sharing_key: {
+                # Keep the resource name as nvidia.com/gpu so existing
+                # workloads schedule unchanged, just onto a slice
+                "renameByDefault": False,
+                "failRequestsGreaterThanOne": True,
+                "resources": [
+                    {
+                        "name": "nvidia.com/gpu",
+                        "replicas": gpu_sharing["replicas"],
+                    }
+                ],
+            }
+        }
+
+    return yaml.dump(config, default_flow_style=False, sort_keys=False)
+
+
+def render_device_plugin_configs(nodes: tuple) -> dict:
+    """
+    Render every device-plugin config referenced by the nodes config,
+    keyed by config name. The exclusive (no sharing) entry is always present.
+    """
+    configs = {DEFAULT_DEVICE_PLUGIN_CONFIG: render_device_plugin_config(None)}
+    for node in nodes:
+        if node.gpu_sharing:
+            configs[gpu_sharing_config_name(node.gpu_sharing)] = (
+                render_device_plugin_config(node.gpu_sharing)
+            )
+    return configs
+
+
+def create_device_plugin_configmap(
+    nodes: tuple,
+    k8s_provider: "kubernetes.Provider",
+    depends_on: list = None,
+) -> "kubernetes.core.v1.ConfigMap":
+    """
+    Create the ConfigMap referenced by `config.name` in the
+    nvidia-device-plugin values, holding one entry per sharing profile.
+    """
+    import pulumi_kubernetes as kubernetes
+
+    return kubernetes.core.v1.ConfigMap(
+        "nvidia-device-plugin-config",
+        metadata={"name": DEVICE_PLUGIN_CONFIGMAP, "namespace": "kube-system"},
+        data=render_device_plugin_configs(nodes),
+        opts=pulumi.ResourceOptions(
+            provider=k8s_provider,
+            depends_on=depends_on or [],
+        ),
+    )
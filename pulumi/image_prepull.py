@@ -0,0 +1,210 @@
+import json
+import re
+from pathlib import Path
+
+import yaml
+
+from chart_cache import read_argocd_chart_source
+
+REPO_ROOT = Path(__file__).parent.parent
+KSERVE_APP = REPO_ROOT / "argocd" / "applications" / "kserve.yaml"
+KSERVE_VALUES = REPO_ROOT / "argocd" / "applications" / "values" / "kserve.yaml"
+DEFAULT_MANIFEST_DIRS = ("argocd/applications/manifests/kserve-models",)
+
+# KServe chart values key and default image per predictor model format. The
+# tag defaults to the chart version, as in the chart's ClusterServingRuntimes.
+KSERVE_RUNTIMES = {
+    "huggingface": ("huggingfaceserver", "kserve/huggingfaceserver"),
+    "sklearn": ("sklearnserver", "kserve/sklearnserver"),
+    "xgboost": ("xgbserver", "kserve/xgbserver"),
+    "lightgbm": ("lgbserver", "kserve/lgbserver"),
+    "pmml": ("pmmlserver", "kserve/pmmlserver"),
+    "paddle": ("paddleserver", "kserve/paddleserver"),
+}
+
+# Predictors requesting GPUs only land on GPU nodes, labelled by talos_config
+GPU_RESOURCE = "nvidia.com/gpu"
+GPU_NODE_SELECTOR = {"nvidia.com/gpu.present": "true"}
+
+_PULLED = re.compile(r'Successfully pulled image "([^"]+)" in ([0-9.hmsuµn]+)')
+_PRESENT = re.compile(r'Container image "([^"]+)" already present on machine')
+_DURATION_PART = re.compile(r"([0-9.]+)(h|ms|m|s|µs|us|ns)")
+_DURATION_SECONDS = {
+    "h": 3600,
+    "m": 60,
+    "s": 1,
+    "ms": 1e-3,
+    "µs": 1e-6,
+    "us": 1e-6,
+    "ns": 1e-9,
+}
+
+
+def resolve_image_prepull(prepull: dict) -> dict:
+    """
+    Validate the `image_prepull` config and return it with defaults
+    resolved, or None when pre-pulling is not configured.
+    """
+    if not prepull:
+        return None
+    manifest_dirs = prepull.get("manifest_dirs") or list(DEFAULT_MANIFEST_DIRS)
+    missing = [d for d in manifest_dirs if not (REPO_ROOT / d).is_dir()]
+    if missing:
+        raise ValueError(
+            f"image_prepull.manifest_dirs has missing directories {missing}"
+        )
+    return {
+        "manifest_dirs": list(manifest_dirs),
+        "namespace": prepull.get("namespace", "image-prepull"),
+        # Bump to re-pull mutable tags (e.g. latest-gpu) on every node
+        "refresh": str(prepull.get("refresh", "1")),
+        "pause_image": prepull.get("pause_image", "registry.k8s.io/pause:3.10"),
+        "busybox_image": prepull.get("busybox_image", "busybox:1.37"),
+        "timeout_seconds": int(prepull.get("timeout_seconds", 1800)),
+    }
+
+
+def _read_documents(manifest_dirs: list) -> list[dict]:
+    documents = []
+    for directory in manifest_dirs:
+        for path in sorted((REPO_ROOT / directory).rglob("*.yaml")):
+            with open(path, "r") as f:
+                documents.extend(doc for doc in yaml.safe_load_all(f) if doc)
+    return documents
+
+
+def _kserve_runtime_image(model_format: str) -> str:
+    if model_format not in KSERVE_RUNTIMES:
+        raise ValueError(
+            f"No runtime image known for model format '{model_format}', "
+            f"add it to KSERVE_RUNTIMES"
+        )
+    key, default_image = KSERVE_RUNTIMES[model_format]
+    with open(KSERVE_VALUES, "r") as f:
+        values = yaml.safe_load(f) or {}
+    runtime = values.get("kserve", {}).get("servingruntime", {}).get(key, {})
+    tag = runtime.get("tag") or read_argocd_chart_source(KSERVE_APP)["version"]
+    return f"{runtime.get('image', default_image)}:{tag}"
+
+
+def _requests_gpu(*containers) -> bool:
+    for container in containers:
+        resources = (container or {}).get("resources") or {}
+        for section in ("limits", "requests"):
+            if GPU_RESOURCE in (resources.get(section) or {}):
+                return True
+    return False
+
+
+def read_prepull_workloads(manifest_dirs: list) -> list[dict]:
+    """
+    Images and scheduling constraints of every InferenceService predictor in
+    the manifests. ClusterStorageContainer images are added to every
+    predictor: KServe picks one per storageUri, and a predictor whose URI
+    changes would otherwise pull it on its first cold start.
+    """
+    documents = _read_documents(manifest_dirs)
+    storage_images = [
+        doc["spec"]["container"]["image"]
+        for doc in documents
+        if doc.get("kind") == "ClusterStorageContainer"
+    ]
+
+    workloads = []
+    for doc in documents:
+        if doc.get("kind") != "InferenceService":
+            continue
+        predictor = doc["spec"]["predictor"]
+        model = predictor.get("model")
+        containers = predictor.get("containers") or []
+        images = [container["image"] for container in containers]
+        if model:
+            images.insert(0, _kserve_runtime_image(model["modelFormat"]["name"]))
+
+        node_selector = dict(predictor.get("nodeSelector") or {})
+        if _requests_gpu(model, *containers):
+            node_selector.update(GPU_NODE_SELECTOR)
+
+        workloads.append(
+            {
+                "name": doc["metadata"]["name"],
+                "images": list(dict.fromkeys(images + storage_images)),
+                "tolerations": predictor.get("tolerations") or [],
+                "node_selector": node_selector,
+            }
+        )
+    return workloads
+
+
+def is_mutable_tag(image: str) -> bool:
+    """Whether the image reference can point at different content over time."""
+    if "@sha256:" in image:
+        return False
+    name, _, tag = image.rpartition(":")
+    if not name or "/" in tag:  # no tag, or the colon was a registry port
+        return True
+    return tag.startswith("latest")
+
+
+def normalize_image(image: str) -> str:
+    """Fully qualified reference, as kubelet reports it in node.status.images."""
+    name, digest = image.split("@", 1) if "@" in image else (image, None)
+    first = name.split("/", 1)[0]
+    if "/" not in name:
+        name = f"docker.io/library/{name}"
+    elif "." not in first and ":" not in first and first != "localhost":
+        name = f"docker.io/{name}"
+    if digest:
+        return f"{name}@{digest}"
+    if ":" not in name.rsplit("/", 1)[-1]:
+        name = f"{name}:latest"
+    return name
+
+
+def parse_go_duration(duration: str) -> float:
+    """Seconds in a Go duration string such as `1m2.5s`."""
+    return sum(
+        float(value) * _DURATION_SECONDS[unit]
+        for value, unit in _DURATION_PART.findall(duration)
+    )
+
+
+def build_prepull_report(images: list, nodes_json: str, events_json: str) -> dict:
+    """
+    Per node, the size of each pre-pulled image from the node status and the
+    pull time from the kubelet's Pulled events (None when the image was
+    already present).
+    """
+    wanted = {normalize_image(image): image for image in images}
+    report = {}
+
+    for node in json.loads(nodes_json)["items"]:
+        node_name = node["metadata"]["name"]
+        for entry in node["status"].get("images") or []:
+            for name in entry.get("names") or []:
+                if name in wanted:
+                    report.setdefault(node_name, {})[wanted[name]] = {
+                        "size_bytes": entry.get("sizeBytes"),
+                        "pull_seconds": None,
+                    }
+
+    for event in json.loads(events_json)["items"]:
+        if event.get("reason") != "Pulled":
+            continue
+        node_name = (event.get("source") or {}).get("host") or event.get(
+            "reportingInstance"
+        )
+        message = event.get("message", "")
+        pulled = _PULLED.search(message)
+        image = pulled.group(1) if pulled else None
+        if image is None:
+            present = _PRESENT.search(message)
+            image = present.group(1) if present else None
+        if image not in images or not node_name:
+            continue
+        result = report.setdefault(node_name, {}).setdefault(
+            image, {"size_bytes": None, "pull_seconds": None}
+        )
+        if pulled:
+            result["pull_seconds"] = round(parse_go_duration(pulled.group(2)), 1)
+    return report
@@ -0,0 +1,26 @@
+import base64
+
+import pulumi
+
+
+def kubeconfig_environment(kubeconfig: pulumi.Input[str]) -> dict:
+    """Environment for kubectl_script commands, carrying the kubeconfig as a secret."""
+    return {
+        "KUBECONFIG_B64": pulumi.Output.secret(
+            pulumi.Output.from_input(kubeconfig).apply(
+                lambda cfg: base64.b64encode(cfg.encode("utf-8")).decode("utf-8")
+            )
+        )
+    }
+
+
+def kubectl_script(script: str) -> str:
+    """
+    Wrap a local shell script so its kubectl calls use the kubeconfig from
+    kubeconfig_environment, written to a temp file that is always removed.
+    """
+    return (
+        "set -euo pipefail; "
+        "export KUBECONFIG=$(mktemp); trap 'rm -f \"$KUBECONFIG\"' EXIT; "
+        'printf %s "$KUBECONFIG_B64" | base64 -d > "$KUBECONFIG"; ' + script
+    )
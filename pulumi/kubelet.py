@@ -0,0 +1,199 @@
+import copy
+import math
+
+# Built-in kubelet profiles, selected per node with `kubelet.profile` and
+# overridable key by key in the same block. "default" keeps stock settings.
+KUBELET_PROFILES = {
+    "default": {},
+    "general": {
+        "serialize_image_pulls": False,
+        "max_parallel_image_pulls": 3,
+        "image_gc_high_threshold_percent": 80,
+        "image_gc_low_threshold_percent": 70,
+        "eviction_hard": {
+            "memory.available": "200Mi",
+            "nodefs.available": "10%",
+            "imagefs.available": "15%",
+        },
+        "max_pods": 110,
+        "system_reserved": {"cpu": "100m", "memory": "256Mi"},
+        "kube_reserved": {"cpu": "100m", "memory": "256Mi"},
+    },
+    # GPU inference nodes: few large images, so GC starts earlier and leaves
+    # room for a full vLLM pull; static CPU manager pins Guaranteed pods.
+    # The static policy keeps ceil(reserved) cores out of the pinnable pool,
+    # so a fractional reservation still leaves small nodes a core to pin
+    "inference": {
+        "serialize_image_pulls": False,
+        "max_parallel_image_pulls": 2,
+        "image_gc_high_threshold_percent": 70,
+        "image_gc_low_threshold_percent": 50,
+        "eviction_hard": {
+            "memory.available": "500Mi",
+            "nodefs.available": "10%",
+            "imagefs.available": "20%",
+        },
+        "max_pods": 64,
+        "cpu_manager_policy": "static",
+        "topology_manager_policy": "best-effort",
+        "system_reserved": {"cpu": "250m", "memory": "512Mi"},
+        "kube_reserved": {"cpu": "250m", "memory": "512Mi"},
+    },
+}
+
+# Node config keys -> KubeletConfiguration fields
+KUBELET_CONFIG_FIELDS = {
+    "serialize_image_pulls": "serializeImagePulls",
+    "max_parallel_image_pulls": "maxParallelImagePulls",
+    "image_gc_high_threshold_percent": "imageGCHighThresholdPercent",
+    "image_gc_low_threshold_percent": "imageGCLowThresholdPercent",
+    "eviction_hard": "evictionHard",
+    "eviction_soft": "evictionSoft",
+    "eviction_soft_grace_period": "evictionSoftGracePeriod",
+    "max_pods": "maxPods",
+    "cpu_manager_policy": "cpuManagerPolicy",
+    "topology_manager_policy": "topologyManagerPolicy",
+    "system_reserved": "systemReserved",
+    "kube_reserved": "kubeReserved",
+}
+
+CPU_MANAGER_POLICIES = ("none", "static")
+TOPOLOGY_MANAGER_POLICIES = ("none", "best-effort", "restricted", "single-numa-node")
+
+
+def parse_cpu(quantity) -> float:
+    """Parse a CPU quantity ("500m", "1", 2) into cores."""
+    quantity = str(quantity)
+    if quantity.endswith("m"):
+        return int(quantity[:-1]) / 1000
+    return float(quantity)
+
+
+def parse_memory_mib(quantity) -> float:
+    """Parse a memory quantity ("512Mi", "1Gi", "128M") into MiB."""
+    quantity = str(quantity)
+    for suffix, factor in (("Ki", 1 / 1024), ("Mi", 1), ("Gi", 1024), ("Ti", 1024**2)):
+        if quantity.endswith(suffix):
+            return float(quantity[: -len(suffix)]) * factor
+    # Decimal suffixes, as some charts use them
+    for suffix, power in (("k", 1), ("M", 2), ("G", 3), ("T", 4)):
+        if quantity.endswith(suffix):
+            return float(quantity[: -len(suffix)]) * 1000**power / 1024**2
+    # Plain bytes
+    return float(quantity) / 1024**2
+
+
+def reserved_resources(settings: dict, memory: int = None) -> tuple[float, float]:
+    """
+    Cores and MiB a node holds back from pods: system_reserved plus
+    kube_reserved, and for memory the hard eviction threshold. A percentage
+    threshold only counts when the node's memory (MiB) is known.
+    """
+    reserved = [settings.get("system_reserved", {}), settings.get("kube_reserved", {})]
+    reserved_cpu = sum(parse_cpu(r["cpu"]) for r in reserved if "cpu" in r)
+    reserved_memory = sum(
+        parse_memory_mib(r["memory"]) for r in reserved if "memory" in r
+    )
+    eviction_memory = settings.get("eviction_hard", {}).get("memory.available", "100Mi")
+    if not eviction_memory.endswith("%"):
+        reserved_memory += parse_memory_mib(eviction_memory)
+    elif memory is not None:
+        reserved_memory += memory * float(eviction_memory[:-1]) / 100
+    return reserved_cpu, reserved_memory
+
+
+def resolve_kubelet_config(
+    node_name: str, kubelet: dict, cpu: int = None, memory: int = None
+) -> dict:
+    """
+    Merge a node's `kubelet` block over its profile and validate it against
+    the node's cpu (cores) and memory (MiB) when they are known.
+    """
+    kubelet = dict(kubelet or {})
+    profile = kubelet.pop("profile", "default")
+    if profile not in KUBELET_PROFILES:
+        raise ValueError(
+            f"Node '{node_name}': kubelet.profile must be one of {list(KUBELET_PROFILES)}, got '{profile}'"
+        )
+
+    unknown = set(kubelet) - set(KUBELET_CONFIG_FIELDS)
+    if unknown:
+        raise ValueError(
+            f"Node '{node_name}': unknown kubelet settings {sorted(unknown)}"
+        )
+
+    settings = copy.deepcopy(KUBELET_PROFILES[profile])
+    settings.update(kubelet)
+
+    def fail(message: str):
+        raise ValueError(f"Node '{node_name}' kubelet ({profile}): {message}")
+
+    if settings.get("max_parallel_image_pulls") and settings.get(
+        "serialize_image_pulls", True
+    ):
+        fail("max_parallel_image_pulls needs serialize_image_pulls: false")
+
+    high = settings.get("image_gc_high_threshold_percent")
+    low = settings.get("image_gc_low_threshold_percent")
+    if high is not None and low is not None and not 0 <= low < high <= 100:
+        fail(f"image GC thresholds need 0 <= low ({low}) < high ({high}) <= 100")
+
+    if settings.get("max_pods") is not None and int(settings["max_pods"]) < 1:
+        fail("max_pods must be positive")
+
+    # The kubelet rejects soft eviction signals without a grace period
+    soft = set(settings.get("eviction_soft") or {})
+    grace = set(settings.get("eviction_soft_grace_period") or {})
+    if soft != grace:
+        fail(
+            f"eviction_soft and eviction_soft_grace_period need the same signals, got {sorted(soft)} and {sorted(grace)}"
+        )
+
+    cpu_manager_policy = settings.get("cpu_manager_policy", "none")
+    if cpu_manager_policy not in CPU_MANAGER_POLICIES:
+        fail(f"cpu_manager_policy must be one of {CPU_MANAGER_POLICIES}")
+    if settings.get("topology_manager_policy", "none") not in TOPOLOGY_MANAGER_POLICIES:
+        fail(f"topology_manager_policy must be one of {TOPOLOGY_MANAGER_POLICIES}")
+
+    reserved_cpu, held_back = reserved_resources(settings, memory)
+
+    if cpu_manager_policy == "static":
+        # The static policy refuses to start without reserved CPU, and rounds
+        # the reservation up to whole cores before pinning anything
+        if reserved_cpu <= 0:
+            fail("the static CPU manager needs system_reserved/kube_reserved cpu")
+        if cpu is not None and cpu - math.ceil(reserved_cpu) < 1:
+            fail(
+                f"static CPU manager reserves {math.ceil(reserved_cpu)} of {cpu} cores, leaving none to pin"
+            )
+
+    if cpu is not None and reserved_cpu >= cpu:
+        fail(f"reserved cpu ({reserved_cpu}) must be below the node's {cpu} cores")
+
+    if memory is not None and held_back >= memory:
+        fail(
+            f"reserved memory plus eviction threshold ({held_back:.0f}Mi) must be below the node's {memory}Mi"
+        )
+
+    return settings
+
+
+def render_kubelet_extra_config(settings: dict) -> dict:
+    """Render resolved kubelet settings as `machine.kubelet.extraConfig`."""
+    extra_config = {
+        KUBELET_CONFIG_FIELDS[key]: copy.deepcopy(value)
+        for key, value in settings.items()
+    }
+    if extra_config.get("cpuManagerPolicy") == "static":
+        # Re-check pinned CPU assignments regularly after pod churn
+        extra_config.setdefault("cpuManagerReconcilePeriod", "10s")
+    return extra_config
+
+
+def node_allocatable(settings: dict, cpu: int, memory: int) -> tuple[float, float]:
+    """
+    Approximate allocatable (cores, MiB) of a node: capacity minus the
+    reserved resources and the hard memory eviction threshold.
+    """
+    reserved_cpu, reserved_memory = reserved_resources(settings, memory)
+    return cpu - reserved_cpu, memory - reserved_memory
@@ -0,0 +1,41 @@
+"""
+Deployable layers of the lab, composable in one stack or split across stacks
+
+Layer modules are imported on first access, so e.g. an upgrade-only stack
+never loads the Kubernetes or Proxmox SDKs.
+"""
+
+import importlib
+
+from .settings import LabSettings, LAYERS
+
+# Public name -> layer module defining it
+_EXPORTS = {
+    "deploy_images": "images",
+    "image_factories_from_stack": "images",
+    "deploy_prepared_images": "images",
+    "prepared_image_factories_from_stack": "images",
+    "deploy_cluster": "cluster",
+    "kubeconfig_from_stack": "cluster",
+    "talosconfig_from_stack": "cluster",
+    "k8s_provider_from_stack": "cluster",
+    "deploy_platform": "platform",
+    "deploy_upgrade": "upgrade",
+    "deploy_prepare": "upgrade",
+    "write_talosconfig": "upgrade",
+}
+
+__all__ = ["LabSettings", "LAYERS", *_EXPORTS]
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    # Cache on the package so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *_EXPORTS])
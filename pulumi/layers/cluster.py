@@ -0,0 +1,59 @@
+from typing import TYPE_CHECKING
+
+import pulumi
+from cluster_spec import spec_hashes
+from .settings import LabSettings
+
+if TYPE_CHECKING:
+    import pulumi_kubernetes as kubernetes
+    import pulumi_proxmoxve as proxmoxve
+    from components import TalosCluster
+
+
+def deploy_cluster(
+    settings: LabSettings,
+    image_factories: dict,
+    proxmox_provider: "proxmoxve.Provider",
+) -> "TalosCluster":
+    """Create the Talos cluster (VMs, machine config, bootstrap, health)"""
+    # Loads the Talos and Proxmox SDKs, which stacks reading the kubeconfig don't need
+    from components import TalosCluster, TalosClusterArgs
+
+    cluster = TalosCluster(
+        settings.cluster_name,
+        TalosClusterArgs(
+            spec=settings.spec,
+            image_factories=image_factories,
+            proxmox_provider=proxmox_provider,
+            proxmox_scheduler=settings.proxmox_scheduler,
+            bootstrap_from_snapshot=settings.bootstrap_from_snapshot,
+            recover_skip_hash_check=settings.recover_skip_hash_check,
+        ),
+    )
+
+    pulumi.export("kubeconfig", pulumi.Output.secret(cluster.kubeconfig_raw))
+    pulumi.export("talosconfig", pulumi.Output.secret(cluster.talosconfig_yaml))
+    pulumi.export("spec_hashes", spec_hashes(settings.spec))
+
+    return cluster
+
+
+def kubeconfig_from_stack(settings: LabSettings) -> pulumi.Output:
+    """Kubeconfig exported by the cluster stack"""
+    return settings.stack_reference("cluster").require_output("kubeconfig")
+
+
+def talosconfig_from_stack(settings: LabSettings) -> pulumi.Output:
+    """Talosconfig exported by the cluster stack"""
+    return settings.stack_reference("cluster").require_output("talosconfig")
+
+
+def k8s_provider_from_stack(settings: LabSettings) -> "kubernetes.Provider":
+    """Kubernetes provider using the kubeconfig exported by the cluster stack"""
+    import pulumi_kubernetes as kubernetes
+
+    return kubernetes.Provider(
+        f"{settings.cluster_name}-k8s-provider",
+        kubeconfig=kubeconfig_from_stack(settings),
+        enable_server_side_apply=True,
+    )
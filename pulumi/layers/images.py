@@ -0,0 +1,152 @@
+from typing import TYPE_CHECKING
+
+import pulumi
+from .settings import LabSettings
+
+if TYPE_CHECKING:
+    import pulumi_proxmoxve as proxmoxve
+    from proxmox_scheduler import DatastoreScheduler
+
+
+class ImageFactoryRef:
+    """Image factory outputs read back from the images stack"""
+
+    def __init__(self, talos_images: pulumi.Output, profile: str):
+        self.iso_url = talos_images.apply(lambda images: images[profile]["iso_url"])
+        self.installer_image = talos_images.apply(
+            lambda images: images[profile]["installer_image"]
+        )
+        self.iso_file_id = talos_images.apply(
+            lambda images: images[profile].get("iso_file_id")
+        )
+
+
+def _create_image_factories(
+    profiles: dict,
+    proxmox_provider: "proxmoxve.Provider",
+    scheduler: "DatastoreScheduler",
+    current: bool = True,
+) -> dict:
+    """
+    One image factory per profile. Factories are named by Talos version, so
+    the ones built by a prepare run are the ones the upgrade run finds.
+    """
+    # Loads the Talos and Proxmox SDKs, which stacks reading images don't need
+    from components import TalosImageFactory, TalosImageFactoryArgs
+
+    return {
+        name: TalosImageFactory(
+            f"talos-image-{name}-{profile.talos_version}",
+            TalosImageFactoryArgs(
+                talos_version=profile.talos_version,
+                platform=profile.platform,
+                arch=profile.arch,
+                extensions=list(profile.extensions),
+                node_name="pve01",
+                datastore_id="local",
+                proxmox_provider=proxmox_provider,
+                upload_to_proxmox=profile.upload_to_proxmox,
+                proxmox_scheduler=scheduler,
+            ),
+            # Factories were named by profile only before prepare runs existed
+            opts=pulumi.ResourceOptions(
+                aliases=[pulumi.Alias(name=f"talos-image-{name}")] if current else None
+            ),
+        )
+        for name, profile in profiles.items()
+    }
+
+
+def _export_images(image_factories: dict, profiles: dict) -> dict:
+    return {
+        name: {
+            "iso_url": factory.iso_url,
+            "installer_image": factory.installer_image,
+            "iso_file_id": factory.iso_file_id,
+            # Lets downstream stacks detect images built from another spec
+            "spec_hash": profiles[name].content_hash,
+        }
+        for name, factory in image_factories.items()
+    }
+
+
+def deploy_images(
+    settings: LabSettings, proxmox_provider: "proxmoxve.Provider"
+) -> dict:
+    """Create the Talos image factories and export their images"""
+    profiles = settings.spec.image_profiles
+    image_factories = _create_image_factories(
+        profiles, proxmox_provider, settings.proxmox_scheduler
+    )
+
+    pulumi.export("talos_images", _export_images(image_factories, profiles))
+    pulumi.export("talos_version", settings.talos_version)
+
+    return image_factories
+
+
+def deploy_prepared_images(
+    settings: LabSettings, proxmox_provider: "proxmoxve.Provider"
+) -> dict:
+    """
+    Create the image factories of `prepare_talos_version`: schematics and
+    Proxmox ISOs for the candidate release, used by no node yet.
+    """
+    profiles = settings.prepare_image_profiles
+    image_factories = _create_image_factories(
+        profiles, proxmox_provider, settings.proxmox_scheduler, current=False
+    )
+
+    pulumi.export(
+        "talos_images_prepared",
+        {
+            "talos_version": settings.prepare_talos_version,
+            "images": _export_images(image_factories, profiles),
+        },
+    )
+
+    return image_factories
+
+
+def image_factories_from_stack(settings: LabSettings) -> dict:
+    """Image factory stand-ins backed by the images stack outputs"""
+    profiles = settings.spec.image_profiles
+
+    def check_spec_hashes(images: dict) -> dict:
+        for name, profile in profiles.items():
+            exported = images.get(name, {}).get("spec_hash")
+            # Stacks exported before spec hashes existed carry none
+            if exported and exported != profile.content_hash:
+                raise ValueError(
+                    f"Image profile '{name}' in the images stack was built from a different "
+                    f"spec ({exported}, expected {profile.content_hash}); deploy the images layer first"
+                )
+        return images
+
+    talos_images = (
+        settings.stack_reference("images")
+        .require_output("talos_images")
+        .apply(check_spec_hashes)
+    )
+    return {profile: ImageFactoryRef(talos_images, profile) for profile in profiles}
+
+
+def prepared_image_factories_from_stack(settings: LabSettings) -> dict:
+    """Image factory stand-ins for the prepared version, from the images stack"""
+    prepared = settings.stack_reference("images").require_output(
+        "talos_images_prepared"
+    )
+
+    def check_version(prepared: dict) -> dict:
+        if prepared["talos_version"] != settings.prepare_talos_version:
+            raise ValueError(
+                f"The images stack prepared Talos {prepared['talos_version']}, "
+                f"expected {settings.prepare_talos_version}; deploy the images layer first"
+            )
+        return prepared["images"]
+
+    talos_images = prepared.apply(check_version)
+    return {
+        profile: ImageFactoryRef(talos_images, profile)
+        for profile in settings.prepare_image_profiles
+    }
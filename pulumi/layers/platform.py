@@ -0,0 +1,228 @@
+import json
+import pulumi
+import pulumi_kubernetes as kubernetes
+from pulumi_kubernetes.helm.v3 import Release, ReleaseArgs
+from gpu_sharing import create_device_plugin_configmap
+from volumes import create_local_persistent_volumes
+from storage import create_nfs_storage_classes, resolve_storage_benchmark
+from network_bench import resolve_network_benchmark
+from image_prepull import read_prepull_workloads, resolve_image_prepull
+from etcd import resolve_etcd_snapshot
+from vclusters import resolve_vcluster_fleet, vcluster_fleet_report
+from chart_cache import resolve_pinned_chart
+from argocd_values import (
+    PERFORMANCE_VALUES,
+    read_applications,
+    render_argocd_performance_file,
+)
+from components import (
+    EtcdMaintenance,
+    EtcdMaintenanceArgs,
+    EtcdSnapshot,
+    EtcdSnapshotArgs,
+    VClusterFleet,
+    VClusterFleetArgs,
+    StorageBenchmark,
+    StorageBenchmarkArgs,
+    NetworkBenchmark,
+    NetworkBenchmarkArgs,
+    ImagePrepull,
+    ImagePrepullArgs,
+)
+from .settings import LabSettings
+
+
+def deploy_platform(
+    settings: LabSettings,
+    k8s_provider: kubernetes.Provider,
+    kubeconfig: pulumi.Input[str],
+    nodes_ready: list = None,
+) -> dict:
+    """
+    Install ArgoCD and the cluster-level resources generated from config.
+    `k8s_provider` only has to reach a ready API server; resources that run
+    on every node (benchmarks, vclusters) also wait for `nodes_ready`.
+    """
+    resources = {}
+    nodes_ready = nodes_ready or []
+
+    # Resolve the ArgoCD chart (version pinned by the ArgoCD application manifest)
+    # from the local chart cache, so previews don't hit the Helm repository
+    argocd_chart = resolve_pinned_chart("argocd")
+
+    # Performance values are committed so the self-managed ArgoCD Application
+    # reads the same file; warn when the cluster spec has outgrown them
+    if PERFORMANCE_VALUES.read_text() != render_argocd_performance_file(
+        settings.spec, read_applications()
+    ):
+        pulumi.log.warn(
+            f"{PERFORMANCE_VALUES.name} is stale for this cluster spec; "
+            f"run `python argocd_values.py --stack {pulumi.get_stack()}` and commit it"
+        )
+
+    # Install ArgoCD
+    argocd_namespace = kubernetes.core.v1.Namespace(
+        "argocd-namespace",
+        metadata={"name": "argocd"},
+        opts=pulumi.ResourceOptions(provider=k8s_provider),
+    )
+
+    resources["argocd"] = Release(
+        "argocd",
+        ReleaseArgs(
+            name="argocd",
+            chart=argocd_chart["path"],
+            value_yaml_files=[
+                pulumi.FileAsset("../argocd/applications/values/argocd.yaml"),
+                pulumi.FileAsset(
+                    "../argocd/applications/values/argocd-performance.yaml"
+                ),
+            ],
+            namespace="argocd",
+            # Installed while workers join, so allow for pods pending until one is Ready
+            timeout=900,
+        ),
+        opts=pulumi.ResourceOptions(
+            provider=k8s_provider,
+            depends_on=[argocd_namespace],
+        ),
+    )
+
+    resources["argocd_applications"] = kubernetes.yaml.ConfigFile(
+        "argocd-applications",
+        file="../argocd/all-the-apps.yaml",
+        opts=pulumi.ResourceOptions(
+            provider=k8s_provider,
+            depends_on=[resources["argocd"]],
+        ),
+    )
+
+    # Device plugin sharing configs (MPS / time-slicing) selected per node by label
+    resources["device_plugin_config"] = create_device_plugin_configmap(
+        settings.nodes,
+        k8s_provider=k8s_provider,
+    )
+
+    # Local PersistentVolumes backed by the per-node user volumes
+    resources["local_persistent_volumes"] = create_local_persistent_volumes(
+        settings.nodes,
+        k8s_provider=k8s_provider,
+    )
+
+    # NFS StorageClasses per performance profile
+    resources["nfs_storage_classes"] = create_nfs_storage_classes(
+        settings.nfs,
+        k8s_provider=k8s_provider,
+    )
+
+    # fio runs against every NFS StorageClass and the selected local volumes
+    benchmark = resolve_storage_benchmark(
+        settings.storage_benchmark, settings.nfs, settings.nodes
+    )
+    if benchmark:
+        resources["storage_benchmark"] = StorageBenchmark(
+            "storage-benchmark",
+            StorageBenchmarkArgs(
+                benchmark=benchmark,
+                k8s_provider=k8s_provider,
+                kubeconfig=kubeconfig,
+                depends_on=resources["nfs_storage_classes"]
+                + resources["local_persistent_volumes"]
+                + nodes_ready,
+            ),
+        )
+        pulumi.export("storage_benchmark", resources["storage_benchmark"].results)
+
+    # iperf3/netperf matrix across all node pairs, Services and the LB path
+    network_benchmark = resolve_network_benchmark(
+        settings.network_benchmark, settings.nodes
+    )
+    if network_benchmark:
+        baseline = None
+        if network_benchmark["baseline"]:
+            with open(network_benchmark["baseline"], "r") as f:
+                baseline = json.load(f)
+        resources["network_benchmark"] = NetworkBenchmark(
+            "network-benchmark",
+            NetworkBenchmarkArgs(
+                benchmark=network_benchmark,
+                k8s_provider=k8s_provider,
+                kubeconfig=kubeconfig,
+                baseline=baseline,
+                depends_on=nodes_ready,
+            ),
+        )
+        pulumi.export("network_benchmark", resources["network_benchmark"].report)
+        if baseline:
+            pulumi.export(
+                "network_benchmark_comparison",
+                resources["network_benchmark"].comparison,
+            )
+
+    # InferenceService runtime and storage-initializer images kept on their nodes
+    image_prepull = resolve_image_prepull(settings.image_prepull)
+    if image_prepull:
+        resources["image_prepull"] = ImagePrepull(
+            "image-prepull",
+            ImagePrepullArgs(
+                prepull=image_prepull,
+                workloads=read_prepull_workloads(image_prepull["manifest_dirs"]),
+                k8s_provider=k8s_provider,
+                kubeconfig=kubeconfig,
+                depends_on=nodes_ready,
+            ),
+        )
+        pulumi.export("image_prepull", resources["image_prepull"].reports)
+
+    # Staggered etcd defrag across control-plane members
+    etcd_settings = settings.spec.etcd
+    if etcd_settings:
+        resources["etcd_maintenance"] = EtcdMaintenance(
+            "etcd-maintenance",
+            EtcdMaintenanceArgs(
+                controlplane_nodes=settings.spec.controlplanes,
+                talos_version=settings.talos_version,
+                k8s_provider=k8s_provider,
+                schedule=etcd_settings["defrag_schedule"],
+                stagger_minutes=etcd_settings["defrag_stagger_minutes"],
+            ),
+        )
+
+    # Scheduled etcd snapshots to NFS, the source for bootstrap_from_snapshot
+    etcd_snapshot = resolve_etcd_snapshot(settings.etcd, settings.nfs)
+    if etcd_snapshot:
+        resources["etcd_snapshot"] = EtcdSnapshot(
+            "etcd-snapshot",
+            EtcdSnapshotArgs(
+                snapshot=etcd_snapshot,
+                talos_version=settings.talos_version,
+                k8s_provider=k8s_provider,
+            ),
+        )
+        pulumi.export("etcd_snapshot_location", resources["etcd_snapshot"].location)
+
+    # Tenant vclusters stamped from the `vclusters` template
+    fleet = resolve_vcluster_fleet(settings.vclusters)
+    if fleet:
+        report = vcluster_fleet_report(fleet, settings.nodes)
+        if fleet["count"] > report["fit_control_planes"]:
+            pulumi.log.warn(
+                f"{fleet['count']} vclusters requested but only {report['fit_control_planes']} "
+                f"control planes fit on workers {report['worker_capacity']['nodes']}"
+            )
+        resources["vcluster_fleet"] = VClusterFleet(
+            "vcluster-fleet",
+            VClusterFleetArgs(
+                fleet=fleet,
+                k8s_provider=k8s_provider,
+                kubeconfig=kubeconfig,
+                data_source=settings.config.get_secret("vcluster_data_source"),
+                depends_on=nodes_ready,
+            ),
+        )
+        pulumi.export(
+            "vcluster_fleet",
+            {**report, "ready_seconds": resources["vcluster_fleet"].ready_seconds},
+        )
+
+    return resources
@@ -0,0 +1,128 @@
+import ipaddress
+from typing import TYPE_CHECKING
+
+import pulumi
+from cluster_spec import compile_cluster_spec, compile_image_profiles
+from node_pools import expand_node_pools
+from proxmox_scheduler import DatastoreScheduler
+
+if TYPE_CHECKING:
+    import pulumi_proxmoxve as proxmoxve
+
+# Layers in dependency order. "all" deploys every layer in a single stack.
+LAYERS = ("images", "cluster", "platform", "upgrade")
+
+
+class LabSettings:
+    """Stack configuration shared by all layers"""
+
+    def __init__(self, config: pulumi.Config = None):
+        config = config or pulumi.Config()
+        self.config = config
+
+        self.layer = config.get("layer") or "all"
+        if self.layer != "all" and self.layer not in LAYERS:
+            raise ValueError(
+                f"layer must be 'all' or one of {LAYERS}, got '{self.layer}'"
+            )
+        # Stack names of the upstream layers, e.g. {"images": "org/kubernets-lab/dev-images"}
+        self.stack_references = config.get_object("stack_references") or {}
+        self._stack_reference_cache = {}
+
+        self.talos_version = config.get("talos_version") or "v1.11.5"
+        # Candidate release to build and stage ahead of the upgrade window
+        self.prepare_talos_version = config.get("prepare_talos_version")
+        if self.prepare_talos_version == self.talos_version:
+            self.prepare_talos_version = None
+        self.kubernetes_version = config.get("kubernetes_version")
+        self.cluster_name = config.get("cluster_name") or "talos-cluster"
+        self.gateway = config.get("gateway") or "192.168.1.1"
+        # Node network; defaults to the gateway's /24
+        self.network = config.get_object("network") or {}
+        self.network.setdefault(
+            "cidr", str(ipaddress.ip_network(f"{self.gateway}/24", strict=False))
+        )
+        self.network_prefix = ipaddress.ip_network(
+            self.network["cidr"], strict=False
+        ).prefixlen
+        self.use_cilium = config.get_bool("use_cilium") or False
+        # Pinned by argocd/applications/cilium.yaml; set only to assert it
+        self.cilium_version = config.get("cilium_version")
+        self.force_upgrade = config.get_bool("force_upgrade") or False
+        self.etcd = config.get_object("etcd")
+        # Disaster recovery: restore etcd from this local snapshot on bootstrap
+        self.bootstrap_from_snapshot = config.get("bootstrap_from_snapshot")
+        self.recover_skip_hash_check = (
+            config.get_bool("recover_skip_hash_check") or False
+        )
+        self.control_plane_profile = config.get("control_plane_profile") or "default"
+        self.control_plane_vip = config.get("control_plane_vip")
+        self.vclusters = config.get_object("vclusters")
+        self.nfs = config.get_object("nfs")
+        self.storage_benchmark = config.get_object("storage_benchmark")
+        self.network_benchmark = config.get_object("network_benchmark")
+        self.image_prepull = config.get_object("image_prepull")
+        # One scheduler for every layer, so ISO downloads and VM disks share lanes
+        self.proxmox_scheduler = DatastoreScheduler(
+            config.get_object("proxmox_concurrency")
+        )
+
+        # Explicit nodes plus nodes expanded from count-based pools, compiled
+        # once so config errors fail here rather than inside a provider call
+        self.spec = compile_cluster_spec(
+            expand_node_pools(
+                config.get_object("nodes") or [],
+                config.get_object("node_pools") or [],
+                network=self.network,
+                gateway=self.gateway,
+                # Keep pool members off the shared control-plane address
+                extra_reserved=(
+                    [self.control_plane_vip] if self.control_plane_vip else None
+                ),
+            ),
+            cluster_name=self.cluster_name,
+            talos_version=self.talos_version,
+            kubernetes_version=self.kubernetes_version,
+            cluster_endpoint_ip=config.get("cluster_endpoint_ip"),
+            control_plane_vip=self.control_plane_vip,
+            gateway=self.gateway,
+            network_prefix=self.network_prefix,
+            use_cilium=self.use_cilium,
+            cilium_version=self.cilium_version,
+            etcd=self.etcd,
+            control_plane_profile=self.control_plane_profile,
+        )
+        self.nodes = self.spec.nodes
+        self.prepare_image_profiles = (
+            compile_image_profiles(self.prepare_talos_version)
+            if self.prepare_talos_version
+            else {}
+        )
+
+    def deploys(self, layer: str) -> bool:
+        """Whether this stack deploys the given layer"""
+        return self.layer in ("all", layer)
+
+    def stack_reference(self, layer: str) -> pulumi.StackReference:
+        """StackReference to the stack that deploys an upstream layer"""
+        if layer not in self.stack_references:
+            raise ValueError(
+                f"Layer '{self.layer}' needs stack_references.{layer} to read its inputs"
+            )
+        # One StackReference per upstream stack, however many outputs are read
+        if layer not in self._stack_reference_cache:
+            self._stack_reference_cache[layer] = pulumi.StackReference(
+                f"{layer}-stack", stack_name=self.stack_references[layer]
+            )
+        return self._stack_reference_cache[layer]
+
+    def create_proxmox_provider(self) -> "proxmoxve.Provider":
+        import pulumi_proxmoxve as proxmoxve
+
+        return proxmoxve.Provider(
+            "proxmoxve",
+            endpoint=self.config.require("proxmox_endpoint"),
+            username=self.config.require("proxmox_username"),
+            password=self.config.require_secret("proxmox_password"),
+            insecure=True,
+        )
@@ -0,0 +1,65 @@
+import atexit
+import os
+import tempfile
+from pathlib import Path
+
+import pulumi
+from components import TalosPrepare, TalosPrepareArgs, TalosUpgrade, TalosUpgradeArgs
+from .settings import LabSettings
+
+
+def write_talosconfig(talosconfig: pulumi.Input[str]) -> pulumi.Output[str]:
+    """
+    Write the talosconfig to a private file for this run's talosctl commands
+    and return its path. The path is the same on every run, so it never
+    changes the commands themselves; the file is removed when the run ends.
+    """
+    path = Path(tempfile.gettempdir()) / f"talosconfig-{pulumi.get_stack()}.yaml"
+
+    def write(content: str) -> str:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        atexit.register(path.unlink, missing_ok=True)
+        return str(path)
+
+    return pulumi.Output.from_input(talosconfig).apply(write)
+
+
+def deploy_upgrade(
+    settings: LabSettings, image_factories: dict, talosconfig_path: pulumi.Output
+) -> TalosUpgrade:
+    """
+    Upgrade Talos nodes when version changes (masters first, then workers).
+    This runs talosctl upgrade commands directly, no ConfigurationApply needed.
+    """
+    return TalosUpgrade(
+        "talos-upgrade",
+        TalosUpgradeArgs(
+            spec=settings.spec,
+            image_factories=image_factories,
+            talosconfig_path=talosconfig_path,
+            force=settings.force_upgrade,
+        ),
+    )
+
+
+def deploy_prepare(
+    settings: LabSettings, prepared_factories: dict, talosconfig_path: pulumi.Output
+) -> TalosPrepare:
+    """
+    Stage `prepare_talos_version` on every node ahead of the upgrade window.
+    Only pulls installer images; no node is upgraded or reconfigured.
+    """
+    prepare = TalosPrepare(
+        f"talos-prepare-{settings.prepare_talos_version}",
+        TalosPrepareArgs(
+            spec=settings.spec,
+            talos_version=settings.prepare_talos_version,
+            image_profiles=settings.prepare_image_profiles,
+            image_factories=prepared_factories,
+            talosconfig_path=talosconfig_path,
+        ),
+    )
+    pulumi.export("talos_prepare", prepare.report)
+    return prepare
@@ -0,0 +1,286 @@
+"""
+Network benchmark matrix helpers, and a CLI comparing two exported runs:
+
+    pulumi stack output network_benchmark --json > benchmarks/network-2.json
+    python network_bench.py compare benchmarks/network-1.json benchmarks/network-2.json
+"""
+
+import json
+import statistics
+import sys
+
+# Paths measured from every client node. "host" runs a host-network client
+# against every node's host-network server, the baseline without the CNI;
+# "pod" and "service" go to every server node; "loadbalancer" goes through
+# the L2-announced LB IP.
+NETWORK_PATHS = ("host", "pod", "service", "loadbalancer")
+
+IPERF3_PORT = 5201
+NETPERF_CONTROL_PORT = 12865
+# Fixed data port so request/response tests also work through Services
+NETPERF_DATA_PORT = 12866
+NETPERF_KEYS = ("THROUGHPUT", "P50_LATENCY", "P99_LATENCY", "MEAN_LATENCY")
+
+
+def resolve_network_benchmark(benchmark: dict, nodes: tuple) -> dict:
+    """
+    Validate the `network_benchmark` config and return it with defaults
+    resolved, or None when no benchmark is configured.
+    """
+    if not benchmark:
+        return None
+
+    # A moving tag would make runs incomparable with their baseline
+    image = benchmark.get("image")
+    if not image or not is_pinned_image(image):
+        raise ValueError(
+            f"network_benchmark.image must be pinned to a tag other than latest or a digest, got {image!r}"
+        )
+
+    names = [n.name for n in nodes]
+    bench_nodes = benchmark.get("nodes") or names
+    unknown = set(bench_nodes) - set(names)
+    if unknown:
+        raise ValueError(f"network_benchmark.nodes has unknown nodes {sorted(unknown)}")
+
+    workers = [n.name for n in nodes if not n.is_controlplane and n.name in bench_nodes]
+    lb_node = benchmark.get("lb_node") or (workers or bench_nodes)[0]
+    if lb_node not in bench_nodes:
+        raise ValueError(f"network_benchmark.lb_node '{lb_node}' is not benchmarked")
+
+    return {
+        # Bump to run the benchmark again
+        "run_id": str(benchmark.get("run_id", "1")),
+        "nodes": list(bench_nodes),
+        "node_ips": {n.name: n.ip for n in nodes if n.name in bench_nodes},
+        "lb_node": lb_node,
+        "duration": int(benchmark.get("duration", 10)),
+        "streams": int(benchmark.get("streams", 4)),
+        "image": image,
+        "timeout_seconds": int(benchmark.get("timeout_seconds", 1800)),
+        "baseline": benchmark.get("baseline"),
+    }
+
+
+def is_pinned_image(image: str) -> bool:
+    """Whether an image reference has a digest or a tag other than latest."""
+    if "@" in image:
+        return True
+    name = image.rsplit("/", 1)[-1]
+    return ":" in name and name.rsplit(":", 1)[1] != "latest"
+
+
+def server_name(node_name: str, host_network: bool = False) -> str:
+    return f"netbench-{'host-' if host_network else ''}{node_name}"
+
+
+def render_client_script(
+    benchmark: dict, namespace: str, lb_ip: str = None, host_network: bool = False
+) -> str:
+    """
+    Shell script run by each client pod: iperf3 throughput and netperf TCP_RR
+    latency against every target, one at a time. Each result is preceded by
+    an `@@ <path> <server node> <tool>` marker line. The host-network client
+    only measures the "host" path, against the nodes' IPs.
+    """
+    targets = []
+    for node_name in benchmark["nodes"]:
+        if host_network:
+            targets.append(("host", node_name, benchmark["node_ips"][node_name]))
+            continue
+        service = f"{server_name(node_name)}.{namespace}.svc.cluster.local"
+        # The headless Service resolves straight to the server pod IP
+        targets.append(
+            (
+                "pod",
+                node_name,
+                f"{server_name(node_name)}-pod.{namespace}.svc.cluster.local",
+            )
+        )
+        targets.append(("service", node_name, service))
+    if not host_network:
+        targets.append(("loadbalancer", benchmark["lb_node"], lb_ip))
+
+    duration = benchmark["duration"]
+    lines = ["set -u"]
+    for path, node_name, host in targets:
+        lines.extend(
+            [
+                f"echo '@@ {path} {node_name} iperf3'",
+                f"iperf3 -c {host} -p {IPERF3_PORT} -t {duration} -P {benchmark['streams']} -J "
+                '|| echo \'{"error": "iperf3 failed"}\'',
+                f"echo '@@ {path} {node_name} netperf'",
+                f"netperf -H {host} -p {NETPERF_CONTROL_PORT} -t TCP_RR -l {duration} -j -- "
+                f"-P {NETPERF_DATA_PORT} -k {','.join(NETPERF_KEYS)} || true",
+            ]
+        )
+    return "\n".join(lines) + "\n"
+
+
+def _parse_iperf3(body: str) -> dict:
+    try:
+        result = json.loads(body)
+    except ValueError:
+        return {"error": "unparseable iperf3 output"}
+    if "error" in result:
+        return {"error": result["error"]}
+    end = result["end"]
+    return {
+        "throughput_gbps": round(end["sum_received"]["bits_per_second"] / 1e9, 3),
+        "retransmits": end["sum_sent"].get("retransmits"),
+    }
+
+
+def _parse_netperf(body: str) -> dict:
+    values = dict(line.split("=", 1) for line in body.splitlines() if "=" in line)
+    if not all(key in values for key in NETPERF_KEYS):
+        return {"error": "netperf failed"}
+    return {
+        "transactions_per_s": round(float(values["THROUGHPUT"]), 1),
+        "latency_p50_us": float(values["P50_LATENCY"]),
+        "latency_p99_us": float(values["P99_LATENCY"]),
+        "latency_mean_us": round(float(values["MEAN_LATENCY"]), 1),
+    }
+
+
+def parse_client_output(client_node: str, output: str) -> list[dict]:
+    """Split a client pod's log on the marker lines into one result per target."""
+    results = {}
+    section = None
+    bodies = {}
+    for line in output.splitlines():
+        if line.startswith("@@ "):
+            section = tuple(line[3:].split())
+            bodies[section] = []
+        elif section:
+            bodies[section].append(line)
+
+    for (path, server_node, tool), body in bodies.items():
+        parse = _parse_iperf3 if tool == "iperf3" else _parse_netperf
+        result = results.setdefault(
+            (path, server_node),
+            {
+                "path": path,
+                "client": client_node,
+                "server": server_node,
+                "same_node": client_node == server_node,
+            },
+        )
+        metrics = parse("\n".join(body))
+        if "error" in metrics:
+            result.setdefault("errors", []).append(f"{tool}: {metrics['error']}")
+        else:
+            result.update(metrics)
+    return list(results.values())
+
+
+def _category(result: dict) -> str:
+    if result["path"] == "loadbalancer":
+        return "loadbalancer"
+    return f"{result['path']}-{'same-node' if result['same_node'] else 'cross-node'}"
+
+
+def build_report(run_id: str, results: list[dict]) -> dict:
+    """
+    Arrange results as a path -> client -> server matrix, plus the median
+    throughput and latency per category (host/pod/service x same/cross-node,
+    LB).
+    """
+    matrix = {}
+    categories = {}
+    for result in results:
+        metrics = {
+            k: v
+            for k, v in result.items()
+            if k not in ("path", "client", "server", "same_node")
+        }
+        matrix.setdefault(result["path"], {}).setdefault(result["client"], {})[
+            result["server"]
+        ] = metrics
+        categories.setdefault(_category(result), []).append(metrics)
+
+    summary = {}
+    for category, entries in sorted(categories.items()):
+        summary[category] = {"pairs": len(entries)}
+        for key in ("throughput_gbps", "latency_p50_us", "latency_p99_us"):
+            values = [e[key] for e in entries if key in e]
+            if values:
+                summary[category][f"median_{key}"] = round(statistics.median(values), 3)
+
+    return {"run_id": run_id, "summary": summary, "matrix": matrix}
+
+
+def _percent_change(before, after):
+    if before in (None, 0) or after is None:
+        return None
+    return round((after - before) / before * 100, 1)
+
+
+def compare_reports(baseline: dict, current: dict) -> dict:
+    """
+    Percentage change per category median and per measured pair. Positive
+    throughput and negative latency changes are improvements.
+    """
+    summary = {}
+    for category, stats in current["summary"].items():
+        before = baseline["summary"].get(category, {})
+        summary[category] = {
+            key: _percent_change(before.get(key), value)
+            for key, value in stats.items()
+            if key.startswith("median_")
+        }
+
+    pairs = {}
+    for path, clients in current["matrix"].items():
+        for client, servers in clients.items():
+            for server, metrics in servers.items():
+                before = baseline["matrix"].get(path, {}).get(client, {}).get(server)
+                if before is None:
+                    continue
+                pairs[f"{path}:{client}->{server}"] = {
+                    key: _percent_change(before.get(key), metrics.get(key))
+                    for key in ("throughput_gbps", "latency_p50_us", "latency_p99_us")
+                }
+
+    return {
+        "baseline_run_id": baseline.get("run_id"),
+        "run_id": current.get("run_id"),
+        "summary": summary,
+        "pairs": pairs,
+    }
+
+
+def format_comparison(comparison: dict) -> str:
+    """Render a comparison as a plain-text table of the category medians."""
+    lines = [
+        f"Network benchmark: run {comparison['run_id']} vs baseline {comparison['baseline_run_id']}",
+        f"{'category':<24} {'throughput':>11} {'p50 latency':>12} {'p99 latency':>12}",
+    ]
+
+    def cell(value) -> str:
+        return "n/a" if value is None else f"{value:+.1f}%"
+
+    for category, changes in comparison["summary"].items():
+        lines.append(
+            f"{category:<24} {cell(changes.get('median_throughput_gbps')):>11} "
+            f"{cell(changes.get('median_latency_p50_us')):>12} "
+            f"{cell(changes.get('median_latency_p99_us')):>12}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 3 or argv[0] != "compare":
+        print("usage: python network_bench.py compare <baseline.json> <current.json>")
+        return 2
+    with open(argv[1], "r") as f:
+        baseline = json.load(f)
+    with open(argv[2], "r") as f:
+        current = json.load(f)
+    print(format_comparison(compare_reports(baseline, current)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
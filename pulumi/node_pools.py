@@ -0,0 +1,175 @@
+import copy
+import ipaddress
+from pathlib import Path
+
+import yaml
+
+LB_POOL_MANIFEST = (
+    Path(__file__).parent.parent
+    / "argocd"
+    / "applications"
+    / "manifests"
+    / "cilium"
+    / "l2-ip-pool.yaml"
+)
+
+# Keys a pool shares with every node it expands into
+POOL_NODE_KEYS = (
+    "role",
+    "type",
+    "cpu",
+    "memory",
+    "machine",
+    "talosImage",
+    "install_disk",
+    "disks",
+    "volumes",
+    "pcie_devices",
+    "gpu_sharing",
+    "kubelet",
+    "labels",
+    "taints",
+)
+
+
+class IpAllocator:
+    """
+    Bitmap-backed address allocator for one IPv4 network. Each bit marks an
+    address as taken; the network and broadcast addresses are always taken.
+    """
+
+    def __init__(self, cidr: str):
+        self.network = ipaddress.ip_network(cidr, strict=False)
+        self.bitmap = bytearray((self.network.num_addresses + 7) // 8)
+        self._set(0)
+        self._set(self.network.num_addresses - 1)
+
+    def _offset(self, ip) -> int:
+        ip = ipaddress.ip_address(ip)
+        if ip not in self.network:
+            raise ValueError(f"{ip} is outside {self.network}")
+        return int(ip) - int(self.network.network_address)
+
+    def _set(self, offset: int):
+        self.bitmap[offset >> 3] |= 1 << (offset & 7)
+
+    def _is_set(self, offset: int) -> bool:
+        return bool(self.bitmap[offset >> 3] & (1 << (offset & 7)))
+
+    def reserve(self, ip_or_cidr: str):
+        """Mark an address or CIDR block as taken (parts outside the network are ignored)"""
+        block = ipaddress.ip_network(ip_or_cidr, strict=False)
+        if not block.overlaps(self.network):
+            return
+        first = max(int(block.network_address), int(self.network.network_address))
+        last = min(int(block.broadcast_address), int(self.network.broadcast_address))
+        base = int(self.network.network_address)
+        for offset in range(first - base, last - base + 1):
+            self._set(offset)
+
+    def is_free(self, ip: str) -> bool:
+        return not self._is_set(self._offset(ip))
+
+    def claim(self, ip: str):
+        """Take a specific address, failing if it is already taken"""
+        offset = self._offset(ip)
+        if self._is_set(offset):
+            raise ValueError(f"{ip} is already allocated or reserved")
+        self._set(offset)
+
+    def pool_addresses(self, cidr: str, count: int) -> list[str]:
+        """
+        The first `count` addresses of `cidr` by fixed offset, taken or not.
+        Raises when the range is too small.
+        """
+        block = ipaddress.ip_network(cidr, strict=False)
+        if not block.subnet_of(self.network):
+            raise ValueError(f"{block} is not inside {self.network}")
+        if count > block.num_addresses:
+            raise ValueError(
+                f"{block} has only {block.num_addresses} addresses, {count} needed"
+            )
+        return [str(block.network_address + offset) for offset in range(count)]
+
+
+def read_lb_pool_cidrs(manifest_path: Path = LB_POOL_MANIFEST) -> list[str]:
+    """CIDRs of every CiliumLoadBalancerIPPool in the Cilium manifests."""
+    if not manifest_path.exists():
+        return []
+    with open(manifest_path, "r") as f:
+        documents = [d for d in yaml.safe_load_all(f) if d]
+    return [
+        block["cidr"]
+        for doc in documents
+        if doc.get("kind") == "CiliumLoadBalancerIPPool"
+        for block in doc["spec"].get("blocks", [])
+        if "cidr" in block
+    ]
+
+
+def expand_node_pools(
+    nodes: list[dict],
+    node_pools: list[dict],
+    network: dict,
+    gateway: str,
+    extra_reserved: list[str] = None,
+) -> list[dict]:
+    """
+    Expand `node_pools` into node dicts appended after the explicit `nodes`.
+
+    Addresses come from each pool's own `cidr` by fixed offset: member N
+    always gets the N-th address of the range, so resizing a pool never moves
+    the IPs of the members that stay. A member whose address is the gateway,
+    in a Cilium LB pool, in `network.reserved`, an explicit node IP or the
+    network/broadcast address fails instead of being skipped, since skipping
+    it would renumber every member after it.
+    """
+    allocator = IpAllocator(network["cidr"])
+    allocator.reserve(gateway)
+    for reserved in (
+        read_lb_pool_cidrs() + network.get("reserved", []) + (extra_reserved or [])
+    ):
+        allocator.reserve(reserved)
+
+    for node in nodes:
+        allocator.claim(node["ip"])
+
+    expanded = list(nodes)
+    names = {node["name"] for node in nodes}
+    pool_ranges = []
+    for pool in node_pools or []:
+        prefix = pool["name_prefix"] if "name_prefix" in pool else pool["name"]
+        count = int(pool.get("count", 0))
+        if "cidr" not in pool:
+            raise ValueError(f"Node pool '{prefix}' needs a cidr to allocate from")
+
+        pool_range = ipaddress.ip_network(pool["cidr"], strict=False)
+        for other_prefix, other_range in pool_ranges:
+            if pool_range.overlaps(other_range):
+                raise ValueError(
+                    f"Node pools '{prefix}' and '{other_prefix}' have overlapping ranges"
+                )
+        pool_ranges.append((prefix, pool_range))
+
+        for idx, ip in enumerate(allocator.pool_addresses(pool["cidr"], count), 1):
+            if not allocator.is_free(ip):
+                raise ValueError(
+                    f"Node pool '{prefix}' member {idx} would get {ip}, which is reserved or taken; "
+                    "move the reservation or the pool's cidr out of each other's way"
+                )
+            allocator.claim(ip)
+            node = {
+                key: copy.deepcopy(pool[key]) for key in POOL_NODE_KEYS if key in pool
+            }
+            node.setdefault("role", "worker")
+            node["name"] = f"{prefix}-{idx:02d}"
+            node["ip"] = ip
+            node["pool"] = prefix
+            if node["name"] in names:
+                raise ValueError(
+                    f"Node pool '{prefix}' produces duplicate node '{node['name']}'"
+                )
+            names.add(node["name"])
+            expanded.append(node)
+
+    return expanded
@@ -0,0 +1,170 @@
+"""
+Per-datastore concurrency for Proxmox operations.
+
+Proxmox takes a storage lock for every disk allocation, EFI disk, cloud-init
+drive and ISO download, so concurrent operations on one datastore queue up on
+the host and time out, while operations on different datastores don't
+contend. Pulumi only limits parallelism globally, so the scheduler spreads
+each (host, datastore) pair's operations over `limit` lanes and makes every
+operation depend on the one before it in its lane. Operations touching
+several datastores take a lane on each; datastores never wait on each other.
+
+Limits come from the `proxmox_concurrency` config:
+
+    proxmox_concurrency:
+      default: 2            # per datastore without its own limit
+      datastores:
+        local: 1            # ISO downloads
+        ssd-model-store01: 4
+
+During `pulumi up` each operation logs how long it waited after being
+declared and how long it held its datastores, to tune the limits with.
+"""
+
+import time
+
+import pulumi
+
+DEFAULT_LIMIT = 2
+# ISO downloads to `local` are large and all run while the images layer starts
+DEFAULT_DATASTORE_LIMITS = {"local": 1}
+
+
+def resolve_proxmox_concurrency(concurrency: dict) -> dict:
+    """Validate the `proxmox_concurrency` config and resolve its defaults."""
+    concurrency = concurrency or {}
+    unknown = set(concurrency) - {"default", "datastores"}
+    if unknown:
+        raise ValueError(f"proxmox_concurrency: unknown settings {sorted(unknown)}")
+
+    def positive(key: str, value) -> int:
+        if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            raise ValueError(
+                f"proxmox_concurrency.{key} must be a positive integer, got {value!r}"
+            )
+        return value
+
+    return {
+        "default": positive("default", concurrency.get("default", DEFAULT_LIMIT)),
+        "datastores": {
+            name: positive(f"datastores.{name}", limit)
+            for name, limit in {
+                **DEFAULT_DATASTORE_LIMITS,
+                **(concurrency.get("datastores") or {}),
+            }.items()
+        },
+    }
+
+
+class ProxmoxOperation:
+    """One scheduled resource: the lanes it holds and what it waits behind"""
+
+    def __init__(self, name: str, slots: list, depends_on: list, waits_behind: list):
+        self.name = name
+        self.slots = slots  # [(host, datastore, lane index)]
+        self.depends_on = depends_on
+        self.waits_behind = waits_behind
+        self.declared_at = time.monotonic()
+        self.started_at = None
+
+    @property
+    def datastores(self) -> str:
+        return ", ".join(f"{datastore}@{host}" for host, datastore, _ in self.slots)
+
+
+class DatastoreScheduler:
+    """
+    Orders Proxmox-affecting resources into per-datastore lanes. Acquire an
+    operation before creating the resource, pass `resource_options()` to it,
+    then release the operation with the resource so the next one in the lane
+    waits for it:
+
+        operation = scheduler.acquire("vm-1", "pve01", ["local-lvm"])
+        vm = proxmoxve.vm.VirtualMachine(..., opts=scheduler.resource_options(operation, parent=self))
+        scheduler.release(operation, vm)
+    """
+
+    def __init__(self, concurrency: dict):
+        self.concurrency = resolve_proxmox_concurrency(concurrency)
+        # (host, datastore) -> one list per lane of (operation name, resource)
+        self._lanes = {}
+        self._operations = {}
+        self._hooks = None
+
+    def limit(self, datastore: str) -> int:
+        return self.concurrency["datastores"].get(
+            datastore, self.concurrency["default"]
+        )
+
+    def acquire(self, name: str, host: str, datastores) -> ProxmoxOperation:
+        """Take the least busy lane of each datastore the operation touches."""
+        slots, depends_on, waits_behind = [], [], []
+        for datastore in dict.fromkeys(datastores):
+            lanes = self._lanes.setdefault(
+                (host, datastore), [[] for _ in range(self.limit(datastore))]
+            )
+            index = min(range(len(lanes)), key=lambda i: len(lanes[i]))
+            slots.append((host, datastore, index))
+            if lanes[index]:
+                previous_name, previous = lanes[index][-1]
+                depends_on.append(previous)
+                waits_behind.append(previous_name)
+
+        operation = ProxmoxOperation(name, slots, depends_on, waits_behind)
+        self._operations[name] = operation
+        if waits_behind:
+            pulumi.log.info(
+                f"proxmox: {name} queued on {operation.datastores} behind {', '.join(waits_behind)}"
+            )
+        return operation
+
+    def release(self, operation: ProxmoxOperation, resource: pulumi.Resource):
+        """Make the resource the one the next operation in each lane waits for."""
+        for host, datastore, index in operation.slots:
+            self._lanes[(host, datastore)][index].append((operation.name, resource))
+
+    def resource_options(
+        self, operation: ProxmoxOperation, **opts
+    ) -> pulumi.ResourceOptions:
+        """ResourceOptions ordering the resource in its lanes and timing it."""
+        depends_on = list(opts.pop("depends_on", None) or []) + operation.depends_on
+        return pulumi.ResourceOptions(
+            depends_on=depends_on or None,
+            hooks=self._hook_binding(),
+            **opts,
+        )
+
+    def _hook_binding(self) -> pulumi.ResourceHookBinding:
+        # Hooks only run during `pulumi up`, when the operations really happen
+        if self._hooks is None:
+            started = pulumi.ResourceHook("proxmox-operation-started", self._on_started)
+            finished = pulumi.ResourceHook(
+                "proxmox-operation-finished", self._on_finished
+            )
+            self._hooks = pulumi.ResourceHookBinding(
+                before_create=[started],
+                after_create=[finished],
+                before_update=[started],
+                after_update=[finished],
+            )
+        return self._hooks
+
+    def _on_started(self, args: pulumi.ResourceHookArgs):
+        operation = self._operations.get(args.name)
+        if operation is None:
+            return
+        operation.started_at = time.monotonic()
+        # Includes waiting on the resource's other dependencies, e.g. its ISO
+        waited = operation.started_at - operation.declared_at
+        pulumi.log.info(
+            f"proxmox: {operation.name} started on {operation.datastores} after waiting {waited:.1f}s"
+        )
+
+    def _on_finished(self, args: pulumi.ResourceHookArgs):
+        operation = self._operations.get(args.name)
+        if operation is None or operation.started_at is None:
+            return
+        held = time.monotonic() - operation.started_at
+        pulumi.log.info(
+            f"proxmox: {operation.name} held {operation.datastores} for {held:.1f}s"
+        )
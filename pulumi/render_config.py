@@ -0,0 +1,259 @@
+"""
+Render every node's Talos machine-config patches offline and diff them
+against the previous render, or against the committed config.
+
+    python render_config.py --stack dev             # render into ./rendered
+    python render_config.py --stack dev --check     # exit 1 if it differs from HEAD
+    python render_config.py --stack dev --check --base origin/main   # CI
+
+Reads Pulumi.<stack>.yaml directly and makes no provider calls, so it runs
+in seconds and without Proxmox access. Installer images are shown as
+placeholders because schematic IDs only exist after the image factory runs.
+"""
+
+import argparse
+import difflib
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import yaml
+
+from chart_cache import CACHE_DIR
+from layers.settings import LabSettings
+from talos_config import render_config_patches
+
+PROJECT_DIR = Path(__file__).parent
+
+
+class StackFileConfig:
+    """Read-only stand-in for pulumi.Config backed by Pulumi.<stack>.yaml"""
+
+    def __init__(self, stack: str):
+        with open(PROJECT_DIR / "Pulumi.yaml", "r") as f:
+            project = yaml.safe_load(f)["name"]
+        with open(PROJECT_DIR / f"Pulumi.{stack}.yaml", "r") as f:
+            stack_config = yaml.safe_load(f).get("config", {})
+
+        prefix = f"{project}:"
+        self.values = {
+            key[len(prefix) :]: value
+            for key, value in stack_config.items()
+            if key.startswith(prefix)
+        }
+
+    def get(self, key: str):
+        value = self.values.get(key)
+        # Secrets stay encrypted in the stack file and aren't needed to render
+        return None if isinstance(value, dict) and "secure" in value else value
+
+    def get_bool(self, key: str):
+        # Like pulumi.Config: stack values are strings, "true"/"false" in any case
+        value = self.get(key)
+        if value is None or isinstance(value, bool):
+            return value
+        if str(value).lower() not in ("true", "false"):
+            raise ValueError(
+                f"Configuration '{key}' value '{value}' is not a valid bool"
+            )
+        return str(value).lower() == "true"
+
+    def get_object(self, key: str):
+        return self.get(key)
+
+    def require_object(self, key: str):
+        value = self.get(key)
+        if value is None:
+            raise ValueError(f"Missing required configuration '{key}'")
+        return value
+
+    require = require_object
+    require_secret = require_object
+
+
+def _literal_str_representer(dumper, value: str):
+    # Keep multi-line strings (inline manifests, file contents) readable
+    style = "|" if "\n" in value else None
+    return dumper.represent_scalar("tag:yaml.org,2002:str", value, style=style)
+
+
+class _RenderDumper(yaml.SafeDumper):
+    pass
+
+
+_RenderDumper.add_representer(str, _literal_str_representer)
+
+
+def render_node_documents(settings: LabSettings) -> dict:
+    """Render all nodes' patch documents, keyed by relative output path."""
+    spec = settings.spec
+
+    documents = {}
+    for node in spec.nodes:
+        patches = render_config_patches(
+            name=node.name,
+            node_ip=node.ip,
+            role=node.role,
+            install_disk=node.install_disk,
+            install_image=f"factory.talos.dev/nocloud-installer/<{node.image_profile}-schematic>:{spec.talos_version}",
+            gateway=spec.gateway,
+            network_prefix=spec.network_prefix,
+            use_cilium=spec.use_cilium,
+            cilium_version=spec.cilium_version,
+            enable_gpu=node.enable_gpu,
+            gpu_sharing=node.gpu_sharing,
+            volumes=list(node.volumes),
+            etcd=spec.etcd,
+            control_plane=spec.control_plane,
+            kubelet=node.kubelet,
+            node_labels=node.labels,
+            node_taints=node.taints,
+            vip=spec.vip,
+        )
+
+        for idx, patch in enumerate(patches):
+            kind = patch.get("kind", "machine").lower()
+            suffix = f"-{patch['name']}" if "name" in patch else ""
+            documents[f"{node.name}/{idx:02d}-{kind}{suffix}.yaml"] = yaml.dump(
+                patch, Dumper=_RenderDumper, default_flow_style=False, sort_keys=False
+            )
+        # The diff then shows which nodes' inputs changed, not just their output
+        documents[f"{node.name}/spec-hash.yaml"] = yaml.dump(
+            {"content_hash": node.content_hash}, default_flow_style=False
+        )
+
+    return documents
+
+
+def _read_previous(out_dir: Path) -> dict:
+    if not out_dir.exists():
+        return {}
+    return {
+        str(path.relative_to(out_dir)): path.read_text()
+        for path in sorted(out_dir.rglob("*.yaml"))
+    }
+
+
+def _git(*args: str, cwd: Path = PROJECT_DIR) -> subprocess.CompletedProcess:
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True)
+
+
+def render_at_revision(stack: str, revision: str) -> dict:
+    """
+    Render the stack as committed at a git revision, from a temporary
+    worktree, so a check compares against reviewed config rather than
+    whatever was last rendered locally. A stack missing there renders empty.
+    """
+    toplevel = _git("rev-parse", "--show-toplevel")
+    if toplevel.returncode != 0:
+        raise ValueError(f"--check needs a git checkout: {toplevel.stderr.strip()}")
+    project = PROJECT_DIR.resolve().relative_to(toplevel.stdout.strip())
+    if _git(
+        "cat-file", "-e", f"{revision}:{project / f'Pulumi.{stack}.yaml'}"
+    ).returncode:
+        return {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        worktree = Path(tmp) / "worktree"
+        added = _git("worktree", "add", "--detach", str(worktree), revision)
+        if added.returncode != 0:
+            raise ValueError(f"Cannot check out {revision}: {added.stderr.strip()}")
+        try:
+            project_dir = worktree / project
+            # Share downloaded charts and cached renders with this checkout
+            if CACHE_DIR.exists():
+                (project_dir / CACHE_DIR.name).symlink_to(CACHE_DIR.resolve())
+            out_dir = Path(tmp) / "rendered"
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    "render_config.py",
+                    "--stack",
+                    stack,
+                    "--out",
+                    str(out_dir),
+                ],
+                cwd=project_dir,
+                capture_output=True,
+                text=True,
+            )
+            if result.returncode != 0:
+                raise ValueError(
+                    f"Rendering {stack} at {revision} failed: {result.stderr.strip()}"
+                )
+            return _read_previous(out_dir)
+        finally:
+            _git("worktree", "remove", "--force", str(worktree))
+
+
+def diff_documents(previous: dict, current: dict) -> list[str]:
+    """Unified diff lines between two renders."""
+    lines = []
+    for path in sorted(set(previous) | set(current)):
+        before = previous.get(path, "")
+        after = current.get(path, "")
+        if before != after:
+            lines.extend(
+                difflib.unified_diff(
+                    before.splitlines(keepends=True),
+                    after.splitlines(keepends=True),
+                    fromfile=f"a/{path}" if path in previous else "/dev/null",
+                    tofile=f"b/{path}" if path in current else "/dev/null",
+                )
+            )
+    return lines
+
+
+def write_documents(out_dir: Path, documents: dict):
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    for path, content in documents.items():
+        target = out_dir / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(content)
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--stack", default="dev", help="stack name (Pulumi.<stack>.yaml)"
+    )
+    parser.add_argument(
+        "--out", default=None, help="output directory (default: rendered/<stack>)"
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="don't write; exit 1 if the render differs from the render at --base",
+    )
+    parser.add_argument(
+        "--base",
+        default="HEAD",
+        help="git revision --check compares against (default: HEAD)",
+    )
+    args = parser.parse_args(argv)
+
+    out_dir = Path(args.out) if args.out else PROJECT_DIR / "rendered" / args.stack
+    settings = LabSettings(StackFileConfig(args.stack))
+
+    current = render_node_documents(settings)
+    if args.check:
+        diff = diff_documents(render_at_revision(args.stack, args.base), current)
+        sys.stdout.writelines(diff)
+        return 1 if diff else 0
+
+    diff = diff_documents(_read_previous(out_dir), current)
+    sys.stdout.writelines(diff)
+
+    write_documents(out_dir, current)
+    print(
+        f"Rendered {len(current)} documents for {len(settings.nodes)} nodes "
+        f"into {out_dir} ({'changed' if diff else 'no changes'})"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
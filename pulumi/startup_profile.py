@@ -0,0 +1,106 @@
+"""
+Startup profiler for the Pulumi program, enabled by an environment flag:
+
+    LAB_PROFILE_STARTUP=1 pulumi preview
+    LAB_PROFILE_STARTUP=startup.prof pulumi preview   # also keep the raw stats
+
+Reports the total import time, the time to the first registered resource and
+the modules with the highest cumulative import time on stderr.
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import time
+
+import pulumi
+
+ENV_FLAG = "LAB_PROFILE_STARTUP"
+TOP_MODULES = 15
+
+_profiler = None
+_started = None
+_marks = {}
+
+
+def enabled() -> bool:
+    return os.environ.get(ENV_FLAG, "").lower() not in ("", "0", "false")
+
+
+def start():
+    """Start profiling the program; a no-op unless the flag is set."""
+    global _profiler, _started
+    if not enabled() or _profiler:
+        return
+    _started = time.perf_counter()
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+
+    def first_resource(args):
+        mark("first_resource")
+        return None
+
+    # Stack transformations run synchronously as each resource is constructed
+    pulumi.runtime.register_stack_transformation(first_resource)
+
+
+def mark(label: str):
+    """Record the time since start() the first time `label` is reached."""
+    if _profiler and label not in _marks:
+        _marks[label] = time.perf_counter() - _started
+
+
+def _module_name(filename: str, modules: dict) -> str:
+    return modules.get(os.path.abspath(filename), filename)
+
+
+def summarize(stats: pstats.Stats, modules: dict) -> dict:
+    """
+    Import time and per-module cumulative import time from profile stats.
+    cProfile counts only the outermost call of a recursive function, so the
+    cumulative time of importlib's `_find_and_load` is the total import time.
+    """
+    import_seconds = 0.0
+    module_seconds = {}
+    for (filename, _, function), (_, _, _, cumulative, _) in stats.stats.items():
+        if function == "_find_and_load":
+            import_seconds += cumulative
+        elif function == "<module>":
+            name = _module_name(filename, modules)
+            module_seconds[name] = module_seconds.get(name, 0.0) + cumulative
+    top = sorted(module_seconds.items(), key=lambda item: item[1], reverse=True)
+    return {"import_seconds": import_seconds, "top_modules": top[:TOP_MODULES]}
+
+
+def report():
+    """Stop profiling and print the startup report; call at the end of the program."""
+    if not _profiler:
+        return
+    mark("program")
+    _profiler.disable()
+
+    stats = pstats.Stats(_profiler)
+    path = os.environ[ENV_FLAG]
+    if path.lower() not in ("1", "true", "yes"):
+        stats.dump_stats(path)
+
+    modules = {
+        os.path.abspath(module.__file__): name
+        for name, module in list(sys.modules.items())
+        if getattr(module, "__file__", None)
+    }
+    summary = summarize(stats, modules)
+
+    def ms(seconds) -> str:
+        return "     n/a" if seconds is None else f"{seconds * 1000:8.1f} ms"
+
+    lines = [
+        "Startup profile:",
+        f"  imports           {ms(summary['import_seconds'])}",
+        f"  first resource    {ms(_marks.get('first_resource'))}",
+        f"  program           {ms(_marks['program'])}",
+        f"Top {TOP_MODULES} modules by cumulative import time:",
+    ]
+    lines.extend(f"  {ms(seconds)}  {name}" for name, seconds in summary["top_modules"])
+    print("\n".join(lines), file=sys.stderr)
@@ -0,0 +1,271 @@
+import json
+
+import pulumi
+import pulumi_kubernetes as kubernetes
+from volumes import volume_mount_path
+
+NFS_VERSIONS = ("3", "4.1", "4.2")
+NFS_MAX_NCONNECT = 16
+NFS_IO_SIZES = tuple(2**n for n in range(12, 21))  # 4KiB .. 1MiB
+
+# NFS mount profiles for the StorageClasses generated from `nfs.storage_classes`.
+# Every profile mounts hard, so an NFS server restart stalls I/O instead of
+# surfacing as corrupt writes.
+NFS_STORAGE_PROFILES = {
+    # Large sequential files (model weights, datasets, backups): many TCP
+    # connections and the largest transfer sizes the Linux client supports
+    "throughput": {
+        "nfsvers": "4.2",
+        "nconnect": 8,
+        "rsize": 1048576,
+        "wsize": 1048576,
+        "hard": True,
+        "noatime": True,
+    },
+    # Many small files (configs, git checkouts, app data): smaller transfers
+    # and short attribute caching keep metadata round trips cheap and fresh
+    "small-file": {
+        "nfsvers": "4.2",
+        "nconnect": 4,
+        "rsize": 65536,
+        "wsize": 65536,
+        "actimeo": 3,
+        "hard": True,
+        "noatime": True,
+    },
+    # Written once, read by many pods: long attribute caching and no
+    # close-to-open revalidation
+    "read-mostly": {
+        "nfsvers": "4.2",
+        "nconnect": 8,
+        "rsize": 1048576,
+        "wsize": 262144,
+        "actimeo": 600,
+        "nocto": True,
+        "hard": True,
+        "noatime": True,
+    },
+}
+
+# fio jobs run against every benchmark target, one after another
+FIO_JOBS = {
+    "seq-read": {"rw": "read", "bs": "1M", "iodepth": 16},
+    "seq-write": {"rw": "write", "bs": "1M", "iodepth": 16},
+    "rand-read": {"rw": "randread", "bs": "4k", "iodepth": 32},
+    "rand-write": {"rw": "randwrite", "bs": "4k", "iodepth": 32},
+}
+FIO_LATENCY_PERCENTILES = ("50.000000", "99.000000", "99.900000")
+FIO_FILENAME = "fio-bench.dat"
+
+
+def validate_nfs_mount_options(class_name: str, options: dict) -> dict:
+    """Validate the option dict of one NFS StorageClass."""
+    nfsvers = str(options.get("nfsvers", "4.2"))
+    if nfsvers not in NFS_VERSIONS:
+        raise ValueError(
+            f"StorageClass '{class_name}': nfsvers must be one of {NFS_VERSIONS}, got '{nfsvers}'"
+        )
+    nconnect = options.get("nconnect")
+    if nconnect is not None and not 1 <= int(nconnect) <= NFS_MAX_NCONNECT:
+        raise ValueError(
+            f"StorageClass '{class_name}': nconnect must be between 1 and {NFS_MAX_NCONNECT}"
+        )
+    for key in ("rsize", "wsize"):
+        if key in options and int(options[key]) not in NFS_IO_SIZES:
+            raise ValueError(
+                f"StorageClass '{class_name}': {key} must be a power of two from 4096 to 1048576"
+            )
+    return {**options, "nfsvers": nfsvers}
+
+
+def render_nfs_mount_options(options: dict) -> list[str]:
+    """Render an option dict as mountOptions: True -> flag, False -> omitted."""
+    rendered = []
+    for key, value in options.items():
+        if value is True:
+            rendered.append(key)
+        elif value is not False and value is not None:
+            rendered.append(f"{key}={value}")
+    return rendered
+
+
+def render_nfs_storage_classes(nfs: dict) -> list[dict]:
+    """
+    Render a StorageClass manifest per `nfs.storage_classes` entry. Each entry
+    picks a profile and can override single mount options.
+    """
+    if not nfs:
+        return []
+    for key in ("server", "share"):
+        if not nfs.get(key):
+            raise ValueError(f"nfs.{key} is required for NFS StorageClasses")
+
+    manifests = []
+    seen = set()
+    for storage_class in nfs.get("storage_classes", []):
+        profile = storage_class.get("profile", "throughput")
+        if profile not in NFS_STORAGE_PROFILES:
+            raise ValueError(
+                f"NFS storage profile must be one of {list(NFS_STORAGE_PROFILES)}, got '{profile}'"
+            )
+        name = storage_class.get("name", f"nfs-{profile}")
+        if name in seen:
+            raise ValueError(f"Duplicate NFS StorageClass '{name}'")
+        seen.add(name)
+
+        options = validate_nfs_mount_options(
+            name,
+            {**NFS_STORAGE_PROFILES[profile], **storage_class.get("mount_options", {})},
+        )
+        parameters = {
+            "server": storage_class.get("server", nfs["server"]),
+            "share": storage_class.get("share", nfs["share"]),
+        }
+        if storage_class.get("sub_dir"):
+            parameters["subDir"] = storage_class["sub_dir"]
+
+        manifests.append(
+            {
+                "apiVersion": "storage.k8s.io/v1",
+                "kind": "StorageClass",
+                "metadata": {
+                    "name": name,
+                    "labels": {"kubernetes-lab/nfs-profile": profile},
+                },
+                "provisioner": "nfs.csi.k8s.io",
+                "parameters": parameters,
+                "reclaimPolicy": storage_class.get("reclaim_policy", "Retain"),
+                "volumeBindingMode": "Immediate",
+                "allowVolumeExpansion": True,
+                "mountOptions": render_nfs_mount_options(options),
+            }
+        )
+    return manifests
+
+
+def create_nfs_storage_classes(
+    nfs: dict,
+    k8s_provider: kubernetes.Provider,
+    depends_on: list = None,
+) -> list[kubernetes.storage.v1.StorageClass]:
+    """Create the NFS StorageClasses generated from the `nfs` config."""
+    return [
+        kubernetes.storage.v1.StorageClass(
+            f"storage-class-{manifest['metadata']['name']}",
+            metadata=manifest["metadata"],
+            provisioner=manifest["provisioner"],
+            parameters=manifest["parameters"],
+            reclaim_policy=manifest["reclaimPolicy"],
+            volume_binding_mode=manifest["volumeBindingMode"],
+            allow_volume_expansion=manifest["allowVolumeExpansion"],
+            mount_options=manifest["mountOptions"],
+            opts=pulumi.ResourceOptions(
+                provider=k8s_provider,
+                depends_on=depends_on or [],
+            ),
+        )
+        for manifest in render_nfs_storage_classes(nfs)
+    ]
+
+
+def render_fio_jobfile(directory: str, size: str, runtime: int) -> str:
+    """
+    Render an fio job file running FIO_JOBS one after another (stonewall)
+    against files in `directory`, bypassing the page cache.
+    """
+    lines = [
+        "[global]",
+        "ioengine=libaio",
+        "direct=1",
+        f"directory={directory}",
+        # One file shared by all jobs, laid out once
+        f"filename={FIO_FILENAME}",
+        f"size={size}",
+        f"runtime={runtime}",
+        "time_based=1",
+        "ramp_time=5",
+        "group_reporting=1",
+        "percentile_list="
+        + ":".join(p.rstrip("0").rstrip(".") for p in FIO_LATENCY_PERCENTILES),
+        "",
+    ]
+    for job_name, job in FIO_JOBS.items():
+        lines.append(f"[{job_name}]")
+        lines.append("stonewall")
+        lines.extend(f"{key}={value}" for key, value in job.items())
+        lines.append("")
+    return "\n".join(lines)
+
+
+def summarize_fio_results(fio_json: str) -> dict:
+    """
+    Reduce fio's JSON output to IOPS, bandwidth (MiB/s) and completion
+    latency percentiles (microseconds) per job.
+    """
+    # Anything the container printed before fio's JSON (e.g. package install) is skipped
+    results = json.loads(fio_json[fio_json.index("{") :])
+    summary = {}
+    for job in results["jobs"]:
+        direction = "write" if "write" in FIO_JOBS[job["jobname"]]["rw"] else "read"
+        stats = job[direction]
+        percentiles = stats.get("clat_ns", {}).get("percentile", {})
+        summary[job["jobname"]] = {
+            "iops": round(stats["iops"], 1),
+            "bandwidth_mib_s": round(stats["bw"] / 1024, 1),
+            "latency_us": {
+                f"p{p.rstrip('0').rstrip('.')}": round(percentiles[p] / 1000, 1)
+                for p in FIO_LATENCY_PERCENTILES
+                if p in percentiles
+            },
+        }
+    return summary
+
+
+def resolve_storage_benchmark(benchmark: dict, nfs: dict, nodes: tuple) -> dict:
+    """
+    Resolve the `storage_benchmark` config into fio settings and a target
+    per NFS StorageClass and per node carrying one of `local_volumes`.
+    Returns None when no benchmark is configured.
+    """
+    if not benchmark:
+        return None
+
+    targets = [
+        {
+            "name": manifest["metadata"]["name"],
+            "storage_class": manifest["metadata"]["name"],
+        }
+        for manifest in render_nfs_storage_classes(nfs)
+    ]
+    for volume_name in benchmark.get("local_volumes", []):
+        matches = [
+            (node, volume)
+            for node in nodes
+            for volume in node.volumes
+            if volume["name"] == volume_name
+        ]
+        if not matches:
+            raise ValueError(
+                f"storage_benchmark: no node has a volume named '{volume_name}'"
+            )
+        for node, volume in matches:
+            targets.append(
+                {
+                    "name": f"{volume_name}-{node.name}",
+                    "node": node.name,
+                    "path": f"{volume_mount_path(volume)}/.fio-bench",
+                }
+            )
+    if not targets:
+        raise ValueError("storage_benchmark needs NFS StorageClasses or local_volumes")
+
+    return {
+        # Bump to run the benchmark again
+        "run_id": str(benchmark.get("run_id", "1")),
+        "size": benchmark.get("size", "4G"),
+        "runtime": int(benchmark.get("runtime", 60)),
+        "pvc_size": benchmark.get("pvc_size", "10Gi"),
+        "image": benchmark.get("image", "alpine:3.20"),
+        "timeout_seconds": int(benchmark.get("timeout_seconds", 1800)),
+        "targets": targets,
+    }
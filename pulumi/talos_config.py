@@ -1,8 +1,17 @@
 import pulumi
 import pulumiverse_talos as talos
+import base64
 import json
 import copy
+import functools
+import yaml
+from pulumi_command import local as command
 from pathlib import Path
+from gpu_sharing import gpu_sharing_node_labels, validate_gpu_sharing
+from volumes import render_user_volume_config, validate_volumes
+from etcd import render_etcd_disk, render_etcd_extra_args
+from kubelet import render_kubelet_extra_config
+from chart_cache import pinned_chart_source, render_chart
 
 
 def _get_repo_root() -> Path:
@@ -10,135 +19,40 @@ def _get_repo_root() -> Path:
     return Path(__file__).parent.parent
 
 
-def _read_cilium_values() -> str:
+# Labels of every node with a GPU passed through
+GPU_NODE_LABELS = {
+    "nvidia.com/gpu.present": "true",
+    "nvidia.com/mps.capable": "true",
+    "feature.node.kubernetes.io/pci-10de.present": "true",
+}
+
+
+def _read_cilium_values() -> dict:
     """Read Cilium values from the ArgoCD values file."""
     values_path = (
         _get_repo_root() / "argocd" / "applications" / "values" / "cilium.yaml"
     )
     with open(values_path, "r") as f:
-        return f.read()
+        return yaml.safe_load(f) or {}
 
 
-def _get_cilium_inline_manifests(cilium_version: str = "1.16.0") -> list:
+@functools.cache
+def _get_cilium_inline_manifests(cilium_version: str = None) -> tuple:
     """
-    Build inline manifests for Cilium bootstrap.
-    Returns list of dicts with 'name' and 'contents' keys.
+    Build inline manifests for Cilium bootstrap: the chart rendered offline
+    at `cilium_version` (default: the ArgoCD Application's) with the ArgoCD
+    values, so the API server applies the CNI directly. Returns dicts with
+    'name' and 'contents' keys.
     """
-    cilium_values = _read_cilium_values()
-
-    # ConfigMap containing Cilium values
-    cilium_values_manifest = {
-        "name": "cilium-values",
-        "contents": f"""---
-apiVersion: v1
-kind: ConfigMap
-metadata:
-  name: cilium-values
-  namespace: kube-system
-data:
-  values.yaml: |
-{_indent(cilium_values, 4)}
-""",
-    }
-
-    # Job that installs Cilium using the values ConfigMap
-    cilium_install_manifest = {
-        "name": "cilium-bootstrap",
-        "contents": f"""---
-apiVersion: rbac.authorization.k8s.io/v1
-kind: ClusterRoleBinding
-metadata:
-  name: cilium-install
-roleRef:
-  apiGroup: rbac.authorization.k8s.io
-  kind: ClusterRole
-  name: cluster-admin
-subjects:
-- kind: ServiceAccount
-  name: cilium-install
-  namespace: kube-system
----
-apiVersion: v1
-kind: ServiceAccount
-metadata:
-  name: cilium-install
-  namespace: kube-system
----
-apiVersion: batch/v1
-kind: Job
-metadata:
-  name: cilium-install
-  namespace: kube-system
-spec:
-  backoffLimit: 10
-  template:
-    metadata:
-      labels:
-        app: cilium-install
-    spec:
-      restartPolicy: OnFailure
-      tolerations:
-        - operator: Exists
-        - effect: NoSchedule
-          operator: Exists
-        - effect: NoExecute
-          operator: Exists
-        - effect: PreferNoSchedule
-          operator: Exists
-        - key: node-role.kubernetes.io/control-plane
-          operator: Exists
-          effect: NoSchedule
-        - key: node-role.kubernetes.io/control-plane
-          operator: Exists
-          effect: NoExecute
-        - key: node-role.kubernetes.io/control-plane
-          operator: Exists
-          effect: PreferNoSchedule
-      affinity:
-        nodeAffinity:
-          requiredDuringSchedulingIgnoredDuringExecution:
-            nodeSelectorTerms:
-              - matchExpressions:
-                  - key: node-role.kubernetes.io/control-plane
-                    operator: Exists
-      serviceAccountName: cilium-install
-      hostNetwork: true
-      containers:
-      - name: cilium-install
-        image: quay.io/cilium/cilium-cli-ci:latest
-        env:
-        - name: KUBERNETES_SERVICE_HOST
-          valueFrom:
-            fieldRef:
-              apiVersion: v1
-              fieldPath: status.podIP
-        - name: KUBERNETES_SERVICE_PORT
-          value: "6443"
-        volumeMounts:
-          - name: values
-            mountPath: /root/app/values.yaml
-            subPath: values.yaml
-        command:
-          - cilium
-          - install
-          - --version=v{cilium_version}
-          - --values
-          - /root/app/values.yaml
-      volumes:
-        - name: values
-          configMap:
-            name: cilium-values
-""",
-    }
-
-    return [cilium_values_manifest, cilium_install_manifest]
-
-
-def _indent(text: str, spaces: int) -> str:
-    """Indent each line of text by the specified number of spaces."""
-    indent_str = " " * spaces
-    return "\n".join(
-        indent_str + line if line.strip() else line for line in text.split("\n")
+    source = pinned_chart_source("cilium")
+    source["version"] = cilium_version or source["version"]
+    return (
+        {
+            "name": "cilium",
+            "contents": render_chart(
+                source, "cilium", "kube-system", _read_cilium_values()
+            ),
+        },
     )
 
 
@@ -148,32 +62,110 @@ def create_talos_secrets(name: str, talos_version: str = None):
     return talos.machine.Secrets(f"{name}-secrets", talos_version=talos_version)
 
 
-def apply_talos_config(
+def render_talosconfig(
+    cluster_name: str, endpoint_ips: list, client_config, node_ip: str = None
+) -> str:
+    """
+    Render a talosconfig YAML from the client configuration. talosctl
+    balances requests over the endpoints and fails over when one is down;
+    commands without --nodes target `node_ip` (default: the first endpoint).
+    """
+    return yaml.dump(
+        {
+            "context": cluster_name,
+            "contexts": {
+                cluster_name: {
+                    "endpoints": list(endpoint_ips),
+                    "nodes": [node_ip or endpoint_ips[0]],
+                    "ca": client_config["ca_certificate"],
+                    "crt": client_config["client_certificate"],
+                    "key": client_config["client_key"],
+                }
+            },
+        },
+        default_flow_style=False,
+    )
+
+
+def recover_from_snapshot(
     name: str,
-    secrets: talos.machine.Secrets,
+    secrets,
     cluster_name: str,
-    cluster_endpoint: str,
+    node_ip: str,
+    snapshot_path: str,
+    skip_hash_check: bool = False,
+    depends_on: list = None,
+) -> command.Command:
+    """
+    Bootstrap etcd from a snapshot instead of an empty data directory.
+    Runs `talosctl bootstrap --recover-from`, which uploads the local snapshot
+    to the node; the machine secrets must be the ones the snapshot was taken
+    under, so Kubernetes certificates and tokens in it stay valid.
+    """
+    talosconfig_b64 = pulumi.Output.secret(
+        secrets.client_configuration.apply(
+            lambda cfg: base64.b64encode(
+                render_talosconfig(cluster_name, [node_ip], cfg).encode("utf-8")
+            ).decode("utf-8")
+        )
+    )
+    # Snapshots copied from an etcd data directory carry no integrity hash
+    skip_hash = " --recover-skip-hash-check" if skip_hash_check else ""
+
+    return command.Command(
+        f"{name}-bootstrap-recover",
+        create=(
+            "set -euo pipefail; "
+            "export TALOSCONFIG=$(mktemp); trap 'rm -f \"$TALOSCONFIG\"' EXIT; "
+            'printf %s "$TALOSCONFIG_B64" | base64 -d > "$TALOSCONFIG"; '
+            # The node only accepts bootstrap once etcd is waiting for it
+            "for i in $(seq 1 30); do "
+            f"talosctl -n {node_ip} -e {node_ip} bootstrap "
+            f"--recover-from='{snapshot_path}'{skip_hash} && exit 0; "
+            "sleep 10; "
+            "done; "
+            "exit 1"
+        ),
+        environment={"TALOSCONFIG_B64": talosconfig_b64},
+        delete="true",
+        opts=pulumi.ResourceOptions(depends_on=depends_on),
+    )
+
+
+def render_config_patches(
+    name: str,
     node_ip: str,
     role: str = "controlplane",
     install_disk: str = "/dev/sda",
     install_image: str = None,
     hostname: str = None,
-    vm: pulumi.Resource = None,
     gateway: str = "192.168.1.1",
+    network_prefix: int = 24,
     nameservers: list = None,
     use_cilium: bool = False,
-    cilium_version: str = "1.16.0",
-    kubernetes_version: str = None,
+    cilium_version: str = None,
     enable_gpu: bool = False,
-    bootstrap: bool = False,
+    gpu_sharing: dict = None,
+    volumes: list = None,
+    etcd: dict = None,
+    control_plane: dict = None,
+    kubelet: dict = None,
     node_labels: dict = None,
-    node_taints: list = None,
-    node_type: str = "proxmox",
-    config_dependencies: list = None,
-    grow_system_disk: bool = True,
-):
+    node_taints: dict = None,
+    vip: str = None,
+) -> list[dict]:
+    """
+    Render the machine-config patch documents for a node: the machine patch,
+    the EPHEMERAL VolumeConfig and one UserVolumeConfig per data volume.
+    Pure function, so it can also run offline (see render_config.py).
+    """
     nameservers = nameservers or ["192.168.1.1"]
-    config_dependencies = config_dependencies or []
+    gpu_sharing = validate_gpu_sharing(name, gpu_sharing)
+    volumes = validate_volumes(name, volumes)
+    if gpu_sharing and not enable_gpu:
+        raise ValueError(
+            f"Node '{name}' sets gpu_sharing but has no GPU passed through"
+        )
 
     # Build machine config patch
     machine_patch = {
@@ -188,7 +180,7 @@ def apply_talos_config(
                 "interfaces": [
                     {
                         "deviceSelector": {"busPath": "0*"},
-                        "addresses": [f"{node_ip}/24"],
+                        "addresses": [f"{node_ip}/{network_prefix}"],
                         "routes": [{"network": "0.0.0.0/0", "gateway": gateway}],
                     }
                 ],
@@ -203,16 +195,24 @@ def apply_talos_config(
         }
     }
 
+    # Shared VIP: held by one control plane at a time, elected through etcd
+    if vip and role == "controlplane":
+        machine_patch["machine"]["network"]["interfaces"][0]["vip"] = {"ip": vip}
+
+    # Kubelet profile: image pulls/GC, eviction, pod limits, CPU pinning, reservations
+    if kubelet:
+        machine_patch["machine"]["kubelet"]["extraConfig"] = (
+            render_kubelet_extra_config(kubelet)
+        )
+
     # Add NVIDIA GPU kernel modules and runtime configuration if GPU is enabled
     if enable_gpu:
         # Add GPU node labels
         machine_patch["machine"].setdefault("nodeLabels", {})
+        machine_patch["machine"]["nodeLabels"].update(GPU_NODE_LABELS)
+        # Select the device-plugin sharing config (MPS / time-slicing) for this node
         machine_patch["machine"]["nodeLabels"].update(
-            {
-                "nvidia.com/gpu.present": "true",
-                "nvidia.com/mps.capable": "true",
-                "feature.node.kubernetes.io/pci-10de.present": "true",
-            }
+            gpu_sharing_node_labels(gpu_sharing)
         )
 
         machine_patch["machine"]["kernel"] = {
@@ -239,7 +239,10 @@ def apply_talos_config(
         machine_patch["cluster"] = {
             "network": {"cni": {"name": "none"}},
             "proxy": {"disabled": True},
-            "inlineManifests": _get_cilium_inline_manifests(cilium_version),
+            "inlineManifests": [
+                dict(manifest)
+                for manifest in _get_cilium_inline_manifests(cilium_version)
+            ],
             # Install kubelet cert approver and metrics-server during bootstrap
             "extraManifests": [
                 "https://raw.githubusercontent.com/alex1989hu/kubelet-serving-cert-approver/main/deploy/standalone-install.yaml",
@@ -254,58 +257,124 @@ def apply_talos_config(
             ],
         }
 
-    def _render_machine_patch(image: str = None) -> str:
-        patch = copy.deepcopy(machine_patch)
-        # Merge user-supplied node labels and taints into the rendered patch
-        if node_labels:
-            patch["machine"].setdefault("nodeLabels", {})
-            patch["machine"]["nodeLabels"].update(node_labels)
-        if node_taints:
-            patch["machine"]["nodeTaints"] = node_taints
-        if image:
-            patch["machine"]["install"]["image"] = image
-        return json.dumps(patch)
-    
-    def _render_model_volume_patch() -> str:
-        return json.dumps({
-            "apiVersion": "v1alpha1",
-            "kind": "UserVolumeConfig",
-            "name": "model-store",
-            "provisioning": {
-                "diskSelector": {
-                    "match": 'disk.dev_path == "/dev/sdb"'
-                },
-                "minSize": "100GB"
-            },
-            "filesystem": {
-                "type": "xfs"
-            }
-        })
-
-    def _render_volume_patch() -> str:
-        # VolumeConfig is a separate top-level document kind, not a field inside
-        # MachineConfig. It must be passed as its own patch entry.
-        return json.dumps({
-            "apiVersion": "v1alpha1",
-            "kind": "VolumeConfig",
-            "name": "EPHEMERAL",
-            "provisioning": {
-                "grow": True,
-            },
-        })
+    # Control-plane profile: component flags plus APF manifests
+    if control_plane and role == "controlplane":
+        for section, value in control_plane.items():
+            if section == "inlineManifests":
+                machine_patch["cluster"].setdefault("inlineManifests", [])
+                machine_patch["cluster"]["inlineManifests"].extend(value)
+            else:
+                machine_patch["cluster"][section] = copy.deepcopy(value)
+
+    # etcd tuning, plus Talos API access for the in-cluster defrag CronJobs
+    if etcd and role == "controlplane":
+        machine_patch["cluster"].setdefault("etcd", {}).setdefault("extraArgs", {})
+        machine_patch["cluster"]["etcd"]["extraArgs"].update(
+            render_etcd_extra_args(etcd, node_ip)
+        )
+        if etcd["disk"]:
+            # Only /var/lib/etcd moves; images and kubelet stay on EPHEMERAL
+            machine_patch["machine"].setdefault("disks", []).append(render_etcd_disk())
+        # Merged, so features set elsewhere in the patch are kept
+        machine_patch["machine"].setdefault("features", {})
+        machine_patch["machine"]["features"]["kubernetesTalosAPIAccess"] = {
+            "enabled": True,
+            "allowedRoles": ["os:operator"],
+            "allowedKubernetesNamespaces": ["kube-system"],
+        }
+
+    # Merge user-supplied node labels and taints into the rendered patch
+    if node_labels:
+        machine_patch["machine"].setdefault("nodeLabels", {})
+        machine_patch["machine"]["nodeLabels"].update(node_labels)
+    if node_taints:
+        machine_patch["machine"]["nodeTaints"] = node_taints
+    if install_image:
+        machine_patch["machine"]["install"]["image"] = install_image
+
+    # VolumeConfig is a separate top-level document kind, not a field inside
+    # MachineConfig. It must be passed as its own patch entry.
+    volume_patch = {
+        "apiVersion": "v1alpha1",
+        "kind": "VolumeConfig",
+        "name": "EPHEMERAL",
+        "provisioning": {
+            "grow": True,
+        },
+    }
 
     # Build list of patches - VolumeConfig is a separate document from MachineConfig
-    if install_image is None:
-        patches = [_render_machine_patch()]
-    else:
-        patches = [
-            pulumi.Output.from_input(install_image).apply(
-                lambda image: _render_machine_patch(image)
+    return [machine_patch, volume_patch] + [
+        render_user_volume_config(volume) for volume in volumes
+    ]
+
+
+def apply_talos_config(
+    name: str,
+    secrets: talos.machine.Secrets,
+    cluster_name: str,
+    cluster_endpoint: str,
+    node_ip: str,
+    role: str = "controlplane",
+    install_disk: str = "/dev/sda",
+    install_image: str = None,
+    hostname: str = None,
+    vm: pulumi.Resource = None,
+    gateway: str = "192.168.1.1",
+    network_prefix: int = 24,
+    nameservers: list = None,
+    use_cilium: bool = False,
+    cilium_version: str = None,
+    kubernetes_version: str = None,
+    enable_gpu: bool = False,
+    gpu_sharing: dict = None,
+    volumes: list = None,
+    etcd: dict = None,
+    control_plane: dict = None,
+    kubelet: dict = None,
+    bootstrap: bool = False,
+    bootstrap_from_snapshot: str = None,
+    recover_skip_hash_check: bool = False,
+    node_labels: dict = None,
+    node_taints: dict = None,
+    node_type: str = "proxmox",
+    config_dependencies: list = None,
+    grow_system_disk: bool = True,
+    vip: str = None,
+):
+    config_dependencies = config_dependencies or []
+
+    def _render_patches(image: str = None) -> list[str]:
+        return [
+            json.dumps(patch)
+            for patch in render_config_patches(
+                name=name,
+                node_ip=node_ip,
+                role=role,
+                install_disk=install_disk,
+                install_image=image,
+                hostname=hostname,
+                gateway=gateway,
+                network_prefix=network_prefix,
+                nameservers=nameservers,
+                use_cilium=use_cilium,
+                cilium_version=cilium_version,
+                enable_gpu=enable_gpu,
+                gpu_sharing=gpu_sharing,
+                volumes=volumes,
+                etcd=etcd,
+                control_plane=control_plane,
+                kubelet=kubelet,
+                node_labels=node_labels,
+                node_taints=node_taints,
+                vip=vip,
             )
         ]
 
-    patches.append(_render_volume_patch())
-    patches.append(_render_model_volume_patch())
+    # Render once up front so config errors surface before any provider call
+    patches = _render_patches()
+    if install_image is not None:
+        patches = pulumi.Output.from_input(install_image).apply(_render_patches)
 
     # Convert secrets output to the format expected by get_configuration_output
     machine_secrets_dict = secrets.machine_secrets.apply(
@@ -357,7 +426,20 @@ def apply_talos_config(
 
     result = {"config_apply": config_apply}
 
-    if role == "controlplane" and bootstrap:
+    if role == "controlplane" and bootstrap and bootstrap_from_snapshot:
+        pulumi.log.info(
+            f"Bootstrapping Kubernetes cluster on {name} from etcd snapshot {bootstrap_from_snapshot}"
+        )
+        result["bootstrap"] = recover_from_snapshot(
+            name,
+            secrets,
+            cluster_name,
+            node_ip,
+            bootstrap_from_snapshot,
+            skip_hash_check=recover_skip_hash_check,
+            depends_on=[config_apply],
+        )
+    elif role == "controlplane" and bootstrap:
         pulumi.log.info(f"Bootstrapping Kubernetes cluster on {name}")
         result["bootstrap"] = talos.machine.Bootstrap(
             f"{name}-bootstrap",
@@ -367,6 +449,7 @@ def apply_talos_config(
             opts=pulumi.ResourceOptions(depends_on=[config_apply]),
         )
 
+    if "bootstrap" in result:
         pulumi.log.info(f"Generating kubeconfig from {name}")
         result["kubeconfig"] = talos.cluster.Kubeconfig(
             f"{name}-kubeconfig",
@@ -376,4 +459,4 @@ def apply_talos_config(
             opts=pulumi.ResourceOptions(depends_on=[result["bootstrap"]]),
         )
 
-    return result
\ No newline at end of file
+    return result
@@ -0,0 +1,204 @@
+import copy
+import math
+
+from chart_cache import merge_values
+from kubelet import node_allocatable, parse_cpu, parse_memory_mib
+
+# Backing stores cheap enough to stamp many virtual clusters. sqlite and
+# embedded etcd live inside the syncer pod; "shared" points every vcluster at
+# its own database on one external server, so the pods stay stateless.
+VCLUSTER_BACKING_STORES = ("sqlite", "etcd", "shared")
+
+# Syncer (API server + controllers + store) resources per backing store
+DEFAULT_SYNCER_RESOURCES = {
+    "sqlite": {
+        "requests": {"cpu": "100m", "memory": "256Mi"},
+        "limits": {"cpu": "1", "memory": "1Gi"},
+    },
+    "etcd": {
+        "requests": {"cpu": "200m", "memory": "512Mi"},
+        "limits": {"cpu": "1", "memory": "2Gi"},
+    },
+    "shared": {
+        "requests": {"cpu": "100m", "memory": "192Mi"},
+        "limits": {"cpu": "1", "memory": "1Gi"},
+    },
+}
+
+DEFAULT_COREDNS_RESOURCES = {
+    "requests": {"cpu": "20m", "memory": "64Mi"},
+    "limits": {"cpu": "200m", "memory": "128Mi"},
+}
+
+# Host namespace quota for everything a tenant syncs down
+DEFAULT_TENANT_QUOTA = {
+    "requests.cpu": "2",
+    "requests.memory": "4Gi",
+    "limits.cpu": "4",
+    "limits.memory": "8Gi",
+    "pods": "30",
+    "services": "10",
+    "persistentvolumeclaims": "5",
+}
+
+DEFAULT_TENANT_LIMIT_RANGE = {
+    "default": {"cpu": "500m", "memory": "512Mi"},
+    "defaultRequest": {"cpu": "100m", "memory": "128Mi"},
+}
+
+
+def resolve_vcluster_fleet(vclusters: dict) -> dict:
+    """
+    Validate the `vclusters` stack config and return it with defaults
+    resolved, or None when no fleet is configured.
+    """
+    if not vclusters:
+        return None
+
+    count = int(vclusters.get("count", 0))
+    if count < 0:
+        raise ValueError("vclusters.count must not be negative")
+
+    backing_store = vclusters.get("backing_store", "sqlite")
+    if backing_store not in VCLUSTER_BACKING_STORES:
+        raise ValueError(
+            f"vclusters.backing_store must be one of {VCLUSTER_BACKING_STORES}, got '{backing_store}'"
+        )
+
+    syncer_resources = merge_values(
+        DEFAULT_SYNCER_RESOURCES[backing_store], vclusters.get("syncer_resources")
+    )
+    for kind in ("requests", "limits"):
+        for resource in ("cpu", "memory"):
+            if resource not in syncer_resources.get(kind, {}):
+                raise ValueError(f"vclusters.syncer_resources needs {kind}.{resource}")
+    if parse_cpu(syncer_resources["requests"]["cpu"]) > parse_cpu(
+        syncer_resources["limits"]["cpu"]
+    ) or parse_memory_mib(syncer_resources["requests"]["memory"]) > parse_memory_mib(
+        syncer_resources["limits"]["memory"]
+    ):
+        raise ValueError("vclusters.syncer_resources requests must not exceed limits")
+
+    return {
+        "count": count,
+        "name_prefix": vclusters.get("name_prefix", "tenant"),
+        "backing_store": backing_store,
+        "syncer_resources": syncer_resources,
+        "coredns_resources": merge_values(
+            DEFAULT_COREDNS_RESOURCES, vclusters.get("coredns_resources")
+        ),
+        "quota": {**DEFAULT_TENANT_QUOTA, **(vclusters.get("quota") or {})},
+        "limit_range": merge_values(
+            DEFAULT_TENANT_LIMIT_RANGE, vclusters.get("limit_range")
+        ),
+        "persistence_size": vclusters.get("persistence_size", "2Gi"),
+        "storage_class": vclusters.get("storage_class"),
+        "ready_timeout_seconds": int(vclusters.get("ready_timeout_seconds", 600)),
+        "values": vclusters.get("values") or {},
+    }
+
+
+def vcluster_names(fleet: dict) -> list[str]:
+    return [f"{fleet['name_prefix']}-{idx:02d}" for idx in range(1, fleet["count"] + 1)]
+
+
+def render_vcluster_values(fleet: dict, data_source=None) -> dict:
+    """
+    Render the vcluster chart values shared by every stamp. `data_source` is
+    the external database DSN for the "shared" backing store.
+    """
+    backing_store = fleet["backing_store"]
+    if backing_store == "sqlite":
+        store = {"database": {"embedded": {"enabled": True}}}
+    elif backing_store == "etcd":
+        store = {"etcd": {"embedded": {"enabled": True}}}
+    else:
+        if data_source is None:
+            raise ValueError("vclusters.backing_store 'shared' needs a data source")
+        store = {"database": {"external": {"enabled": True, "dataSource": data_source}}}
+
+    persistence = {"volumeClaim": {"enabled": backing_store != "shared"}}
+    if backing_store != "shared":
+        persistence["volumeClaim"]["size"] = fleet["persistence_size"]
+        if fleet["storage_class"]:
+            persistence["volumeClaim"]["storageClass"] = fleet["storage_class"]
+
+    values = {
+        "controlPlane": {
+            "backingStore": store,
+            "statefulSet": {
+                "resources": copy.deepcopy(fleet["syncer_resources"]),
+                "persistence": persistence,
+            },
+            "coredns": {
+                "deployment": {
+                    "replicas": 1,
+                    "resources": copy.deepcopy(fleet["coredns_resources"]),
+                },
+            },
+        },
+        "policies": {
+            "resourceQuota": {"enabled": True, "quota": dict(fleet["quota"])},
+            "limitRange": {"enabled": True, **copy.deepcopy(fleet["limit_range"])},
+        },
+    }
+    # Stack-provided values are the template; they win over generated defaults
+    return merge_values(values, fleet["values"])
+
+
+def vcluster_control_plane_overhead(fleet: dict) -> dict:
+    """Requested cpu (cores) and memory (MiB) of one vcluster's control plane."""
+    pods = [fleet["syncer_resources"], fleet["coredns_resources"]]
+    return {
+        "cpu": sum(parse_cpu(pod["requests"]["cpu"]) for pod in pods),
+        "memory_mib": sum(parse_memory_mib(pod["requests"]["memory"]) for pod in pods),
+    }
+
+
+def worker_capacity(nodes: tuple) -> dict:
+    """
+    Allocatable cpu and memory of the untainted Proxmox workers. Tainted
+    nodes (e.g. GPU workers) and external nodes of unknown size are skipped.
+    """
+    cpu = memory = 0.0
+    counted = []
+    for node in nodes:
+        if node.is_controlplane or node.is_external or node.taints:
+            continue
+        node_alloc_cpu, node_alloc_memory = node_allocatable(
+            node.kubelet, node.cpu, node.memory
+        )
+        cpu += node_alloc_cpu
+        memory += node_alloc_memory
+        counted.append(node.name)
+    return {"nodes": counted, "cpu": cpu, "memory_mib": memory}
+
+
+def vcluster_fleet_report(fleet: dict, nodes: tuple) -> dict:
+    """
+    Per-vcluster control-plane overhead and how many tenants fit on the
+    schedulable workers: control planes only, and with each tenant's quota
+    requests fully used.
+    """
+    overhead = vcluster_control_plane_overhead(fleet)
+    capacity = worker_capacity(nodes)
+    quota_cpu = parse_cpu(fleet["quota"].get("requests.cpu", 0))
+    quota_memory = parse_memory_mib(fleet["quota"].get("requests.memory", 0))
+
+    def fit(cpu: float, memory_mib: float) -> int:
+        if not capacity["nodes"]:
+            return 0
+        return math.floor(
+            min(capacity["cpu"] / cpu, capacity["memory_mib"] / memory_mib)
+        )
+
+    return {
+        "count": fleet["count"],
+        "backing_store": fleet["backing_store"],
+        "overhead_per_vcluster": overhead,
+        "worker_capacity": capacity,
+        "fit_control_planes": fit(overhead["cpu"], overhead["memory_mib"]),
+        "fit_with_quota": fit(
+            overhead["cpu"] + quota_cpu, overhead["memory_mib"] + quota_memory
+        ),
+    }
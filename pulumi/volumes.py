@@ -0,0 +1,174 @@
+from typing import TYPE_CHECKING
+
+import pulumi
+
+if TYPE_CHECKING:
+    import pulumi_kubernetes as kubernetes
+
+# Talos mounts user volumes at /var/mnt/<name>
+USER_VOLUME_MOUNT_ROOT = "/var/mnt"
+USER_VOLUME_FILESYSTEMS = ("xfs", "ext4")
+
+# Proxmox limits drive serials to 20 characters
+DISK_SERIAL_MAX_LEN = 20
+
+
+def validate_volumes(node_name: str, volumes: list) -> list:
+    """
+    Validate a node's `volumes` list and return it with defaults resolved.
+    """
+    resolved = []
+    seen = set()
+    for volume in volumes or []:
+        name = volume.get("name")
+        if not name:
+            raise ValueError(f"Node '{node_name}': every volume needs a name")
+        if name in seen:
+            raise ValueError(f"Node '{node_name}': duplicate volume '{name}'")
+        seen.add(name)
+
+        filesystem = volume.get("filesystem", "xfs")
+        if filesystem not in USER_VOLUME_FILESYSTEMS:
+            raise ValueError(
+                f"Node '{node_name}': volume '{name}' filesystem must be one of {USER_VOLUME_FILESYSTEMS}, got '{filesystem}'"
+            )
+
+        resolved.append(
+            {
+                "name": name,
+                "size": int(volume.get("size", 20)),
+                "datastore_id": volume.get("datastore_id", "local-lvm"),
+                "file_format": volume.get("file_format", "raw"),
+                "iothread": bool(volume.get("iothread", False)),
+                "ssd": bool(volume.get("ssd", False)),
+                "discard": bool(volume.get("discard", False)),
+                "cache": volume.get("cache"),
+                "filesystem": filesystem,
+                "min_size": volume.get("min_size", "1GiB"),
+                "disk_selector": volume.get("disk_selector"),
+                "persistent_volumes": volume.get("persistent_volumes", []),
+            }
+        )
+    return resolved
+
+
+def volume_disk_serial(volume: dict) -> str:
+    """Drive serial used to match the Proxmox disk from the Talos volume config."""
+    return volume["name"][:DISK_SERIAL_MAX_LEN]
+
+
+def volume_mount_path(volume: dict) -> str:
+    return f"{USER_VOLUME_MOUNT_ROOT}/{volume['name']}"
+
+
+def render_user_volume_config(volume: dict) -> dict:
+    """
+    Render a Talos UserVolumeConfig document for a volume. Disks are matched
+    by the serial set on the Proxmox drive unless a selector is given (e.g.
+    for external nodes).
+    """
+    disk_selector = volume["disk_selector"] or (
+        f'disk.serial == "{volume_disk_serial(volume)}"'
+    )
+    return {
+        "apiVersion": "v1alpha1",
+        "kind": "UserVolumeConfig",
+        "name": volume["name"],
+        "provisioning": {
+            "diskSelector": {"match": disk_selector},
+            "minSize": volume["min_size"],
+            "grow": True,
+        },
+        "filesystem": {"type": volume["filesystem"]},
+    }
+
+
+def render_local_persistent_volumes(node) -> list[dict]:
+    """
+    Render local PersistentVolume manifests for every `persistent_volumes`
+    entry of a node's volumes. They are pinned to the node by hostname, or
+    by the entry's `node_selector` labels, which the node must carry.
+    """
+    manifests = []
+    for volume in node.volumes:
+        for pv in volume["persistent_volumes"]:
+            sub_path = pv.get("path", pv["name"]).strip("/")
+            # nodeAffinity is immutable, so PVs adopted from elsewhere keep
+            # the selector they were created with
+            node_selector = pv.get("node_selector") or {
+                "kubernetes.io/hostname": node.name
+            }
+            missing = {
+                key: value
+                for key, value in node_selector.items()
+                if key != "kubernetes.io/hostname" and node.labels.get(key) != value
+            }
+            if missing:
+                raise ValueError(
+                    f"Node '{node.name}': persistent volume '{pv['name']}' node_selector {missing} doesn't match the node's labels"
+                )
+            spec = {
+                "capacity": {"storage": pv.get("capacity", f"{volume['size']}Gi")},
+                "accessModes": pv.get("access_modes", ["ReadWriteOnce"]),
+                "persistentVolumeReclaimPolicy": pv.get("reclaim_policy", "Retain"),
+                "local": {"path": f"{volume_mount_path(volume)}/{sub_path}"},
+                "nodeAffinity": {
+                    "required": {
+                        "nodeSelectorTerms": [
+                            {
+                                "matchExpressions": [
+                                    {
+                                        "key": key,
+                                        "operator": "In",
+                                        "values": [str(value)],
+                                    }
+                                    for key, value in node_selector.items()
+                                ]
+                            }
+                        ]
+                    }
+                },
+            }
+            if pv.get("storage_class"):
+                spec["storageClassName"] = pv["storage_class"]
+
+            manifests.append(
+                {
+                    "apiVersion": "v1",
+                    "kind": "PersistentVolume",
+                    "metadata": {
+                        "name": pv["name"],
+                        "labels": {
+                            "kubernetes-lab/node": node.name,
+                            "kubernetes-lab/volume": volume["name"],
+                        },
+                    },
+                    "spec": spec,
+                }
+            )
+    return manifests
+
+
+def create_local_persistent_volumes(
+    nodes: tuple,
+    k8s_provider: "kubernetes.Provider",
+    depends_on: list = None,
+) -> list["kubernetes.core.v1.PersistentVolume"]:
+    """Create the local PersistentVolumes declared under each node's volumes."""
+    import pulumi_kubernetes as kubernetes
+
+    persistent_volumes = []
+    for node in nodes:
+        for manifest in render_local_persistent_volumes(node):
+            persistent_volumes.append(
+                kubernetes.core.v1.PersistentVolume(
+                    f"{node.name}-{manifest['metadata']['name']}",
+                    metadata=manifest["metadata"],
+                    spec=manifest["spec"],
+                    opts=pulumi.ResourceOptions(
+                        provider=k8s_provider,
+                        depends_on=depends_on or [],
+                    ),
+                )
+            )
+    return persistent_volumes